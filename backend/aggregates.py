@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+
+def month_key(year, month):
+    """Integer key for a calendar month, ordered chronologically."""
+    return year * 12 + (month - 1)
+
+
+class MonthlyAggregateIndex:
+    """
+    Running (month, type, category) totals for a ledger.
+
+    Built once with a single groupby and updated on append, so dashboard stats
+    are read from a table with one row per month/type/category instead of
+    being recomputed from raw transactions on every request.
+    """
+
+    def __init__(self, df=None):
+        self._table = pd.DataFrame(
+            {'amount': pd.Series(dtype='float64'), 'count': pd.Series(dtype='int64')},
+            index=pd.MultiIndex.from_arrays([[], [], []], names=['month', 'type', 'category']),
+        )
+        self.min_date = None
+        self.max_date = None
+        if df is not None:
+            self.add(df)
+
+    def __len__(self):
+        return len(self._table)
+
+    def add(self, df):
+        """Folds a batch of transactions (datetime64 'date' column) into the index."""
+        if df.empty:
+            return
+
+        dates = df['date']
+        keys = dates.dt.year.to_numpy() * 12 + (dates.dt.month.to_numpy() - 1)
+        batch = pd.DataFrame({
+            'month': keys,
+            'type': np.asarray(df['type'], dtype=object),
+            'category': np.asarray(df['category'], dtype=object),
+            'amount': df['amount'].to_numpy(),
+        }).groupby(['month', 'type', 'category'], sort=False)['amount'].agg(['sum', 'count'])
+        batch.columns = ['amount', 'count']
+
+        if self._table.empty:
+            self._table = batch
+        else:
+            self._table = self._table.add(batch, fill_value=0)
+        self._table = self._table.astype({'amount': 'float64', 'count': 'int64'}).sort_index()
+
+        batch_min, batch_max = dates.min(), dates.max()
+        self.min_date = batch_min if self.min_date is None else min(self.min_date, batch_min)
+        self.max_date = batch_max if self.max_date is None else max(self.max_date, batch_max)
+
+    def total(self, type=None, categories=None, year=None, month=None):
+        """Sum of amounts, optionally restricted to a type, a list of categories and/or one month."""
+        table = self._table
+        if table.empty:
+            return 0.0
+
+        mask = np.ones(len(table), dtype=bool)
+        if type is not None:
+            mask &= table.index.get_level_values('type') == type
+        if categories is not None:
+            mask &= table.index.get_level_values('category').isin(categories)
+        if year is not None and month is not None:
+            mask &= table.index.get_level_values('month') == month_key(year, month)
+        return float(table['amount'].to_numpy()[mask].sum())
+
+    def rollup(self, level, type=None, categories=None):
+        """Amount and count totals per 'category' or 'month' (month keys), optionally filtered."""
+        table = self._table
+        if table.empty:
+            return table.droplevel(['type', 'category' if level == 'month' else 'month'])
+
+        mask = np.ones(len(table), dtype=bool)
+        if type is not None:
+            mask &= table.index.get_level_values('type') == type
+        if categories is not None:
+            mask &= table.index.get_level_values('category').isin(categories)
+        return table[mask].groupby(level=level).sum()
+
+    def category_totals(self, year, month, type='withdrawal'):
+        """Per-category totals for one month, sorted by category name."""
+        table = self._table
+        if table.empty:
+            return pd.Series(dtype='float64')
+
+        mask = (
+            (table.index.get_level_values('month') == month_key(year, month))
+            & (table.index.get_level_values('type') == type)
+        )
+        selected = table[mask]
+        return pd.Series(
+            selected['amount'].to_numpy(),
+            index=selected.index.get_level_values('category'),
+        ).sort_index()
+
+    def monthly_category_totals(self, type='withdrawal', last_months=6):
+        """{'YYYY-MM': per-category Series} for the most recent `last_months` months with activity of `type`."""
+        table = self._table
+        if table.empty:
+            return {}
+
+        selected = table[table.index.get_level_values('type') == type]
+        months = np.unique(selected.index.get_level_values('month'))[-last_months:]
+        result = {}
+        for key in months:
+            rows = selected[selected.index.get_level_values('month') == key]
+            result[f"{key // 12}-{key % 12 + 1:02d}"] = pd.Series(
+                rows['amount'].to_numpy(),
+                index=rows.index.get_level_values('category'),
+            )
+        return result
+
+    def span_days(self):
+        """Days between the first and last transaction (at least 1)."""
+        if self.min_date is None:
+            return 1
+        return max(1, (self.max_date - self.min_date).days)
+
+    def span_months(self):
+        """Calendar months touched by the ledger, inclusive (at least 1)."""
+        if self.min_date is None:
+            return 1
+        return max(1, (self.max_date.year - self.min_date.year) * 12 + self.max_date.month - self.min_date.month + 1)
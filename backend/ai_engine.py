@@ -1,109 +1,431 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
 
+from aggregates import MonthlyAggregateIndex
+from metrics import span, timed
+
+# Bump whenever analysis output changes so cached results are invalidated
+ENGINE_VERSION = "4"
+
+# Minimum category sizes for the statistical and Isolation Forest stages
+MIN_CATEGORY_SIZE = 5
+MIN_IF_SIZE = 15
+
+# Execution backends for the per-category Isolation Forest fits
+ANALYSIS_BACKENDS = {
+    "serial": None,
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def _isolation_forest():
+    # sklearn is slow to import, so it loads with the first fit rather than with this module
+    from sklearn.ensemble import IsolationForest
+    return IsolationForest(contamination='auto', random_state=42)
+
+
+def _fit_isolation_forest(amounts):
+    """Fits an Isolation Forest on a 1-D amount array and returns its -1/1 labels."""
+    # Contamination 'auto' usually works, but we can slightly tune it if needed.
+    model = _isolation_forest()
+    # We reshape because sklearn expects 2D array
+    return model.fit_predict(np.asarray(amounts).reshape(-1, 1))
+
+
+def _fit_isolation_forest_model(amounts):
+    """Same as _fit_isolation_forest, but also returns the fitted model for later scoring."""
+    X = np.asarray(amounts).reshape(-1, 1)
+    model = _isolation_forest().fit(X)
+    return model, model.predict(X)
+
+
+def _train_isolation_forest(amounts):
+    """Fits the same model as _fit_isolation_forest_model without scoring the training rows."""
+    return _isolation_forest().fit(np.asarray(amounts).reshape(-1, 1))
+
+
+def _fit_isolation_forests(amount_arrays, backend="serial", max_workers=None, fit_fn=_fit_isolation_forest):
+    """
+    Fits one Isolation Forest per amount array using the requested backend.
+    Every fit is seeded, so results are identical to serial mode and come back
+    in the same order as `amount_arrays`.
+    """
+    if backend not in ANALYSIS_BACKENDS:
+        raise ValueError(f"Unknown analysis backend '{backend}', expected one of {sorted(ANALYSIS_BACKENDS)}")
+
+    executor_cls = ANALYSIS_BACKENDS[backend]
+    if executor_cls is None or len(amount_arrays) < 2:
+        with span("isolation_forest_fit"):
+            return [fit_fn(amounts) for amounts in amount_arrays]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(amount_arrays))
+
+    # Submit the largest categories first so one big fit doesn't run last on an idle pool
+    order = sorted(range(len(amount_arrays)), key=lambda i: len(amount_arrays[i]), reverse=True)
+    with span("isolation_forest_fit"), executor_cls(max_workers=max_workers) as pool:
+        fitted = list(pool.map(fit_fn, [amount_arrays[i] for i in order]))
+
+    results = [None] * len(amount_arrays)
+    for i, result in zip(order, fitted):
+        results[i] = result
+    return results
+
+
+def _flag_anomalies(category_df, z_score, if_score, use_if):
+    """
+    Applies the hybrid flagging rules to one category.
+    `z_score` and `if_score` are arrays aligned with the rows of `category_df`.
+    """
+    # Rules are evaluated as column masks so only flagged rows are materialized.
+    abs_z = np.abs(z_score)
+
+    # Rule A: Massive Outliers (Z-Score > 8)
+    # Catches things like $3500 in a $50 avg category.
+    # IF sometimes misses these if the whole category is noisy.
+    extreme = abs_z > 8
+
+    # Rule B: Standard Anomalies (Isolation Forest says -1 AND Z-score is elevated)
+    # We require a moderate Z-score (> 2.5) to avoid flagging normal "odd" transactions
+    # just because Isolation Forest got a bit aggressive.
+    if use_if:
+        unusual = (if_score == -1) & (abs_z > 2.5)
+    else:
+        unusual = np.zeros(len(abs_z), dtype=bool)
+
+    flagged = extreme | unusual
+    if not flagged.any():
+        return []
+
+    flagged_df = category_df[flagged]
+    records = flagged_df.to_dict('records')
+    # Convert timestamps to strings for JSON serialization
+    dates = flagged_df['date'].dt.strftime('%Y-%m-%d').tolist()
+    z_values = z_score[flagged].tolist()
+    if_values = if_score[flagged].tolist()
+    severities = np.where(abs_z[flagged] > 10, 'high', 'medium').tolist()
+
+    anomalies = []
+    for record, date, z, if_label, is_extreme, is_unusual, severity in zip(
+        records, dates, z_values, if_values, extreme[flagged], unusual[flagged], severities
+    ):
+        reasons = []
+        if is_extreme:
+            reasons.append("Extreme Value")
+        if is_unusual:
+            reasons.append("Unusual Pattern")
+
+        record['z_score'] = z
+        record['if_score'] = if_label
+        record['date'] = date
+        record['flag_reasons'] = reasons
+        record['severity'] = severity
+        anomalies.append(record)
+
+    return anomalies
+
+
+# Reasons a row can be flagged for, as bits of AnomalyTable.flags
+FLAG_REASONS = ("Extreme Value", "Unusual Pattern")
+
+
+def _factorize(values):
+    """(int32 codes, unique values) for a text column; missing values get code -1."""
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int32), np.asarray(uniques, dtype=object)
+
+
+def _decode(column, i):
+    codes, uniques = column
+    return uniques[codes[i]] if codes[i] >= 0 else None
+
+
+def _concat_factorized(left, right):
+    """Factorized column of `left`'s rows followed by `right`'s, with shared unique values."""
+    codes = np.concatenate([left[0], np.where(right[0] >= 0, right[0] + len(left[1]), -1)])
+    remap, uniques = _factorize(np.concatenate([left[1], right[1]]))
+    return np.where(codes >= 0, remap[codes], -1).astype(np.int32), uniques
+
+
+class AnomalyTable:
+    """
+    Read-only, columnar form of an anomaly list (newest first), as served by the app.
+
+    Fields are NumPy arrays (text as factorized codes) instead of one dict per
+    anomaly, the severity ranking is computed once, and the full list is
+    serialized to JSON once. Serving it touches a few objects rather than every
+    anomaly, so when the analytics are built before gunicorn forks its workers
+    (see gunicorn.conf.py) the pages stay shared instead of being copied on write.
+    Updates build a new table with merge().
+    """
+
+    def __init__(self, anomalies=()):
+        anomalies = list(anomalies)
+        # Same text as json.dumps(anomalies), joined from per-anomaly fragments whose bounds merge() reuses
+        fragments = [json.dumps(anomaly, default=str) for anomaly in anomalies]
+        self.json = "[" + ", ".join(fragments) + "]"
+        self._set_bounds(np.fromiter(map(len, fragments), dtype=np.int64, count=len(fragments)))
+
+        frame = pd.DataFrame.from_records(
+            anomalies, columns=['id', 'date', 'description', 'amount', 'category', 'z_score', 'flag_reasons', 'severity']
+        )
+        self.ids = frame['id'].to_numpy(np.int64)
+        self.dates = frame['date'].to_numpy().astype('datetime64[D]')
+        self.amounts = frame['amount'].to_numpy(np.float64)
+        self.z_scores = frame['z_score'].to_numpy(np.float64)
+        self.descriptions = _factorize(frame['description'])
+        self.categories = _factorize(frame['category'])
+        self.severities = _factorize(frame['severity'])
+        self.flags = np.array(
+            [sum(1 << bit for bit, reason in enumerate(FLAG_REASONS) if reason in reasons) for reasons in frame['flag_reasons']],
+            dtype=np.uint8,
+        )
+        self._set_rank()
+
+    def _set_bounds(self, lengths):
+        # Element i of the JSON array is self.json[self._starts[i]:self._starts[i] + self._lengths[i]]
+        self._lengths = lengths
+        self._starts = 1 + np.concatenate([[0], np.cumsum(lengths[:-1] + 2)]).astype(np.int64)
+
+    def _set_rank(self):
+        # Most severe first: |Z-score| descending, then newest, then list order
+        self._rank = np.lexsort((np.arange(len(self.ids)), -self.dates.astype(np.int64), -np.abs(self.z_scores)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def records(self):
+        """The anomalies as a list of dicts, in the form _flag_anomalies produces them."""
+        return json.loads(self.json)
+
+    def merge(self, new_anomalies):
+        """
+        A new table with `new_anomalies` added; on equal dates existing rows stay first.
+
+        Both lists are newest first, so this merges two sorted sequences: only the new
+        anomalies are serialized, and the existing rows' JSON fragments and columns are
+        copied over in runs instead of being decoded and sorted again.
+        """
+        new = AnomalyTable(sorted(new_anomalies, key=lambda x: x['date'], reverse=True))
+        if not len(new):
+            return self
+        if not len(self):
+            return new
+
+        # Each new row goes after every existing row with the same or a later date
+        insert_at = np.searchsorted(-self.dates.astype(np.int64), -new.dates.astype(np.int64), side='right')
+        order = np.empty(len(self) + len(new), dtype=np.int64)  # merged row -> row of self, then of new
+        order[np.arange(len(self)) + np.searchsorted(insert_at, np.arange(len(self)), side='right')] = np.arange(len(self))
+        order[insert_at + np.arange(len(new))] = len(self) + np.arange(len(new))
+
+        pieces, run_start = [], 0
+        for j, at in enumerate(insert_at.tolist()):
+            if at > run_start:
+                pieces.append(self._fragments(run_start, at))
+            pieces.append(new._fragments(j, j + 1))
+            run_start = at
+        if run_start < len(self):
+            pieces.append(self._fragments(run_start, len(self)))
+
+        merged = AnomalyTable.__new__(AnomalyTable)
+        merged.json = "[" + ", ".join(pieces) + "]"
+        merged._set_bounds(np.concatenate([self._lengths, new._lengths])[order])
+        for name in ('ids', 'dates', 'amounts', 'z_scores', 'flags'):
+            setattr(merged, name, np.concatenate([getattr(self, name), getattr(new, name)])[order])
+        for name in ('descriptions', 'categories', 'severities'):
+            codes, uniques = _concat_factorized(getattr(self, name), getattr(new, name))
+            setattr(merged, name, (codes[order], uniques))
+        merged._set_rank()
+        return merged
+
+    def _fragments(self, start, stop):
+        """The JSON of elements start..stop-1 with their separators, without the brackets."""
+        return self.json[self._starts[start]:self._starts[stop - 1] + self._lengths[stop - 1]]
+
+    def top(self, k):
+        """The `k` most severe anomalies in prompt_context.compact_anomalies' trimmed form."""
+        return [
+            {
+                "id": int(self.ids[i]),
+                "date": str(self.dates[i]),
+                "description": _decode(self.descriptions, i),
+                "category": _decode(self.categories, i),
+                "amount": float(self.amounts[i]),
+                "reasons": [reason for bit, reason in enumerate(FLAG_REASONS) if self.flags[i] >> bit & 1],
+                "severity": _decode(self.severities, i),
+            }
+            for i in self._rank[:k]
+        ]
+
+
+def _robust_center(amounts):
+    """Returns the median and MAD of an amount Series, with the zero-MAD fallback."""
+    median = amounts.median()
+    mad = np.median(np.abs(amounts - median))
+
+    # Avoid division by zero if all transaction amounts are identical
+    if mad == 0:
+        # Fallback to standard deviation if MAD is 0, or just slightly above 0
+        mad = amounts.std() or 1e-9
+
+    return median, mad
+
+
+@timed()
 def detect_anomalies_hybrid(category_df):
     """
     Uses a hybrid approach: Isolation Forest for pattern detection,
-    plus Z-score specifically to catch massive outliers in high-variance 
+    plus Z-score specifically to catch massive outliers in high-variance
     categories (like Shopping) that IF sometimes misses.
     """
-    df = category_df.copy()
-    
     # Ensure we have enough data for meaningful stats
-    if len(df) < 5:
+    if len(category_df) < MIN_CATEGORY_SIZE:
         return []
 
     # --- 1. Statistical Setup (Z-Score) ---
-    # We use median/MAD (Median Absolute Deviation) instead of mean/std 
+    # We use median/MAD (Median Absolute Deviation) instead of mean/std
     # because they are more robust to pre-existing huge outliers.
-    median = df['amount'].median()
-    mad = np.median(np.abs(df['amount'] - median))
-    
-    # Avoid division by zero if all transaction amounts are identical
-    if mad == 0:
-        # Fallback to standard deviation if MAD is 0, or just slightly above 0
-        mad = df['amount'].std() or 1e-9 
+    amounts = category_df['amount']
+    median, mad = _robust_center(amounts)
 
     # Calculate modified Z-score (standardized distance from median)
     # 0.6745 is the consistency constant for normal distributions
-    df['z_score'] = 0.6745 * (df['amount'] - median) / mad
+    # (a NaN amount makes the MAD NaN; those rows just aren't flagged)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = 0.6745 * (amounts.to_numpy() - median) / mad
 
     # --- 2. Isolation Forest Setup ---
     # Only use IF if we have enough data for it to learn a pattern (>15 transactions)
-    use_if = len(df) >= 15
+    use_if = len(category_df) >= MIN_IF_SIZE
     if use_if:
-        # Contamination 'auto' usually works, but we can slightly tune it if needed.
-        model = IsolationForest(contamination='auto', random_state=42)
-        # We reshape because sklearn expects 2D array
-        df['if_score'] = model.fit_predict(df[['amount']])
+        if_score = _fit_isolation_forest(amounts.to_numpy())
     else:
-        df['if_score'] = 1 # Default to 'normal' if we don't run IF
+        if_score = np.ones(len(category_df), dtype=np.int64) # Default to 'normal' if we don't run IF
 
     # --- 3. Hybrid Flagging Logic ---
-    anomalies = []
-    for _, row in df.iterrows():
-        is_anomaly = False
-        reasons = []
+    return _flag_anomalies(category_df, z_score, if_score, use_if)
 
-        # Rule A: Massive Outliers (Z-Score > 8)
-        # Catches things like $3500 in a $50 avg category. 
-        # IF sometimes misses these if the whole category is noisy.
-        if abs(row['z_score']) > 8:
-            is_anomaly = True
-            reasons.append("Extreme Value")
 
-        # Rule B: Standard Anomalies (Isolation Forest says -1 AND Z-score is elevated)
-        # We require a moderate Z-score (> 2.5) to avoid flagging normal "odd" transactions
-        # just because Isolation Forest got a bit aggressive.
-        if use_if and row['if_score'] == -1 and abs(row['z_score']) > 2.5:
-            is_anomaly = True
-            reasons.append("Unusual Pattern")
+def _group_withdrawals(df):
+    """
+    Gathers withdrawals sorted by category in a single pass.
+
+    Returns the sorted frame and a list of (category, start, stop) row bounds
+    in first-seen category order.
+    """
+    positions = np.flatnonzero((df['type'] == 'withdrawal').to_numpy())
+    codes, categories = pd.factorize(df['category'].to_numpy()[positions])
 
-        if is_anomaly:
-            anomalies.append({
-                **row.to_dict(),
-                # Convert timestamps to strings for JSON serialization
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'flag_reasons': reasons,
-                'severity': 'high' if abs(row['z_score']) > 10 else 'medium'
-            })
+    # Rows with a missing category never matched the per-category filter, drop them
+    keep = codes >= 0
+    positions, codes = positions[keep], codes[keep]
 
-    return anomalies
+    # One stable sort keeps each category's rows in their original order
+    order = np.argsort(codes, kind='stable')
+    grouped_df = df.iloc[positions[order]]
+    codes = codes[order]
+
+    counts = np.bincount(codes, minlength=len(categories))
+    stops = np.cumsum(counts)
+    bounds = [(category, int(stop - count), int(stop)) for category, count, stop in zip(categories, counts, stops)]
+
+    return grouped_df, bounds
+
+
+def _robust_stats(grouped_df, bounds):
+    """
+    Computes each row's category median and MAD with grouped transforms.
+    Returns two arrays aligned with the rows of `grouped_df`.
+    """
+    counts = [stop - start for _, start, stop in bounds]
+    codes = np.repeat(np.arange(len(bounds)), counts)
+
+    amounts = grouped_df['amount'].reset_index(drop=True)
+    median = amounts.groupby(codes).transform('median')
+    mad = (amounts - median).abs().groupby(codes).transform('median').to_numpy(copy=True)
+
+    # Identical amounts give a zero MAD, fall back to that category's standard deviation
+    for category, start, stop in bounds:
+        if stop - start >= MIN_CATEGORY_SIZE and mad[start] == 0:
+            mad[start:stop] = amounts.iloc[start:stop].std() or 1e-9
+
+    return median.to_numpy(), mad
+
+
+def generate_insights(df, aggregates=None):
+    """
+    Generates basic spending insights to accompany anomalies.
+    Reads from a MonthlyAggregateIndex, built from `df` unless one is passed in.
+    """
+    if aggregates is None:
+        aggregates = MonthlyAggregateIndex(df)
 
-def generate_insights(df):
-    """Generates basic spending insights to accompany anomalies."""
     insights = []
+    if aggregates.max_date is None:
+        return insights
+
     # Example: Biggest spending category this month
-    current_month = df['date'].max().to_period('M')
-    monthly_data = df[df['date'].dt.to_period('M') == current_month]
-    
-    if not monthly_data.empty:
-        top_cat = monthly_data[monthly_data['type']=='withdrawal'].groupby('category')['amount'].sum().idxmax()
-        top_amount = monthly_data[monthly_data['type']=='withdrawal'].groupby('category')['amount'].sum().max()
+    current_month = aggregates.max_date
+    category_totals = aggregates.category_totals(current_month.year, current_month.month)
+
+    if not category_totals.empty:
+        top_cat = category_totals.idxmax()
+        top_amount = category_totals.max()
         insights.append(f"Spending is highest in **{top_cat}** this month (${top_amount:,.0f}).")
-        
+
     return insights
 
-def analyze_transactions(df):
+@timed()
+def analyze_transactions(df, backend="serial", max_workers=None):
     """
     Main entry point called by app.py.
     Orchestrates the analysis by category.
+
+    `backend` selects how the per-category Isolation Forests are fitted
+    ("serial", "thread" or "process"); `max_workers` caps the pool size.
     """
     # Ensure data types
     df['date'] = pd.to_datetime(df['date'])
     df['amount'] = pd.to_numeric(df['amount'])
-    
-    # Filter for only withdrawals for anomaly detection usually
-    withdrawal_df = df[df['type'] == 'withdrawal'].copy()
+
+    # Group withdrawals by category once; each category is a contiguous slice
+    grouped_df, bounds = _group_withdrawals(df)
+    median, mad = _robust_stats(grouped_df, bounds)
+    bounds = [(start, stop) for _, start, stop in bounds if stop - start >= MIN_CATEGORY_SIZE]
+
+    # 0.6745 is the consistency constant for normal distributions. Categories too small
+    # to analyze have no usable MAD (zero or NaN), so their rows are skipped.
+    amounts = grouped_df['amount'].to_numpy()
+    eligible = np.zeros(len(amounts), dtype=bool)
+    for start, stop in bounds:
+        eligible[start:stop] = True
+    z_score = np.zeros(len(amounts))
+    np.divide(0.6745 * (amounts - median), mad, out=z_score, where=eligible)
+
+    # Fit every category's Isolation Forest up front so they can run in parallel
+    if_bounds = [(start, stop) for start, stop in bounds if stop - start >= MIN_IF_SIZE]
+    if_labels = _fit_isolation_forests(
+        [amounts[start:stop] for start, stop in if_bounds], backend=backend, max_workers=max_workers
+    )
+    if_scores = dict(zip(if_bounds, if_labels))
 
     all_anomalies = []
 
     # Analyze by category
-    for category in withdrawal_df['category'].unique():
-        category_df = withdrawal_df[withdrawal_df['category'] == category]
+    for start, stop in bounds:
+        category_df = grouped_df.iloc[start:stop]
+        use_if = (start, stop) in if_scores
+        if use_if:
+            if_score = if_scores[(start, stop)]
+        else:
+            if_score = np.ones(stop - start, dtype=np.int64)
+
         # Run hybrid detection
-        cat_anomalies = detect_anomalies_hybrid(category_df)
+        cat_anomalies = _flag_anomalies(category_df, z_score[start:stop], if_score, use_if)
         all_anomalies.extend(cat_anomalies)
 
     # Sort anomalies by date (newest first)
@@ -112,4 +434,165 @@ def analyze_transactions(df):
     return {
         "anomalies": all_anomalies,
         "insights": generate_insights(df)
-    }
\ No newline at end of file
+    }
+
+
+class _CategoryState:
+    """Running anomaly state for one category: its amounts, median/MAD and model."""
+
+    def __init__(self):
+        self.chunks = []      # withdrawal amounts, appended batch by batch
+        self.size = 0
+        self.fitted_size = 0  # number of amounts the current median/MAD/model were built on
+        self.median = None
+        self.mad = None
+        self.model = None
+
+    def amounts(self):
+        if len(self.chunks) > 1:
+            self.chunks = [np.concatenate(self.chunks)]
+        return self.chunks[0]
+
+
+class IncrementalAnomalyDetector:
+    """
+    Incremental version of analyze_transactions.
+
+    `fit` runs the full analysis once and keeps per-category state (median/MAD
+    plus the fitted Isolation Forest). `update` then scores only newly appended
+    transactions against that state. A category is refit from its full history
+    only when it has grown by `refit_growth` since its last fit, or when a batch's
+    median drifts more than `drift_threshold` robust Z-units from the stored one.
+    Previously flagged anomalies are kept as they were.
+    """
+
+    def __init__(self, backend="serial", max_workers=None, refit_growth=0.25, drift_threshold=1.0):
+        self.backend = backend
+        self.max_workers = max_workers
+        self.refit_growth = refit_growth
+        self.drift_threshold = drift_threshold
+        self.refits = 0
+
+        self._categories = {}
+        self._anomalies = AnomalyTable()
+        self._aggregates = MonthlyAggregateIndex()
+
+    @timed("anomaly_detector_fit")
+    def fit(self, df):
+        """Analyzes a full ledger; returns analyze_transactions' structure with the anomalies as an AnomalyTable."""
+        df['date'] = pd.to_datetime(df['date'])
+        df['amount'] = pd.to_numeric(df['amount'])
+
+        self._categories = {}
+        self._aggregates = MonthlyAggregateIndex(df)
+
+        grouped_df, bounds = _group_withdrawals(df)
+        median, mad = _robust_stats(grouped_df, bounds)
+        amounts = grouped_df['amount'].to_numpy()
+
+        for category, start, stop in bounds:
+            state = self._categories[category] = _CategoryState()
+            state.chunks = [amounts[start:stop].copy()]
+            state.size = state.fitted_size = stop - start
+            if stop - start >= MIN_CATEGORY_SIZE:
+                state.median, state.mad = median[start], mad[start]
+
+        # Fit every category's Isolation Forest up front so they can run in parallel
+        if_bounds = [(category, start, stop) for category, start, stop in bounds if stop - start >= MIN_IF_SIZE]
+        fitted = _fit_isolation_forests(
+            [amounts[start:stop] for _, start, stop in if_bounds],
+            backend=self.backend, max_workers=self.max_workers, fit_fn=_fit_isolation_forest_model
+        )
+        if_scores = {}
+        for (category, _, _), (model, labels) in zip(if_bounds, fitted):
+            self._categories[category].model = model
+            if_scores[category] = labels
+
+        anomalies = []
+        for category, start, stop in bounds:
+            if stop - start < MIN_CATEGORY_SIZE:
+                continue
+            z_score = 0.6745 * (amounts[start:stop] - median[start:stop]) / mad[start:stop]
+            if_score = if_scores.get(category, np.ones(stop - start, dtype=np.int64))
+            anomalies.extend(
+                _flag_anomalies(grouped_df.iloc[start:stop], z_score, if_score, category in if_scores)
+            )
+
+        anomalies.sort(key=lambda x: x['date'], reverse=True)
+        self._anomalies = AnomalyTable(anomalies)
+        return self.results()
+
+    @timed("anomaly_detector_update")
+    def update(self, new_df):
+        """
+        Scores newly appended transactions and returns the anomalies found among them.
+        Cost is proportional to the batch, plus any category refits it triggers.
+        """
+        new_df = new_df.assign(date=pd.to_datetime(new_df['date']), amount=pd.to_numeric(new_df['amount']))
+        if new_df.empty:
+            return []
+
+        grouped_df, bounds = _group_withdrawals(new_df)
+        amounts = grouped_df['amount'].to_numpy()
+
+        new_anomalies = []
+        for category, start, stop in bounds:
+            state = self._categories.setdefault(category, _CategoryState())
+            batch = amounts[start:stop]
+            state.chunks.append(batch.copy())
+            state.size += len(batch)
+
+            if state.size < MIN_CATEGORY_SIZE:
+                continue
+
+            if self._needs_refit(state, batch):
+                self._refit(state)
+
+            z_score = 0.6745 * (batch - state.median) / state.mad
+            if_score = np.ones(len(batch), dtype=np.int64)
+            # Only rows with an elevated Z-score can be flagged, so only they need an IF label
+            candidates = np.abs(z_score) > 2.5
+            if state.model is not None and candidates.any():
+                if_score[candidates] = state.model.predict(batch[candidates].reshape(-1, 1))
+
+            new_anomalies.extend(
+                _flag_anomalies(grouped_df.iloc[start:stop], z_score, if_score, state.model is not None)
+            )
+
+        new_anomalies.sort(key=lambda x: x['date'], reverse=True)
+        if new_anomalies:
+            self._anomalies = self._anomalies.merge(new_anomalies)
+        self._aggregates.add(new_df)
+        return new_anomalies
+
+    def results(self):
+        """Returns the current {"anomalies" (an AnomalyTable), "insights"} results."""
+        return {
+            "anomalies": self._anomalies,
+            "insights": generate_insights(None, self._aggregates)
+        }
+
+    def _needs_refit(self, state, batch):
+        # Category just crossed a size threshold (first stats, or first Isolation Forest)
+        if state.median is None or (state.model is None and state.size >= MIN_IF_SIZE):
+            return True
+        # Category has grown enough that the stored model is stale
+        if state.size - state.fitted_size >= self.refit_growth * state.fitted_size:
+            return True
+        # Batch is large enough to judge and its center has moved
+        if len(batch) >= MIN_IF_SIZE:
+            drift = 0.6745 * abs(np.median(batch) - state.median) / state.mad
+            return drift > self.drift_threshold
+        return False
+
+    def _refit(self, state):
+        """Rebuilds a category's median/MAD and model from its full history."""
+        amounts = state.amounts()
+        state.median, state.mad = _robust_center(pd.Series(amounts))
+        state.fitted_size = state.size
+        self.refits += 1
+        if state.size >= MIN_IF_SIZE:
+            with span("isolation_forest_fit"):
+                state.model = _train_isolation_forest(amounts)
+        else:
+            state.model = None
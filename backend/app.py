@@ -1,155 +1,239 @@
 import os
 import json
-import google.generativeai as genai
-import csv
+import base64
+import gzip
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 from flask_cors import CORS
 import pandas as pd
-from ai_engine import analyze_transactions
+from ai_engine import ENGINE_VERSION, IncrementalAnomalyDetector
+from income_engine import INCOME_ENGINE_VERSION, IncomeEngine
+from goal_parser import extract_goal_from_message
+from result_cache import ResultCache, file_digest
+from ledger_store import LEDGER_COLUMNS, TransactionStore, load_ledger_binary, read_ledger_csv, read_ledger_meta, records_json, write_ledger_rows
 import re
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-import dateparser
 import numpy as np
+import threading
+from importlib.metadata import version as package_version
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from recurring import detect_recurring_charges
+from llm_cache import LLMResponseCache
+from llm_gateway import LLMGateway
+from chart_engine import build_chart, normalize_spec, parse_chart_request
+from session_store import create_session_store
+from tenants import TenantRegistry, verify_user_token
+from startup import Warmup
+from ingest import INGEST_CHUNK_ROWS, INGEST_MAX_ROWS, UploadTooLargeError, drop_duplicate_ids, read_upload
+from prompt_context import build_coach_context, build_subscription_context, compact_anomalies, estimate_tokens
+from metrics import METRICS, span, timed
+from profiler import SamplingProfiler
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
 # --- Configuration ---
 
 load_dotenv() 
 app = Flask(__name__)
 CORS(app)
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with response serialization timed as the json_serialize span."""
+
+    def dumps(self, obj, **kwargs):
+        with span("json_serialize"):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
 # --- Path Setup ---
 # Get the absolute path to the directory where this app.py file is located.
 # This ensures we can always find our data files, no matter where we run the command from.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
-# --- Load Data From CSV (On Startup) ---
-# load the data into memory when the app starts.
-def load_transactions_from_csv(filename="transactions.csv"):
-    """Reads transactions from CSV, converting types."""
-    transactions = []
-    filepath = os.path.join(DATA_DIR, filename) # <-- Use robust path
+# --- Ledger Locations ---
+# The default user's ledger lives in data/; other users' ledgers live in TENANT_DATA_DIR/<user_id>/.
+DEFAULT_USER_ID = "default"
+LEDGER_PATH = os.path.join(DATA_DIR, "transactions.csv")
+# Binary ledger written by convert_ledger.py; memory-mapped and shared by all workers when present
+LEDGER_BINARY_PATH = os.path.join(DATA_DIR, "transactions.ledger")
+TENANT_DATA_DIR = os.getenv("TENANT_DATA_DIR", os.path.join(DATA_DIR, 'users'))
+
+def ledger_paths(user_id):
+    """(CSV path, binary ledger path) for a user."""
+    if user_id == DEFAULT_USER_ID:
+        return LEDGER_PATH, LEDGER_BINARY_PATH
+    user_dir = os.path.join(TENANT_DATA_DIR, user_id)
+    return os.path.join(user_dir, "transactions.csv"), os.path.join(user_dir, "transactions.ledger")
+
+def load_ledger_from_csv(filepath):
+    """
+    Parses a transactions CSV exactly once. Every per-user structure
+    (the transaction store, the ML results and the income profile) is derived from this frame.
+    """
     try:
-        with open(filepath, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                row['id'] = int(row['id'])
-                row['amount'] = float(row['amount'])
-                transactions.append(row)
-
-        transactions.sort(key=lambda x: x['date'], reverse=True)
-
-        print(f"Loaded {len(transactions)} transactions from {filepath}")
+        ledger = read_ledger_csv(filepath)
+        print(f"Loaded {len(ledger)} transactions from {filepath}")
     except Exception as e:
         print(f"Error loading {filepath}: {e}. Using empty list.")
-    return transactions
-
-TRANSACTIONS_DB = load_transactions_from_csv()
-
-df = pd.read_csv(os.path.join(DATA_DIR, "transactions.csv"), parse_dates=['date'])
-ML_RESULTS = analyze_transactions(df)
+        ledger = pd.DataFrame(columns=LEDGER_COLUMNS)
+    return ledger
 
-
-def detect_income_type(df: pd.DataFrame):
+@timed("ledger_load")
+def load_transaction_store(user_id):
     """
-    Detects income type and accurately estimates monthly income by adjusting
-    for pay frequency (weekly, biweekly, etc.) instead of just averaging deposits.
+    Returns (TransactionStore, ledger digest) for a user. Prefers the memory-mapped
+    binary ledger, falling back to the CSV if it is missing or older than the CSV.
+    A user without any ledger files gets an empty store.
     """
-    # --- 1. Identify income-related transactions ---
-    # Filter for deposits and ensure we have valid dates
-    income_df = df[df["type"].str.lower().str.contains("deposit|income|payment|payout", na=False)].copy()
-    income_df["date"] = pd.to_datetime(income_df["date"], errors="coerce")
-    income_df = income_df.dropna(subset=["date"]).sort_values("date")
-
-    if income_df.empty:
-        return {
-            "income_type": "unknown",
-            "estimated_monthly_income": 0.0,
-            "income_frequency": "unknown",
-            "last_income_date": None
-        }
-
-    # --- 2. Compute time gaps and basic stats ---
-    income_df["gap_days"] = income_df["date"].diff().dt.days
-    
-    median_gap = income_df["gap_days"].median() if len(income_df) > 1 else np.nan
-    avg_deposit = income_df["amount"].mean()
-    income_std = income_df["amount"].std(ddof=0) or 0
-    
-    # --- 3. Determine frequency ---
-    frequency = "unknown"
-    if pd.notna(median_gap):
-        if median_gap <= 10:    frequency = "weekly"
-        elif median_gap <= 24:  frequency = "biweekly" # widened slightly to catch early/late paydays
-        elif median_gap <= 45:  frequency = "monthly"
-        else:                   frequency = "irregular"
-
-    # --- 4. Determine income type ---
-    gap_variability = income_df["gap_days"].std(ddof=0) or 0
-    amount_variability_ratio = income_std / avg_deposit if avg_deposit > 0 else 0
-
-    # Strict rules for "recurring": consistent days AND consistent amounts
-    if (gap_variability < 5 and amount_variability_ratio < 0.25 and frequency in ["weekly", "biweekly", "monthly"]):
-        income_type = "recurring"
-    elif (gap_variability > 10 or amount_variability_ratio > 0.4):
-        income_type = "gig"
-    else:
-        # Fallback for edge cases (e.g. only 2 deposits ever)
-        income_type = "gig" if frequency == "irregular" else "recurring"
-
-    # --- 5. Estimate Monthly Income (FIXED) ---
-    DAYS_IN_MONTH = 30.4375 # Standardized (365.25 / 12)
-
-    if income_type == "recurring":
-        # Apply multiplier based on frequency
-        if frequency == "weekly":
-            multiplier = DAYS_IN_MONTH / 7  # approx 4.35
-        elif frequency == "biweekly":
-            multiplier = DAYS_IN_MONTH / 14 # approx 2.17
+    csv_path, binary_path = ledger_paths(user_id)
+    if os.path.isdir(binary_path):
+        stale = os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(binary_path)
+        if stale:
+            print(f"{binary_path} is older than {csv_path}; re-run convert_ledger.py. Reading the CSV instead.")
         else:
-            multiplier = 1.0 # monthly
-            
-        estimated_monthly_income = avg_deposit * multiplier
+            try:
+                store = load_ledger_binary(binary_path)
+                print(f"Mapped {len(store)} transactions from {binary_path}")
+                return store, read_ledger_meta(binary_path).get("source_digest")
+            except Exception as e:
+                print(f"Error loading {binary_path}: {e}. Reading the CSV instead.")
 
-    else:
-        # GIG/IRREGULAR: Calculate realized daily average over the total period
-        first_day = income_df["date"].min()
-        last_day = income_df["date"].max()
-        total_days_active = max(30, (last_day - first_day).days) # Minimum 30 days to prevent inflation from brand new accounts
-        
-        total_income_received = income_df["amount"].sum()
-        daily_avg_income = total_income_received / total_days_active
-        estimated_monthly_income = daily_avg_income * DAYS_IN_MONTH
+    if user_id != DEFAULT_USER_ID and not os.path.exists(csv_path):
+        return TransactionStore(pd.DataFrame(columns=LEDGER_COLUMNS)), None
 
-    last_income_date = income_df["date"].max().strftime("%Y-%m-%d")
+    try:
+        digest = file_digest(csv_path)
+    except OSError:
+        digest = None
+    return TransactionStore(load_ledger_from_csv(csv_path)), digest
+
+# Isolation Forest fits can run on a thread/process pool: serial | thread | process
+ANALYSIS_BACKEND = os.getenv("ANALYSIS_BACKEND", "serial")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0")) or None
+
+# On-disk cache for the startup analytics, shared by all workers. Set RESULT_CACHE_DIR="" to disable.
+RESULT_CACHE = ResultCache(
+    os.getenv("RESULT_CACHE_DIR", os.path.join(BASE_DIR, '.cache')),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
 
-    return {
-        "income_type": income_type,
-        "estimated_monthly_income": round(float(estimated_monthly_income), 2),
-        "income_frequency": frequency,
-        "last_income_date": last_income_date
-    }
 
-INCOME_PROFILE = detect_income_type(pd.read_csv(os.path.join(DATA_DIR, "transactions.csv"), parse_dates=['date']))
-print(INCOME_PROFILE)
+def load_analytics(ledger, digest):
+    """
+    Returns (anomaly detector, ML results, income profile, income engine) for a TransactionStore.
+    Results are cached on disk keyed by the CSV contents and engine version,
+    so a tenant's first request is a cache load instead of a model fit.
+    """
+    cache_key = None
+    if digest:
+        cache_key = ResultCache.key(digest, ENGINE_VERSION, INCOME_ENGINE_VERSION, pd.__version__, package_version("scikit-learn"))
+
+    cached = RESULT_CACHE.get(cache_key) if cache_key else None
+    METRICS.inc("result_cache_lookups_total", result="hit" if cached is not None else "miss" if cache_key else "uncached")
+    if cached is not None:
+        print("Loaded analytics from result cache")
+        return cached
+
+    with span("analytics_build"):
+        # One private copy for both engines: fit() re-coerces its date and amount columns in place,
+        # which must not touch the store's frame and leaves the values the income engine reads unchanged
+        analysis_df = ledger.frame.copy()
+        # Keeps per-category state so appended transactions can be scored without a full re-run
+        detector = IncrementalAnomalyDetector(backend=ANALYSIS_BACKEND, max_workers=ANALYSIS_WORKERS)
+        ml_results = detector.fit(analysis_df)
+        # Keeps the deposits split into streams so new deposits only refresh the streams they touch
+        income_engine = IncomeEngine()
+        income_profile = income_engine.fit(analysis_df)
+
+    if cache_key:
+        RESULT_CACHE.set(cache_key, (detector, ml_results, income_profile, income_engine))
+    return detector, ml_results, income_profile, income_engine
+
+# --- Tenants ---
+# Each user's ledger loads on their first request and their analytics on first use;
+# the least recently used users are dropped once TENANT_MEMORY_MB is exceeded.
+TENANTS = TenantRegistry(
+    load_transaction_store,
+    load_analytics,
+    memory_budget_bytes=int(os.getenv("TENANT_MEMORY_MB", "512")) * 1024 * 1024,
+    max_tenants=int(os.getenv("TENANT_MAX", "64")),
+)
+
+# Endpoints that must answer without loading a ledger
+TENANTLESS_ENDPOINTS = {"readiness", "metrics", "profiler_start", "profiler_stop", "profiler_profile"}
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    # Streamed responses are timed to their first byte
+    if "request_start" in g:
+        METRICS.observe("http_request_duration_seconds", time.perf_counter() - g.request_start,
+                        method=request.method, endpoint=request.endpoint or "unmatched", status=response.status_code)
+    return response
+
+# Who a request is for. Users other than the default one are only served to a request that
+# authenticates with a bearer token signed with TENANT_AUTH_SECRET (see tenants.py), or, with
+# TRUST_USER_ID_HEADER=1, that names one in X-User-Id / ?user_id=. Only enable that behind a
+# proxy that authenticates users and sets the header itself.
+TENANT_AUTH_SECRET = os.getenv("TENANT_AUTH_SECRET") or None
+TRUST_USER_ID_HEADER = os.getenv("TRUST_USER_ID_HEADER") == "1"
+
+def request_user_id():
+    """Returns the user id the request is authorized for. Raises PermissionError for rejected credentials."""
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        if TENANT_AUTH_SECRET is None:
+            raise PermissionError("Token authentication is not configured")
+        user_id = verify_user_token(authorization[len("Bearer "):].strip(), TENANT_AUTH_SECRET)
+        if user_id is None:
+            raise PermissionError("Invalid or expired token")
+        return user_id
+
+    claimed = request.headers.get("X-User-Id") or request.args.get("user_id")
+    if claimed and claimed != DEFAULT_USER_ID:
+        if not TRUST_USER_ID_HEADER:
+            raise PermissionError("Selecting a user with X-User-Id is disabled; authenticate with a bearer token")
+        return claimed
+    return DEFAULT_USER_ID
+
+@app.before_request
+def resolve_tenant():
+    """Attaches the requesting user's Tenant to `g` (see request_user_id)."""
+    if request.endpoint in TENANTLESS_ENDPOINTS:
+        return None
+    try:
+        user_id = request_user_id()
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 401
+    try:
+        g.tenant = TENANTS.get(user_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-def calculate_financial_stats():
-    df = pd.DataFrame(TRANSACTIONS_DB)
-    df['date'] = pd.to_datetime(df['date'])
-    df['amount'] = pd.to_numeric(df['amount'])
+def calculate_financial_stats(tenant):
+    # Everything below reads the (month, type, category) aggregate index, not raw rows
+    transactions = tenant.store
+    monthly = transactions.monthly
 
     # 1. Basic Totals
-    total_deposited = df[df['type'] == 'deposit']['amount'].sum()
-    total_spent = df[df['type'] == 'withdrawal']['amount'].sum()
+    total_deposited = monthly.total(type='deposit')
+    total_spent = monthly.total(type='withdrawal')
     net_saved = total_deposited - total_spent
 
     # 2. Averages
-    if not df.empty:
-        days_diff = max(1, (df['date'].max() - df['date'].min()).days)
+    if len(transactions):
+        days_diff = monthly.span_days()
         # Approximate months based on date range
-        months_diff = max(1, (df['date'].max().year - df['date'].min().year) * 12 + df['date'].max().month - df['date'].min().month + 1)
+        months_diff = monthly.span_months()
         avg_monthly = total_spent / months_diff
         avg_daily = total_spent / days_diff
     else:
@@ -163,8 +247,7 @@ def calculate_financial_stats():
     current_month, current_year = now.month, now.year
     
     def get_month_spend(month, year):
-        mask = (df['date'].dt.month == month) & (df['date'].dt.year == year) & (df['type'] == 'withdrawal')
-        return df[mask]['amount'].sum()
+        return monthly.total(type='withdrawal', year=year, month=month)
 
     last_month_date = now.replace(day=1) - timedelta(days=1)
     last_month_spend = get_month_spend(last_month_date.month, last_month_date.year)
@@ -199,79 +282,293 @@ Your responses should be concise, conversational, and motivating with a maximum
 """
 
 VISUALIZATION_SYSTEM_PROMPT = """
-You are a data visualization expert. Your goal is to interpret a user's natural language request about their transaction data and return a JSON configuration that can be directly used by a charting library (Recharts).
+You are a data visualization expert. Your goal is to interpret a user's natural language request about their transaction data and translate it into a small query spec. The backend aggregates the data and builds the chart (Recharts) from your spec.
 
 Supported chart types: 'pie', 'bar', 'line'.
 
 Input:
 - User Prompt: What the user wants to see.
-- Transactions: The raw data.
+- Context: Today's date, the date range of the ledger and the available categories. You do NOT see the transactions.
 
 Output MUST be a raw JSON object with no markdown formatting.
 Structure:
 {
   "chartType": "pie" | "bar" | "line",
   "title": "A descriptive title based on the request",
-  "data": [ {"name": "Category or Date", "value": NumericalAmount} ],
-  "dataKey": "value" (key for numerical data),
-  "xAxisKey": "name" (key for categorical/date data),
-  "summary": "A very brief, one-sentence insight about this chart."
+  "groupBy": "category" | "description" | "day" | "week" | "month",
+  "metric": "sum" | "count" | "average",
+  "type": "withdrawal" | "deposit" | "all",
+  "categories": ["Category", ...] or null,
+  "descriptionContains": "merchant text" or null,
+  "startDate": "YYYY-MM-DD" or null,
+  "endDate": "YYYY-MM-DD" or null,
+  "topN": number or null
 }
 
 Rules:
-1. Aggregate data strictly based on the prompt (e.g., by category, by date).
-2. Filter data if requested (e.g., "only coffee", "in November").
-3. If the request is impossible, return {"error": "Cannot visualize this request."}
+1. Aggregate strictly based on the prompt (e.g., by category, by date). Use 'line' for trends over time.
+2. Filter if requested (e.g., "only coffee" -> categories ["Coffee"], "in November" -> that month's start and end dates). Only use categories from the provided list.
+3. Spending means type "withdrawal"; income or paychecks means "deposit".
+4. If the request is impossible, return {"error": "Cannot visualize this request."}
 """
 
 # --- Configure Gemini Model ---
-# Configure the API key
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# google.generativeai takes about a second to import, so it loads (and is configured
+# with the API key) on the first Gemini call or during the background warm-up.
+# GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8765) points it at another server over REST,
+# such as bench/fake_gemini_server.py.
+_GENAI = None
+_GENAI_LOCK = threading.Lock()
+
+def load_genai():
+    global _GENAI
+    with _GENAI_LOCK:
+        if _GENAI is None:
+            import google.generativeai as genai
+            endpoint = os.getenv("GEMINI_API_ENDPOINT")
+            if endpoint:
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport="rest",
+                                client_options={"api_endpoint": endpoint})
+            else:
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _GENAI = genai
+    return _GENAI
+
+class LazyGenerativeModel:
+    """A Gemini model that is only created on its first call."""
+
+    def __init__(self, name, system_instruction):
+        self.model_name = name if name.startswith("models/") else f"models/{name}"
+        self._name = name
+        self._system_instruction = system_instruction
+        self._model = None
+
+    def load(self):
+        if self._model is None:
+            self._model = load_genai().GenerativeModel(self._name, system_instruction=self._system_instruction)
+        return self._model
+
+    def generate_content(self, *args, **kwargs):
+        return self.load().generate_content(*args, **kwargs)
 
 # Initialize the model with the system prompt and use the 'gemini-flash-latest'
-model = genai.GenerativeModel(
-    'gemini-flash-latest',
-    system_instruction=SYSTEM_PROMPT
+model = LazyGenerativeModel('gemini-flash-latest', system_instruction=SYSTEM_PROMPT)
+viz_model = LazyGenerativeModel('gemini-flash-latest', system_instruction=VISUALIZATION_SYSTEM_PROMPT)
+
+# --- LLM Response Cache ---
+# Identical prompts for identical data (e.g. the /api/analyze summary) skip the network round trip.
+LLM_CACHE = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "256")),
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL", "3600")),
+    disk_dir=os.getenv("LLM_CACHE_DIR") or None,
 )
-viz_model = genai.GenerativeModel(
-    'gemini-flash-latest', 
-    system_instruction=VISUALIZATION_SYSTEM_PROMPT)
 
+# --- LLM Gateway ---
+# Every Gemini request goes through LLM_GATEWAY: per-model concurrency and rate limits,
+# retries with backoff inside a deadline, a circuit breaker, and identical concurrent
+# prompts sharing one call. The client library's own retry (up to 600s on 503s) is off,
+# so no request waits longer than LLM_DEADLINE_SECONDS.
+LLM_GATEWAY = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    rate=float(os.getenv("LLM_RATE_PER_MINUTE", "60")) / 60,
+    burst=int(os.getenv("LLM_BURST", "5")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20")),
+    deadline_seconds=float(os.getenv("LLM_DEADLINE_SECONDS", "45")),
+    breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    breaker_reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+)
 
-# --- Gemini API Logic ---
+def request_options(seconds):
+    return {"timeout": seconds, "retry": None}
 
-def call_gemini_forecast(goal_data):
-    """Calls Gemini to generate a human-friendly forecast message based on pre-calculated data."""
-    if not os.getenv("GEMINI_API_KEY"):
-         return {"error": "API_KEY is not set."}
+def generate_text(gen_model, system_prompt, prompt, timeout=None):
+    """
+    Returns the text of a Gemini response, served from LLM_CACHE when the same
+    model, system prompt and prompt were answered recently.
+    Returns None if the response was blocked; blocked responses are not cached.
+    The call goes through LLM_GATEWAY and gives up after `timeout` seconds
+    (LLM_DEADLINE_SECONDS by default), raising LLMUnavailableError.
+    """
+    key = LLM_CACHE.key(gen_model.model_name, system_prompt, prompt)
+    text = LLM_CACHE.get(key)
+    if text is not None:
+        return text
+
+    def attempt(seconds):
+        try:
+            with span("gemini_generate"):
+                response = gen_model.generate_content(prompt, request_options=request_options(seconds))
+        except Exception:
+            METRICS.inc("llm_calls_total", model=gen_model.model_name, outcome="error")
+            raise
+        if not response.parts:
+            METRICS.inc("llm_calls_total", model=gen_model.model_name, outcome="blocked")
+            return None
+        text = response.text
+        METRICS.inc("llm_calls_total", model=gen_model.model_name, outcome="ok")
+        METRICS.inc("llm_response_tokens_total", estimate_tokens(text), model=gen_model.model_name)
+        LLM_CACHE.set(key, text)
+        return text
+
+    return LLM_GATEWAY.call(gen_model.model_name, attempt, key=key, timeout=timeout)
+
+def stream_text(gen_model, system_prompt, prompt, timeout=None):
+    """
+    Yields the text of a Gemini response as it is generated. Cached responses are
+    yielded in one piece; a fully streamed response is added to LLM_CACHE.
+    The stream goes through LLM_GATEWAY (see generate_text).
+    """
+    key = LLM_CACHE.key(gen_model.model_name, system_prompt, prompt)
+    text = LLM_CACHE.get(key)
+    if text is not None:
+        yield text
+        return
+
+    def start(seconds):
+        for chunk in gen_model.generate_content(prompt, stream=True, request_options=request_options(seconds)):
+            if chunk.parts:
+                yield chunk.text
+
+    chunks = []
+    for text in LLM_GATEWAY.stream(gen_model.model_name, start, timeout=timeout):
+        chunks.append(text)
+        yield text
+    METRICS.inc("llm_calls_total", model=gen_model.model_name, outcome="ok" if chunks else "blocked")
+    if chunks:
+        text = "".join(chunks)
+        METRICS.inc("llm_response_tokens_total", estimate_tokens(text), model=gen_model.model_name)
+        LLM_CACHE.set(key, text)
+
+# --- Concurrent LLM Calls ---
+# Independent Gemini calls for one request run side by side, so latency tracks the slowest call.
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_WORKERS", "8")), thread_name_prefix="llm")
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", "20"))
+
+def run_llm_calls(calls, timeout):
+    """
+    Runs independent LLM calls concurrently on LLM_EXECUTOR.
+    `calls` maps a name to a zero-argument callable. Returns (results, timed_out):
+    results holds the value of each call that finished within `timeout` seconds
+    (None if it raised), and timed_out lists the calls that did not. Timed-out calls
+    are cancelled if they have not started; running ones finish in the background
+    and still fill LLM_CACHE, so a retry of the same request is fast.
+    """
+    futures = {name: LLM_EXECUTOR.submit(call) for name, call in calls.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    results, timed_out = {}, []
+    for name, future in futures.items():
+        if future in done:
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"LLM call '{name}' failed: {e}")
+                results[name] = None
+        else:
+            future.cancel()
+            timed_out.append(name)
+    return results, timed_out
+
+# --- Prompt Context Budgets ---
+# Ledger data is summarized into bounded sections so prompt size stays flat as history grows.
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1200"))
+SUBSCRIPTION_CONTEXT_TOKENS = int(os.getenv("SUBSCRIPTION_CONTEXT_TOKENS", "3000"))
+ANALYZE_TOP_ANOMALIES = int(os.getenv("ANALYZE_TOP_ANOMALIES", "15"))
+PROMPT_TOKENS = {} # key: prompt name, value: estimated tokens of the last prompt sent
 
+def record_prompt_tokens(name, prompt):
+    """Records the estimated token count of a prompt and returns it."""
+    tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS[name] = tokens
+    METRICS.inc("llm_prompt_tokens_total", tokens, prompt=name)
+    return tokens
+
+
+# --- Gemini API Logic ---
+
+def project_goal(goal_data, tenant):
+    """
+    Deterministic savings projection for a goal, from the income profile and current spending pace.
+    Returns a dict of the projection figures, or {"error": ...} if the goal or stats are unusable.
+    """
     # --- Financial Stats ---
-    stats = calculate_financial_stats()
+    stats = calculate_financial_stats(tenant)
     if not stats:
         return {"error": "Could not calculate financial metrics."}
-    
-    # --- 1. Deterministic Math (The Heavy Lifting) ---
+
     try:
         today = datetime.now()
         target_dt = datetime.strptime(goal_data['target_date'], "%Y-%m-%d")
         days_remaining = max(1, (target_dt - today).days)
-        
-        monthly_income = INCOME_PROFILE.get('estimated_monthly_income', 0)
+
+        monthly_income = tenant.income_profile.get('estimated_monthly_income', 0)
         daily_income = monthly_income / 30
         daily_spend = stats.get('avg_daily', 0)
-        
+
         # Calculate real daily surplus (savings pace)
         daily_surplus = daily_income - daily_spend
         projected_savings = daily_surplus * days_remaining
-        
+
         target_amount = float(goal_data['target_amount'])
         on_track = projected_savings >= target_amount
         shortfall = target_amount - projected_savings
-        
+
     except Exception as e:
         print(f"Forecast math error: {e}")
         return {"error": "Invalid goal dates or amounts."}
 
+    return {
+        "name": goal_data.get('name'),
+        "target_amount": target_amount,
+        "target_date": goal_data.get('target_date'),
+        "days_remaining": days_remaining,
+        "daily_income": daily_income,
+        "daily_spend": daily_spend,
+        "daily_surplus": daily_surplus,
+        "projected_savings": projected_savings,
+        "on_track": on_track,
+        "shortfall": shortfall,
+    }
+
+def describe_goal_projection(projection):
+    """One-line summary of a goal projection for the chat prompt."""
+    if projection is None:
+        return "None set"
+    if "error" in projection:
+        return f"Could not forecast goal ({projection['error']})"
+    status = "ON TRACK" if projection['on_track'] else "AT RISK"
+    return (
+        f"\"{projection['name']}\": ${projection['target_amount']:,.2f} by {projection['target_date']}"
+        f" ({projection['days_remaining']} days left). Saving ${projection['daily_surplus']:.2f}/day,"
+        f" projected ${projection['projected_savings']:,.2f}. Status: {status},"
+        f" shortfall ${max(0, projection['shortfall']):,.2f}."
+    )
+
+@timed()
+def call_gemini_forecast(goal_data, tenant, projection=None):
+    """
+    Calls Gemini to generate a human-friendly forecast message based on pre-calculated data.
+    Pass `projection` to reuse a project_goal() result that was already computed.
+    """
+    if not os.getenv("GEMINI_API_KEY"):
+         return {"error": "API_KEY is not set."}
+
+    # --- 1. Deterministic Math (The Heavy Lifting) ---
+    if projection is None:
+        projection = project_goal(goal_data, tenant)
+    if "error" in projection:
+        return projection
+
+    days_remaining = projection['days_remaining']
+    daily_income = projection['daily_income']
+    daily_spend = projection['daily_spend']
+    daily_surplus = projection['daily_surplus']
+    projected_savings = projection['projected_savings']
+    target_amount = projection['target_amount']
+    on_track = projection['on_track']
+    shortfall = projection['shortfall']
+
     # --- 2. Context-Aware Prompt ---
     user_prompt = f"""
     You are a financial coach AI. Generate a forecast message for a user's savings goal based on their ACTUAL current spending habits.
@@ -306,13 +603,14 @@ def call_gemini_forecast(goal_data):
     """
 
     try:
-        response = model.generate_content(user_prompt)
-        clean_json = response.text.replace('```json', '').replace('```', '').strip()
+        text = generate_text(model, SYSTEM_PROMPT, user_prompt)
+        clean_json = text.replace('```json', '').replace('```', '').strip()
         return json.loads(clean_json)
     except Exception as e:
         return {"error": f"AI forecast failed: {str(e)}"}
     
     
+@timed()
 def call_gemini_subscription_check(transactions):
     """Calls Gemini to find subscriptions in transaction history."""
     if not os.getenv("GEMINI_API_KEY"):
@@ -343,7 +641,8 @@ def call_gemini_subscription_check(transactions):
     * **DEDUPLICATE:** If multiple transactions belong to the same subscription (e.g., 12 charges for Netflix), return ONLY ONE entry representing the active subscription, ideally the most recent one.
     * If a vendor has MULTIPLE distinct subscriptions (e.g., standard Google Storage charge AND a separate YouTube Premium charge at different price points), keep both.
 
-    Transactions to analyze: {json.dumps(transactions)}
+    Transaction history, summarized (one line per vendor and amount: count, first..last date, typical gap):
+    {build_subscription_context(transactions, token_budget=SUBSCRIPTION_CONTEXT_TOKENS)["text"]}
 
     ### REQUIRED JSON FORMAT PER ITEM:
     {{
@@ -355,10 +654,10 @@ def call_gemini_subscription_check(transactions):
     "ai_note": "Short rationale (5-10 words)"
     }}
     """
-    
+    record_prompt_tokens("subscriptions", user_prompt)
+
     try:
-        response = model.generate_content(user_prompt)
-        text = response.text.strip()
+        text = generate_text(model, SYSTEM_PROMPT, user_prompt).strip()
 
         # This finds the first '[' and the last ']', ignoring everything else outside them.
         match = re.search(r'\[.*\]', text, re.DOTALL)
@@ -375,39 +674,274 @@ def call_gemini_subscription_check(transactions):
         print(f"Subscription check failed: {e}")
         return {"subscriptions": []}
 
-def call_gemini_visualization(user_prompt, transactions):
-    """Calls Gemini to generate visualization configuration."""
+# --- Subscription Detection ---
+# Recurring charges are detected locally; the Gemini scan only enriches them in the background.
+def get_recurring_charges(transactions):
+    """Deterministic recurring-charge list for a ledger (memoized until it changes)."""
+    return transactions.cached("recurring_charges", lambda: detect_recurring_charges(transactions.frame))
+
+def _run_subscription_enrichment(tenant, version):
+    enrichment = tenant.subscription_enrichment
+    result = {}
+    try:
+        result = call_gemini_subscription_check(tenant.store)
+    finally:
+        # Cleared even if the scan raised, so the next request can schedule another one
+        with tenant.lock:
+            enrichment["running"] = False
+            if result.get("subscriptions"):
+                enrichment["version"] = version
+                enrichment["subscriptions"] = result["subscriptions"]
+
+def get_enriched_subscriptions(tenant):
+    """
+    Returns the Gemini subscription list for the tenant's current ledger if it is ready.
+    Otherwise starts the scan in a background thread (at most one per tenant) and returns None.
+    """
     if not os.getenv("GEMINI_API_KEY"):
-        return {"error": "GEMINI_API_KEY is not set."}
+        return None
+
+    version = tenant.store.version
+    enrichment = tenant.subscription_enrichment
+    with tenant.lock:
+        if enrichment["version"] == version:
+            return enrichment["subscriptions"]
+        if not enrichment["running"]:
+            enrichment["running"] = True
+            threading.Thread(target=_run_subscription_enrichment, args=(tenant, version), daemon=True).start()
+    return None
+
+@timed()
+def call_gemini_visualization(user_prompt, transactions):
+    """
+    Builds a visualization for a natural language request. Gemini only translates
+    the request into a small query spec (falling back to keyword parsing without an
+    API key); the chart data is aggregated locally, so latency does not grow with the ledger.
+    """
+    df = transactions.frame
+    known_categories = [str(name) for name in pd.unique(np.asarray(df['category'], dtype=object))]
 
-    full_prompt = f"""
+    spec = None
+    if os.getenv("GEMINI_API_KEY"):
+        date_range = f"{df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d}" if len(df) else "empty"
+        full_prompt = f"""
     User Request: '{user_prompt}'
-    Transaction Data: {json.dumps(transactions)}
+    Today's Date: {datetime.now():%Y-%m-%d}
+    Ledger Date Range: {date_range}
+    Available Categories: {json.dumps(known_categories)}
     """
+        try:
+            text = generate_text(viz_model, VISUALIZATION_SYSTEM_PROMPT, full_prompt)
+            if text is None: return {"error": "AI response blocked."}
+
+            # Clean up response
+            text = text.strip()
+            if text.startswith("```json"):
+                 text = text[7:]
+            elif text.startswith("```"):
+                 text = text[3:]
+                 
+            if text.endswith("```"):
+                 text = text[:-3]
+
+            spec = json.loads(text.strip())
+        except Exception as e:
+            print(f"Visualization spec from Gemini failed, using keyword parser: {e}")
+
+    if spec is None:
+        spec = parse_chart_request(user_prompt, known_categories)
+
+    try:
+        spec = normalize_spec(spec, known_categories)
+    except (ValueError, TypeError, OverflowError) as e:
+        return {"visualization": {"error": str(e) or "Cannot visualize this request."}}
 
     try:
-        response = viz_model.generate_content(full_prompt)
-        if not response.parts: return {"error": "AI response blocked."}
-
-        # Clean up response
-        text = response.text.strip()
-        if text.startswith("```json"):
-             text = text[7:]
-        elif text.startswith("```"):
-             text = text[3:]
-             
-        if text.endswith("```"):
-             text = text[:-3]
-
-        return {"visualization": json.loads(text.strip())}
+        return {"visualization": build_chart(df, spec, aggregates=transactions.monthly)}
     except Exception as e:
         return {"error": f"Visualization generation failed: {str(e)}"}
 
 # --- API Endpoint ---
 
+# --- Transaction Pages ---
+TRANSACTIONS_PAGE_SIZE = int(os.getenv("TRANSACTIONS_PAGE_SIZE", "100"))
+TRANSACTIONS_MAX_PAGE_SIZE = int(os.getenv("TRANSACTIONS_MAX_PAGE_SIZE", "1000"))
+COMPRESS_MIN_BYTES = 1024
+
+def encode_cursor(key):
+    """Opaque cursor for a (date ns, row) page key."""
+    return base64.urlsafe_b64encode(f"{key[0]}:{key[1]}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        date_ns, row = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        return int(date_ns), int(row)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def parse_transaction_query(args):
+    """
+    Reads paging and filter parameters (limit, cursor, start_date, end_date, type,
+    category, min_amount, max_amount, description, q) from a query string.
+    Raises ValueError for malformed values.
+    """
+    def number(name, cast):
+        value = args.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be a number")
+
+    def date(name):
+        value = args.get(name)
+        if not value:
+            return None
+        try:
+            return pd.Timestamp(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format")
+
+    limit = number("limit", int)
+    if limit is None:
+        limit = TRANSACTIONS_PAGE_SIZE
+    if not 1 <= limit <= TRANSACTIONS_MAX_PAGE_SIZE:
+        raise ValueError(f"'limit' must be between 1 and {TRANSACTIONS_MAX_PAGE_SIZE}")
+    tx_type = args.get("type") or None
+    if tx_type is not None and tx_type not in ("withdrawal", "deposit"):
+        raise ValueError("'type' must be 'withdrawal' or 'deposit'")
+
+    categories = [c.strip() for value in args.getlist("category") for c in value.split(",") if c.strip()]
+    return {
+        "limit": limit,
+        "after": decode_cursor(args["cursor"]) if args.get("cursor") else None,
+        "start": date("start_date"),
+        "end": date("end_date"),
+        "filters": {
+            "type": tx_type,
+            "categories": categories or None,
+            "min_amount": number("min_amount", float),
+            "max_amount": number("max_amount", float),
+            "description": args.get("description") or None,
+            "query": args.get("q") or None,
+        },
+    }
+
+def compress_response(response):
+    """Compresses a buffered 200 response with brotli (if installed) or gzip, per Accept-Encoding."""
+    response.vary.add("Accept-Encoding")
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    if brotli is not None and request.accept_encodings["br"]:
+        response.set_data(brotli.compress(data, quality=5))
+        response.headers["Content-Encoding"] = "br"
+    elif request.accept_encodings["gzip"]:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    return jsonify(TRANSACTIONS_DB)
+    """
+    One newest-first page of the user's transactions, optionally filtered.
+    Returns {"transactions": [...], "next_cursor"}; pass next_cursor back as
+    ?cursor= for the following page (it is null on the last page).
+    """
+    try:
+        query = parse_transaction_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    store = g.tenant.store
+    page, last_key = store.page(
+        after=query["after"],
+        limit=query["limit"],
+        start=query["start"],
+        end=query["end"],
+        row_filter=store.row_filter(**query["filters"]),
+    )
+    next_cursor = encode_cursor(last_key) if last_key is not None else None
+    body = f'{{"transactions":{records_json(page)},"next_cursor":{json.dumps(next_cursor)}}}'
+
+    response = app.response_class(body, mimetype='application/json')
+    # Weak: the gzip/brotli variants share the tag of the uncompressed body
+    response.add_etag(weak=True)
+    response.make_conditional(request)
+    return compress_response(response)
+
+
+# --- Bulk Ingestion ---
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", str(INGEST_CHUNK_ROWS)))
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", str(INGEST_MAX_ROWS)))
+
+def persist_transactions(csv_path, batch):
+    """Appends transactions to a ledger CSV, creating it (with a header) if needed."""
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+    with open(csv_path, 'a+b') as file:
+        if exists:
+            # Don't glue the first new row onto a last line without a newline
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+        write_ledger_rows(file, batch, header=not exists)
+
+def append_transactions(tenant, batch):
+    """
+    Appends validated transactions to a tenant's ledger, skipping ids it already has.
+    The CSV on disk, the store and its aggregate index are updated, and if the
+    analytics are loaded the new rows are scored incrementally and the income
+    profile is refreshed. Returns (rows appended, duplicate rows skipped, new anomalies).
+    """
+    with tenant.lock:
+        store = tenant.store
+        known_ids = store.cached("sorted_ids", lambda: np.sort(store.frame['id'].to_numpy()))
+        batch, duplicates = drop_duplicate_ids(batch, known_ids)
+        if batch.empty:
+            return 0, duplicates, []
+
+        csv_path, _ = ledger_paths(tenant.user_id)
+        persist_transactions(csv_path, batch)
+        store.append(batch)
+
+        new_anomalies = []
+        if tenant.analytics_loaded:
+            detector, _, income_profile, income_engine = tenant.analytics
+            new_anomalies = detector.update(batch)
+            if (batch['type'] == 'deposit').any():
+                income_profile = income_engine.update(batch)
+            tenant.set_analytics((detector, detector.results(), income_profile, income_engine))
+        # The on-disk digest no longer matches, so a later reload recomputes instead of using the result cache
+        tenant.ledger_changed(digest=None)
+    return len(batch), duplicates, new_anomalies
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+def ingest_transactions():
+    """
+    Bulk ingestion of CSV (text/csv) or newline-delimited JSON (application/x-ndjson).
+    The body is parsed as a stream in INGEST_CHUNK_ROWS chunks, validated against
+    the ledger schema and spooled to disk (see read_upload); rows whose id is already
+    stored (or repeated) are skipped, and the rest are appended in one batch without a
+    restart. Uploads over INGEST_MAX_ROWS rows get 413. Returns per-upload counts,
+    including how many of the new rows were flagged as anomalies.
+    """
+    fmt = request.args.get("format") or ("ndjson" if "json" in (request.mimetype or "") else "csv")
+    try:
+        batch, report = read_upload(request.stream, fmt, INGEST_CHUNK_ROWS, INGEST_MAX_ROWS)
+    except UploadTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    appended, duplicates, new_anomalies = append_transactions(g.tenant, batch)
+    report["accepted"] = appended
+    report["duplicates"] += duplicates
+    return jsonify({**report, "new_anomalies": len(new_anomalies), "total_transactions": len(g.tenant.store)})
 
 
 @app.route('/api/forecast', methods=['POST'])
@@ -422,77 +956,38 @@ def forecast_goal():
 
     goal_data = {"name": goal_name, "target_amount": goal_amount, "target_date": goal_date}
 
-    return jsonify(call_gemini_forecast(goal_data))
+    return jsonify(call_gemini_forecast(goal_data, g.tenant))
 
 
 @app.route('/api/subscriptions', methods=['POST'])
 def check_subscriptions():
-    """API endpoint to trigger the subscription check."""
-    return jsonify(call_gemini_subscription_check(TRANSACTIONS_DB))
+    """
+    API endpoint to trigger the subscription check.
+    Serves the AI-enriched list once the background scan has finished, and the local detector's list until then.
+    """
+    enriched = get_enriched_subscriptions(g.tenant)
+    if enriched:
+        return jsonify({"subscriptions": enriched, "source": "ai"})
+    return jsonify({"subscriptions": get_recurring_charges(g.tenant.store), "source": "local"})
 
 # --- Global memory (temporary; use a database like Redis for production) ---
 @app.route('/api/visualize', methods=['POST'])
 def visualize():
     d = request.get_json()
-    return jsonify(call_gemini_visualization(d.get('prompt'), TRANSACTIONS_DB))
+    return jsonify(call_gemini_visualization(d.get('prompt'), g.tenant.store))
 
 
-def extract_goal_from_message(message: str):
+@timed("json_serialize")
+def dumps_with_anomalies(data, anomalies):
     """
-    Extracts a goal (amount + target date) from a user's natural language message.
-    Handles phrases like:
-      - "save $500 by March"
-      - "reach 2k next month"
-      - "hit my $1500 goal before July 2025"
-      - "save up 3 grand in 3 months"
-    Returns a dict with name, target_amount, and target_date if found.
+    json.dumps(data) with an "anomalies" key holding an AnomalyTable's pre-serialized list.
+    `data` must be a dict without an "anomalies" key; the list is spliced in before its closing brace.
     """
-    message = message.lower().strip()
-
-    # --- Find the amount ---
-    amount_match = re.search(r"(\$?\s?\d{1,3}(?:[,\d]{3})*(?:\.\d{1,2})?)|(\d+(?:\s?grand|k|bucks))", message)
-    target_amount = None
-    if amount_match:
-        amt_str = amount_match.group(0)
-        amt_str = amt_str.replace("$", "").replace(",", "").strip()
-
-        if "grand" in amt_str:
-            target_amount = float(re.findall(r"\d+", amt_str)[0]) * 1000
-        elif "k" in amt_str:
-            target_amount = float(re.findall(r"\d+", amt_str)[0]) * 1000
-        else:
-            target_amount = float(re.findall(r"\d+(?:\.\d+)?", amt_str)[0])
-
-    # --- Find the date / timeframe ---
-    date_phrases = [
-        r"(by|before|until)\s+([A-Za-z]+\s+\d{4}|\d{4}-\d{2}-\d{2}|next\s+month|next\s+year|this\s+month|in\s+\d+\s+(?:months|weeks))",
-        r"(in\s+\d+\s+(?:months|weeks))",
-        r"(next\s+(?:month|year))",
-        r"(by\s+[A-Za-z]+)"
-    ]
-
-    target_date = None
-    for pattern in date_phrases:
-        match = re.search(pattern, message)
-        if match:
-            time_str = match.group(0)
-            parsed_date = dateparser.parse(time_str)
-            if parsed_date:
-                target_date = parsed_date
-                break
-
-    # Default to 3 months ahead if no date
-    if not target_date:
-        target_date = datetime.now() + relativedelta(months=3)
-
-    if target_amount:
-        return {
-            "name": "User-specified savings goal",
-            "target_amount": target_amount,
-            "target_date": target_date.strftime("%Y-%m-%d")
-        }
-
-    return None
+    if not isinstance(data, dict) or "anomalies" in data:
+        raise ValueError("dumps_with_anomalies needs a dict without an 'anomalies' key")
+    body = json.dumps(data, default=str)
+    separator = ", " if data else ""
+    return f'{body[:-1]}{separator}"anomalies": {anomalies.json}}}'
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_spending():
@@ -501,14 +996,15 @@ def analyze_spending():
     then summarizes findings with AI.
     """
     try:
-        anomalies = ML_RESULTS.get("anomalies", [])
+        ml_results = g.tenant.ml_results
+        anomalies = ml_results["anomalies"]
 
         llm_prompt = f"""
         You are an intelligent Financial Transaction Detective.
         Your goal is to interpret "anomalous" transactions flagged by a statistical model and explain them to a regular user in plain, helpful English.
 
         ### INPUT DATA
-        Raw Anomalies Detected: {json.dumps(anomalies)}
+        Most Severe Anomalies Detected ({min(len(anomalies), ANALYZE_TOP_ANOMALIES)} of {len(anomalies)}): {json.dumps(compact_anomalies(anomalies, ANALYZE_TOP_ANOMALIES), default=str)}
 
         ### ANALYSIS GOALS
         1. **Categorize the Anomaly:** For each flagged transaction, determine *why* it might be weird based on standard financial patterns:
@@ -545,73 +1041,74 @@ def analyze_spending():
         ]
         }}
         """
+        record_prompt_tokens("analyze", llm_prompt)
         # 3. Generate AI Summary of the ML results
-        llm_response = model.generate_content(llm_prompt)
-        if "error" in llm_response:
-             print(f"LLM Summary Error: {llm_response['error']}")
-             # Fallback: return ML results even if LLM fails
-             llm_response = {"insight": "AI summary temporarily unavailable."}
+        # The ML results rarely change, so repeat page loads are served from LLM_CACHE
+        try:
+            summary = (generate_text(model, SYSTEM_PROMPT, llm_prompt) or "").strip()
+        except Exception as e:
+            print(f"LLM Summary Error: {e}")
+            summary = ""
+        if not summary:
+            # Fallback: return ML results even if LLM fails
+            summary = "AI summary temporarily unavailable."
         
-        return jsonify({
-            "raw_insights": ML_RESULTS.get("insights", []),
-            "anomalies": ML_RESULTS.get("anomalies", []),
-            "summary": llm_response.text.strip()
-        })
+        body = dumps_with_anomalies({
+            "raw_insights": ml_results.get("insights", []),
+            "summary": summary
+        }, anomalies)
+        return app.response_class(body, mimetype='application/json')
 
     except Exception as e:
         print(f"Critical Analysis Failure: {e}")
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
 
-CHAT_HISTORY = {} # key: session_id, value: list of {"role": "user"/"assistant", "content": str}
+# --- Chat History ---
+# Only the last CHAT_HISTORY_MESSAGES messages per session are kept; idle sessions expire.
+# CHAT_STORE=sqlite shares history between workers through a local SQLite file.
+CHAT_CONTEXT_MESSAGES = 5
+CHAT_STORE = os.getenv("CHAT_STORE", "memory")
+CHAT_STORE_OPTIONS = {
+    "max_messages": int(os.getenv("CHAT_HISTORY_MESSAGES", "10")),
+    "max_sessions": int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+    "idle_ttl_seconds": int(os.getenv("CHAT_SESSION_TTL", "3600")),
+}
+if CHAT_STORE == "sqlite":
+    CHAT_STORE_OPTIONS["path"] = os.getenv("CHAT_STORE_PATH", os.path.join(BASE_DIR, '.cache', 'chat_history.sqlite3'))
+CHAT_HISTORY = create_session_store(CHAT_STORE, **CHAT_STORE_OPTIONS)
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
+CHAT_VISUAL_KEYWORDS = ["chart", "graph", "plot", "visualize", "visual"]
+
+def prepare_chat_turn(tenant, user_message, session_id):
     """
-    AI-powered chatbot endpoint.
-    Accepts a user message and returns:
-    - A conversational response
-    - ML insights / anomalies
-    - Optional chart data if requested
+    Builds the coach prompt for a chat message and the side calls it needs.
+    Returns (llm_prompt, side_calls), where side_calls maps "forecast" and/or
+    "visualization" to zero-argument callables that are independent of the reply.
     """
-    data = request.get_json()
-    user_message = data.get("message", "").strip()
-    session_id = data.get("session_id", "default_user")  # Unique ID for each chat user/session
-
-    if not user_message:
-        return jsonify({"error": "Empty message"}), 400
-
-    # --- Initialize chat history if not present ---
-    if session_id not in CHAT_HISTORY:
-        CHAT_HISTORY[session_id] = []
-
-    # --- 1. Load transactions and analyze anomalies ---
-    anomalies = ML_RESULTS.get("anomalies", [])
-    raw_insights = ML_RESULTS.get("insights", [])
-
      # --- Detect savings goal ---
+    # The projection is computed locally, so the forecast message does not block the reply prompt
     goal_data = extract_goal_from_message(user_message)
-    forecast_result = None
-    if goal_data:
-        forecast_result = call_gemini_forecast(goal_data)
+    goal_projection = project_goal(goal_data, tenant) if goal_data else None
 
-    # --- 2. Build a context-aware prompt ---
-    # Limit to last 5 messages to control token size
-    history_context = CHAT_HISTORY[session_id][-5:]
+    # --- Build a context-aware prompt ---
+    # Limit to last CHAT_CONTEXT_MESSAGES messages to control token size
+    history_context = CHAT_HISTORY.recent(chat_session_key(tenant, session_id), CHAT_CONTEXT_MESSAGES)
     formatted_history = "\n".join(
         [f"{msg['role'].capitalize()}: {msg['content']}" for msg in history_context]
     )
 
-    # --- 2. Generate AI Coach response ---
+    financial_context = build_coach_context(
+        tenant.store, tenant.ml_results, tenant.income_profile, get_recurring_charges(tenant.store),
+        token_budget=CHAT_CONTEXT_TOKENS,
+    )
     llm_prompt = f"""
     You are a friendly, data-driven AI financial coach.
     You are chatting with a user about their money goals and habits.
 
     === FINANCIAL DATA (THE SOURCE OF TRUTH) ===
-    Income Profile: {INCOME_PROFILE}
-    Recent Spending Insights: {json.dumps(raw_insights)}
-    Detected Anomalies: {json.dumps(anomalies, default=str)}
-    Recent anomalies (high spending events): {json.dumps(anomalies[:5], default=str)}
-    Current Goal Status: {forecast_result if forecast_result else "None set"}
+    {financial_context["text"]}
+
+    Current Goal Status: {describe_goal_projection(goal_projection)}
 
     Conversation so far: {formatted_history}
     
@@ -627,59 +1124,307 @@ def chat():
     5. If the user asks for anomalies, provide 1-2 instances of anomalous transactions and their details.
     6. Stay under 3 sentences.
     """
-    llm_response = model.generate_content(llm_prompt)
+    record_prompt_tokens("chat", llm_prompt)
+
+    side_calls = {}
+    if goal_projection is not None and "error" not in goal_projection:
+        side_calls["forecast"] = lambda: call_gemini_forecast(goal_data, tenant, goal_projection)
+    if any(keyword in user_message.lower() for keyword in CHAT_VISUAL_KEYWORDS):
+        side_calls["visualization"] = lambda: call_gemini_visualization(user_message, tenant.store)
+    return llm_prompt, side_calls
+
+def chat_fallback_reply(timed_out):
+    if timed_out:
+        return "Sorry, that took longer than expected. Please try again."
+    return "Sorry, I ran into an issue processing that request."
+
+def chat_session_key(tenant, session_id):
+    # Session ids come from the client, so scope them to the user
+    return f"{tenant.user_id}:{session_id}"
+
+def save_chat_turn(tenant, session_id, user_message, bot_reply):
+    """Stores a user/assistant exchange and returns the session's total message count."""
+    return CHAT_HISTORY.append(
+        chat_session_key(tenant, session_id),
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": bot_reply},
+    )
 
-    # --- Generate LLM response ---
-    try:
-        llm_response = model.generate_content(llm_prompt)
-        bot_reply = llm_response.text.strip()
-    except Exception as e:
-        print(f"Gemini API error: {e}")
-        bot_reply = "Sorry, I ran into an issue processing that request."
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    """
+    AI-powered chatbot endpoint.
+    Accepts a user message and returns:
+    - A conversational response
+    - ML insights / anomalies
+    - Optional chart data if requested
+    """
+    data = request.get_json()
+    user_message = data.get("message", "").strip()
+    session_id = data.get("session_id", "default_user")  # Unique ID for each chat user/session
+
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    tenant = g.tenant
+    anomalies = tenant.ml_results["anomalies"]
+    raw_insights = tenant.ml_results.get("insights", [])
+
+    llm_prompt, side_calls = prepare_chat_turn(tenant, user_message, session_id)
+
+    # --- Generate the reply, forecast and optional visualization concurrently ---
+    def generate_reply():
+        return generate_text(model, SYSTEM_PROMPT, llm_prompt, timeout=CHAT_TIMEOUT_SECONDS).strip()
+
+    results, timed_out = run_llm_calls({"reply": generate_reply, **side_calls}, CHAT_TIMEOUT_SECONDS)
+
+    bot_reply = results.get("reply") or chat_fallback_reply("reply" in timed_out)
+    forecast = results.get("forecast") or {}
+    visualization = results.get("visualization") or {}
 
     # --- Save to chat memory ---
-    CHAT_HISTORY[session_id].append({"role": "user", "content": user_message})
-    CHAT_HISTORY[session_id].append({"role": "assistant", "content": bot_reply})
+    history_length = save_chat_turn(tenant, session_id, user_message, bot_reply)
 
-    # --- 3. Optional: Generate visualization if message mentions chart/graph ---
-    visualization = {}
-    if any(keyword in user_message.lower() for keyword in ["chart", "graph", "plot", "visualize", "visual"]):
-        visualization = call_gemini_visualization(user_message, TRANSACTIONS_DB)
-    
-    return jsonify({
+    body = dumps_with_anomalies({
     "reply": bot_reply,
-    "ml_insights": json.loads(json.dumps(raw_insights, default=str)),
-    "anomalies": json.loads(json.dumps(anomalies, default=str)),
+    "ml_insights": raw_insights,
     "visualization": visualization.get("visualization", {}),
+    "forecast": forecast if "error" not in forecast else {},
+    "timed_out": timed_out,
     "session_id": session_id,
-    "history_length": len(CHAT_HISTORY[session_id])
-})
+    "history_length": history_length
+}, anomalies)
+    return app.response_class(body, mimetype='application/json')
+
+def sse_event(event, data):
+    """Formats one server-sent event with a JSON payload (an object, or an already-serialized string)."""
+    if not isinstance(data, str):
+        data = json.dumps(data, default=str)
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat using server-sent events.
+    Emits `token` events ({"text"}) as Gemini generates the reply, then trailing
+    `insights` ({"ml_insights", "anomalies"}), `forecast` and `visualization` events,
+    and finally `done` ({"session_id", "history_length", "timed_out"}).
+    The forecast and visualization calls start before the reply streams.
+    """
+    data = request.get_json()
+    user_message = data.get("message", "").strip()
+    session_id = data.get("session_id", "default_user")
+
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    tenant = g.tenant
+    llm_prompt, side_calls = prepare_chat_turn(tenant, user_message, session_id)
+    deadline = time.monotonic() + CHAT_TIMEOUT_SECONDS
+    futures = {name: LLM_EXECUTOR.submit(call) for name, call in side_calls.items()}
+
+    def events():
+        chunks = []
+        try:
+            for text in stream_text(model, SYSTEM_PROMPT, llm_prompt, timeout=CHAT_TIMEOUT_SECONDS):
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+                if time.monotonic() > deadline:
+                    break
+        except Exception as e:
+            print(f"Gemini streaming error: {e}")
+
+        timed_out = []
+        bot_reply = "".join(chunks).strip()
+        if not bot_reply:
+            bot_reply = chat_fallback_reply(time.monotonic() > deadline)
+            yield sse_event("token", {"text": bot_reply})
+        elif time.monotonic() > deadline:
+            timed_out.append("reply")
+        history_length = save_chat_turn(tenant, session_id, user_message, bot_reply)
+
+        yield sse_event("insights", dumps_with_anomalies(
+            {"ml_insights": tenant.ml_results.get("insights", [])}, tenant.ml_results["anomalies"]
+        ))
+
+        wait(futures.values(), timeout=max(0, deadline - time.monotonic()))
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                timed_out.append(name)
+                continue
+            try:
+                result = future.result() or {}
+            except Exception as e:
+                print(f"LLM call '{name}' failed: {e}")
+                continue
+            if name == "forecast" and "error" not in result:
+                yield sse_event("forecast", result)
+            elif name == "visualization" and result.get("visualization"):
+                yield sse_event("visualization", result["visualization"])
+
+        yield sse_event("done", {
+            "session_id": session_id,
+            "history_length": history_length,
+            "timed_out": timed_out,
+        })
+
+    return app.response_class(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Returns pre-calculated dashboard statistics."""
     # 1. Calculate base stats
-    stats = calculate_financial_stats()
+    stats = calculate_financial_stats(g.tenant)
     
-    # 2. Get subscriptions for the "Monthly Fixed" calculation
-    subs_data = call_gemini_subscription_check(TRANSACTIONS_DB)
-    total_subs = sum(item['amount'] for item in subs_data.get('subscriptions', []))
+    # 2. Get subscriptions for the "Monthly Fixed" calculation (local detector, no LLM round trip)
+    total_subs = sum(item['monthly_amount'] for item in get_recurring_charges(g.tenant.store))
 
     # 3. Calculate Housing/Utilities average
-    df = pd.DataFrame(TRANSACTIONS_DB)
-    df['date'] = pd.to_datetime(df['date'])
-    months_diff = max(1, (df['date'].max().year - df['date'].min().year) * 12 + df['date'].max().month - df['date'].min().month + 1)
+    monthly = g.tenant.store.monthly
+    months_diff = monthly.span_months()
     
     fixed_cats = ['Housing', 'Utilities']
-    fixed_spend = df[(df['type'] == 'withdrawal') & (df['category'].isin(fixed_cats))]['amount'].sum()
+    fixed_spend = monthly.total(type='withdrawal', categories=fixed_cats)
     avg_fixed_spend = fixed_spend / months_diff
 
     # 4. Finalize Monthly Fixed
     stats['totalMonthlyFixed'] = round(total_subs + avg_fixed_spend, 2)
 
+    # 5. Spending by category for the dashboard chart (the transaction list itself is paged)
+    by_category = monthly.rollup('category', type='withdrawal')['amount']
+    stats['spending_by_category'] = {category: round(float(amount), 2) for category, amount in by_category.items()}
+
     return jsonify(stats)
 
+@app.route('/api/income', methods=['GET'])
+def get_income():
+    """Returns the income profile with its per-stream breakdown (largest streams first)."""
+    return jsonify(g.tenant.income_profile)
+
+# --- Startup ---
+# STARTUP_MODE=background (default): the module imports quickly, and heavy libraries,
+# the default ledger and its analytics load on a background thread once the server is
+# up (see gunicorn.conf.py) or on first use. STARTUP_MODE=eager: everything loads
+# before this module finishes importing, as a blocking warm-up.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+
+def _warm_libraries():
+    from sklearn.ensemble import IsolationForest  # noqa: F401
+    load_genai()
+
+def _warm_default_tenant():
+    TENANTS.get(DEFAULT_USER_ID).analytics
+
+WARMUP = Warmup([
+    ("ledger", lambda: TENANTS.get(DEFAULT_USER_ID)),
+    ("analytics", _warm_default_tenant),
+    ("libraries", _warm_libraries),
+])
+
+def start_warmup():
+    """Starts the background warm-up (once); called by the server after it starts listening."""
+    return WARMUP.start()
+
+@app.route('/api/ready', methods=['GET'], endpoint="readiness")
+def readiness():
+    """
+    Readiness probe: 200 once the warm-up has finished, 503 while it is running
+    (or if a step failed). The first probe starts the warm-up if the server did not.
+    """
+    start_warmup()
+    report = WARMUP.report()
+    return jsonify(report), 200 if report["status"] == "ready" else 503
+
+# --- Metrics ---
+# Prometheus text at /metrics: request latency per endpoint, span_duration_seconds for the
+# Gemini calls, ML stages and ledger/DataFrame builds, LLM token and call counts, and
+# cache, tenant and warm-up state. Each gunicorn worker reports its own numbers.
+METRICS.describe("http_request_duration_seconds", "histogram", "Request latency by endpoint (to the first byte for streams).")
+METRICS.describe("llm_calls_total", "counter", "Gemini calls that reached the API, by outcome.")
+METRICS.describe("llm_prompt_tokens_total", "counter", "Estimated prompt tokens sent, by prompt.")
+METRICS.describe("llm_response_tokens_total", "counter", "Estimated response tokens received, by model.")
+METRICS.describe("llm_retries_total", "counter", "Gemini calls retried after a transient failure, by model.")
+METRICS.describe("llm_coalesced_total", "counter", "Gemini calls that shared an identical in-flight call, by model.")
+METRICS.describe("llm_rejected_total", "counter", "Gemini calls the gateway gave up on before sending, by reason.")
+METRICS.describe("llm_circuit_opened_total", "counter", "Times a model's circuit breaker opened.")
+METRICS.describe("llm_circuit_open", "gauge", "1 while a model's circuit breaker rejects calls.")
+METRICS.describe("llm_cache_hits_total", "counter", "LLM response cache hits.")
+METRICS.describe("llm_cache_misses_total", "counter", "LLM response cache misses.")
+METRICS.describe("result_cache_lookups_total", "counter", "Analytics result cache lookups, by result.")
+METRICS.describe("tenant_loads_total", "counter", "Tenant ledgers loaded.")
+METRICS.describe("tenant_evictions_total", "counter", "Tenants dropped to stay within the memory budget.")
+
+@METRICS.collector
+def _collect_app_state():
+    cache = LLM_CACHE.stats()
+    tenants = TENANTS.stats()
+    gateway = LLM_GATEWAY.stats()["models"]
+    return [
+        ("llm_cache_hits_total", {}, cache["hits"]),
+        ("llm_cache_misses_total", {}, cache["misses"]),
+        ("llm_cache_entries", {}, cache["entries"]),
+        ("tenants_loaded", {}, tenants["tenants"]),
+        ("tenant_memory_bytes", {}, tenants["memory_bytes"]),
+        ("tenant_memory_budget_bytes", {}, tenants["memory_budget_bytes"]),
+        ("tenant_loads_total", {}, tenants["loads"]),
+        ("tenant_evictions_total", {}, tenants["evictions"]),
+        ("warmup_ready", {}, int(WARMUP.ready)),
+        ("profiler_running", {}, int(PROFILER.running)),
+        *[("llm_in_flight", {"model": name}, lane["in_flight"]) for name, lane in gateway.items()],
+        *[("llm_circuit_open", {"model": name}, int(lane["circuit"] == "open")) for name, lane in gateway.items()],
+        *[("llm_last_prompt_tokens", {"prompt": name}, tokens) for name, tokens in list(PROMPT_TOKENS.items())],
+    ]
+
+@app.route('/metrics', methods=['GET'], endpoint="metrics")
+def metrics():
+    return app.response_class(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+# Sampling profiler, switched on and off at runtime. The endpoints exist only with PROFILER_ENABLED=1.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER = SamplingProfiler()
+
+def _profiler_disabled():
+    return jsonify({"error": "The profiler is disabled; set PROFILER_ENABLED=1."}), 404
+
+@app.route('/debug/profiler/start', methods=['POST'], endpoint="profiler_start")
+def start_profiler():
+    """Starts sampling stacks (every ?interval_ms=, default 5) into a new profile."""
+    if not PROFILER_ENABLED:
+        return _profiler_disabled()
+    try:
+        interval_ms = float(request.args.get("interval_ms", "5"))
+    except ValueError:
+        return jsonify({"error": "'interval_ms' must be a number"}), 400
+    if not 0.5 <= interval_ms <= 1000:
+        return jsonify({"error": "'interval_ms' must be between 0.5 and 1000"}), 400
+    PROFILER.start(interval_ms / 1000)
+    return jsonify(PROFILER.report())
+
+@app.route('/debug/profiler/stop', methods=['POST'], endpoint="profiler_stop")
+def stop_profiler():
+    if not PROFILER_ENABLED:
+        return _profiler_disabled()
+    PROFILER.stop()
+    return jsonify(PROFILER.report())
+
+@app.route('/debug/profiler', methods=['GET'], endpoint="profiler_profile")
+def profiler_profile():
+    """The current or last profile as folded stacks (?limit= keeps the most frequent ones)."""
+    if not PROFILER_ENABLED:
+        return _profiler_disabled()
+    limit = request.args.get("limit", type=int)
+    return app.response_class(PROFILER.folded(limit), mimetype="text/plain")
+
+if STARTUP_MODE == "eager":
+    WARMUP.run()
+
 # --- Run the App ---
 
 if __name__ == '__main__':
+    start_warmup()
     app.run(debug=False, port=5001)
\ No newline at end of file
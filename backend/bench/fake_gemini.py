@@ -0,0 +1,68 @@
+"""
+Local stand-in for the Gemini models, so benchmarks exercise every LLM code path
+without network calls, quota or cost. Replies are canned but shaped like the JSON
+or text each of the app's prompts asks for.
+"""
+import json
+import os
+import time
+
+FAKE_API_KEY = "bench-fake-key"
+
+
+def fake_reply(prompt, visualization=False):
+    """A canned reply shaped like what `prompt` asks for (a chart spec for the visualization model)."""
+    if visualization:
+        return json.dumps({"chartType": "bar", "groupBy": "category", "metric": "sum", "type": "withdrawal"})
+    if "forecast_message" in prompt:
+        return json.dumps({"status": "at_risk", "forecast_message": "Trim dining out by $12/day to get there."})
+    if "REQUIRED JSON FORMAT PER ITEM" in prompt:
+        return json.dumps([{"name": "Netflix", "amount": 15.49, "frequency": "Monthly", "confidence": "High",
+                            "type": "Subscription", "ai_note": "Known streaming service"}])
+    if "Financial Transaction Detective" in prompt:
+        return json.dumps({"summary": "A few large one-off charges stand out.", "explanations": []})
+    return "You're spending a bit more on food than last month; groceries look steady."
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class FakeGenerativeModel:
+    """Answers generate_content() like a Gemini GenerativeModel, after `latency` seconds."""
+
+    def __init__(self, model_name, latency=0.0, visualization=False):
+        self.model_name = model_name
+        self.latency = latency
+        self.visualization = visualization
+        self.calls = 0
+
+    def reply(self, prompt):
+        return fake_reply(prompt, self.visualization)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        text = self.reply(prompt)
+        if not stream:
+            time.sleep(self.latency)
+            return FakeResponse(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield FakeResponse(word if i == 0 else " " + word)
+
+
+def install(app_module, latency=0.0):
+    """
+    Points the app's Gemini models at FakeGenerativeModels and sets a placeholder
+    GEMINI_API_KEY so the code paths gated on it run. Returns (model, viz_model).
+    """
+    os.environ["GEMINI_API_KEY"] = FAKE_API_KEY
+    app_module.model = FakeGenerativeModel(app_module.model.model_name, latency)
+    app_module.viz_model = FakeGenerativeModel(app_module.viz_model.model_name, latency, visualization=True)
+    return app_module.model, app_module.viz_model
@@ -0,0 +1,166 @@
+"""
+Local HTTP server speaking the Gemini REST API (generateContent and streamGenerateContent),
+with the canned replies of fake_gemini. Point the app at it with
+GEMINI_API_ENDPOINT=http://127.0.0.1:<port> to exercise the real client library and the
+LLM gateway (timeouts, retries, rate and concurrency limits, circuit breaker) without
+network calls or quota. Failures can be scripted or injected at random.
+
+Usage (from backend/):
+    python -m bench.fake_gemini_server [--port 8765] [--latency-ms 200] [--error-rate 0.1]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.fake_gemini import fake_reply
+
+ERROR_STATUS = {400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}]}
+
+
+class FakeGeminiServer:
+    """
+    Serves the Gemini REST API on 127.0.0.1 from a background thread.
+
+    Each request waits `latency` seconds (spread over the chunks when streaming). Statuses
+    queued with fail() are returned by the next requests in order; otherwise a request
+    fails with 429 or 503 with probability `error_rate`. `requests` counts requests
+    received and `max_in_flight` the most handled at once.
+    """
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail(self, status, count=1, delay=0.0):
+        """Makes the next `count` requests return `status` after `delay` seconds (status None: hang for `delay`, then succeed)."""
+        with self._lock:
+            self._failures.extend([(status, delay)] * count)
+
+    def reset(self):
+        with self._lock:
+            self._failures.clear()
+            self.requests = self.max_in_flight = 0
+
+    def _next_failure(self):
+        with self._lock:
+            self.requests += 1
+            if self._failures:
+                return self._failures.popleft()
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self._random.choice((429, 503)), 0.0
+        return None, 0.0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    self.respond(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out and hung up
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def respond(self, body):
+                status, delay = server._next_failure()
+                time.sleep(delay)
+                if status is not None:
+                    error = {"error": {"code": status, "message": "Injected failure", "status": ERROR_STATUS.get(status, "UNKNOWN")}}
+                    return self.send_json(status, json.dumps(error))
+                if ":generateContent" not in self.path and ":streamGenerateContent" not in self.path:
+                    return self.send_json(404, json.dumps({"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}}))
+
+                prompt = " ".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+                system = " ".join(part.get("text", "") for part in body.get("systemInstruction", {}).get("parts", []))
+                text = fake_reply(prompt, visualization="data visualization expert" in system)
+
+                if ":streamGenerateContent" not in self.path:
+                    time.sleep(server.latency)
+                    return self.send_json(200, json.dumps(candidate(text)))
+
+                # A JSON array written one element at a time, as the REST transport reads it
+                words = text.split(" ")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    time.sleep(server.latency / len(words))
+                    self.wfile.write((("[" if i == 0 else ",") + json.dumps(candidate(word if i == 0 else " " + word))).encode())
+                    self.wfile.flush()
+                self.wfile.write(b"]")
+
+            def send_json(self, status, payload):
+                data = payload.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Gemini REST server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429 or 503")
+    args = parser.parse_args(argv)
+
+    server = FakeGeminiServer(args.port, args.latency_ms / 1000, args.error_rate)
+    print(f"Fake Gemini listening on {server.url} (set GEMINI_API_ENDPOINT={server.url})")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Timing, memory and baseline comparison helpers for the benchmark suite (see run.py)."""
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def measure(fn, repeat=5, warmup=1, setup=None, items=1):
+    """
+    Times `fn` over `repeat` runs after `warmup` untimed ones. With `setup`, each run
+    calls fn(setup()) and only fn is timed. `items` is the work done per run (rows or
+    requests) for the throughput figure.
+
+    Peak memory comes from one extra run under tracemalloc: the most memory allocated
+    at once during the call (NumPy and pandas buffers included), above what was
+    already allocated. That run is slower and is not part of the timings.
+    """
+    def run():
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        return time.perf_counter() - start
+
+    for _ in range(warmup):
+        run()
+    seconds = np.array([run() for _ in range(repeat)])
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn(arg) if setup else fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    ms = seconds * 1000
+    return {
+        "runs": repeat,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "throughput": round(items / float(seconds.mean()), 1),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, key, results, meta):
+    """Stores `results` as the baseline for `key` (e.g. the ledger size), keeping other keys."""
+    baselines = load_baselines(path)
+    baselines[key] = {**meta, "results": results}
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# Growth below these is noise, whatever the ratio (sub-millisecond cases jitter by tens of percent)
+REGRESSION_FLOORS = {"p50_ms": 1.0, "peak_mb": 1.0}
+
+
+def compare(results, baseline, tolerance=0.25, floors=REGRESSION_FLOORS):
+    """
+    Compares results against a baseline's results. Returns {case: {metric: relative change}}
+    and the list of (case, metric, baseline, current) regressions: metrics that grew by
+    more than `tolerance` and by more than their floor. Cases missing from either side are skipped.
+    """
+    changes, regressions = {}, []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        changes[name] = {}
+        for metric, floor in floors.items():
+            if not base.get(metric):
+                continue
+            change = result[metric] / base[metric] - 1
+            changes[name][metric] = change
+            if change > tolerance and result[metric] - base[metric] > floor:
+                regressions.append((name, metric, base[metric], result[metric]))
+    return changes, regressions
+
+
+def format_report(results, units, changes=None):
+    lines = [f"{'case':34} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'throughput':>18} {'peak MB':>9} {'vs base':>9}"]
+    for name, result in results.items():
+        change = (changes or {}).get(name, {}).get("p50_ms")
+        lines.append(
+            f"{name:34} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f}"
+            f" {result['throughput']:>12,.1f} {units[name]:5} {result['peak_mb']:>9.2f}"
+            f" {'' if change is None else f'{change:+.0%}':>9}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+"""
+Benchmark suite: the analysis functions on a synthetic ledger (see synthetic.py), then
+every API endpoint through Flask's test client with Gemini replaced by fake_gemini
+(or, with --llm-server, served over HTTP by fake_gemini_server through the real client).
+Reports latency percentiles, throughput and peak allocated memory per case, and
+compares them with the stored baseline for the same ledger size.
+
+Usage (from backend/):
+    python -m bench.run [--rows 100000] [--repeat 5] [--only case,case] [--llm-latency-ms 0]
+                        [--llm-server] [--llm-error-rate 0]
+                        [--compare] [--save-baseline] [--tolerance 0.25] [--json results.json]
+
+Baselines live in bench/baselines.json, keyed by ledger size. They are only comparable
+on the machine that recorded them; re-record with --save-baseline after intended changes.
+--compare exits with status 1 when a case's p50 or peak memory regressed past --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pandas as pd
+
+from bench import fake_gemini
+from bench.fake_gemini_server import FakeGeminiServer
+from bench.harness import compare, format_report, load_baselines, measure, save_baseline
+from bench.synthetic import generate_ledger, write_ledger_csv
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+BENCH_USER = "bench"
+BULK_BATCH_ROWS = 1000
+
+
+def library_cases(ledger):
+    """(name, unit, measure() kwargs) for the analysis functions on `ledger`."""
+    from ai_engine import IncrementalAnomalyDetector, analyze_transactions, detect_anomalies_hybrid
+    from income_engine import IncomeEngine
+    from ledger_store import TransactionStore
+    from app import calculate_financial_stats
+
+    rows = len(ledger)
+    withdrawals = ledger[ledger["type"] == "withdrawal"]
+    largest = withdrawals["category"].value_counts().idxmax()
+    category_df = withdrawals[withdrawals["category"] == largest]
+    warm = SimpleNamespace(store=TransactionStore(ledger))
+    calculate_financial_stats(warm)
+
+    return [
+        ("analyze_transactions", "rows", dict(fn=analyze_transactions, setup=ledger.copy, items=rows)),
+        ("detect_anomalies_hybrid", "rows",
+         dict(fn=detect_anomalies_hybrid, setup=category_df.copy, items=len(category_df))),
+        ("IncrementalAnomalyDetector.fit", "rows",
+         dict(fn=lambda df: IncrementalAnomalyDetector().fit(df), setup=ledger.copy, items=rows)),
+        # detect_income_type was replaced by the income engine
+        ("IncomeEngine.fit", "rows", dict(fn=lambda df: IncomeEngine().fit(df), setup=ledger.copy, items=rows)),
+        ("calculate_financial_stats (cold)", "rows",
+         dict(fn=calculate_financial_stats, setup=lambda: SimpleNamespace(store=TransactionStore(ledger)), items=rows)),
+        ("calculate_financial_stats (warm)", "calls", dict(fn=lambda: calculate_financial_stats(warm))),
+    ]
+
+
+def endpoint_cases(app_module, rows):
+    """(name, unit, measure() kwargs) for each endpoint, as the bench user."""
+    client = app_module.app.test_client()
+    headers = {"X-User-Id": BENCH_USER}
+
+    def call(method, path, **kwargs):
+        def request(body=None):
+            response = client.open(path, method=method, headers=headers, **({"data": body} if body else {}), **kwargs)
+            data = response.get_data()  # drains streamed responses too
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}: {data[:200]!r}")
+        return request
+
+    next_id = [rows + 1]
+
+    def bulk_batch():
+        batch, _ = generate_ledger(BULK_BATCH_ROWS, seed=next_id[0])
+        batch["id"] += next_id[0] - 1
+        next_id[0] += BULK_BATCH_ROWS
+        buffer = io.StringIO()
+        write_ledger_csv(batch, buffer)
+        return buffer.getvalue().encode()
+
+    def evict():
+        app_module.TENANTS.evict(BENCH_USER)
+
+    goal = {"name": "Emergency fund", "amount": 5000, "date": "2026-06-30"}
+    cases = [
+        ("POST /api/analyze (cold tenant)", dict(fn=call("POST", "/api/analyze"), setup=evict)),
+        ("GET /api/stats", dict(fn=call("GET", "/api/stats"))),
+        ("GET /api/transactions", dict(fn=call("GET", "/api/transactions"))),
+        ("GET /api/transactions (filtered)",
+         dict(fn=call("GET", "/api/transactions?category=Food,Coffee&min_amount=20&description=bar&limit=500"))),
+        ("GET /api/income", dict(fn=call("GET", "/api/income"))),
+        ("POST /api/analyze", dict(fn=call("POST", "/api/analyze"))),
+        ("POST /api/chat", dict(fn=call("POST", "/api/chat", json={"message": "How is my spending this month?"}))),
+        ("POST /api/chat (goal)", dict(fn=call("POST", "/api/chat", json={"message": "I want to save $2,000 by June"}))),
+        ("POST /api/chat/stream", dict(fn=call("POST", "/api/chat/stream", json={"message": "Where can I cut back?"}))),
+        ("POST /api/forecast", dict(fn=call("POST", "/api/forecast", json=goal))),
+        ("POST /api/subscriptions", dict(fn=call("POST", "/api/subscriptions"))),
+        ("POST /api/visualize", dict(fn=call("POST", "/api/visualize", json={"prompt": "bar chart of spending by category"}))),
+        ("GET /api/ready", dict(fn=call("GET", "/api/ready"))),
+    ]
+    cases = [(name, "req", kwargs) for name, kwargs in cases]
+    # Last, since it grows the ledger the other cases read
+    cases.append(("POST /api/transactions/bulk", "rows", dict(
+        fn=call("POST", "/api/transactions/bulk", content_type="text/csv"), setup=bulk_batch, items=BULK_BATCH_ROWS,
+    )))
+    return cases
+
+
+def prepare_app(ledger, data_dir, llm_latency, llm_cache, llm_server=None):
+    """
+    Imports the app against a temporary tenant directory holding `ledger` as the bench user's.
+    Gemini calls go to `llm_server` (a FakeGeminiServer) if given, else to in-process fakes.
+    """
+    user_dir = os.path.join(data_dir, BENCH_USER)
+    os.makedirs(user_dir)
+    write_ledger_csv(ledger, os.path.join(user_dir, "transactions.csv"))
+
+    # The app reads its settings at import time
+    os.environ.update({
+        "TENANT_DATA_DIR": data_dir,
+        "TENANT_MEMORY_MB": str(1 << 20),
+        "RESULT_CACHE_DIR": "",
+        "LLM_CACHE_DIR": "",
+        "STARTUP_MODE": "background",
+        "CHAT_STORE": "memory",
+        "TRUST_USER_ID_HEADER": "1",
+    })
+    if not llm_cache:
+        os.environ["LLM_CACHE_SIZE"] = "0"
+    # The gateway's rate limit would dominate the endpoint timings; set it explicitly to bench it
+    os.environ.setdefault("LLM_RATE_PER_MINUTE", "0")
+    if llm_server is not None:
+        os.environ.update({"GEMINI_API_ENDPOINT": llm_server.url, "GEMINI_API_KEY": fake_gemini.FAKE_API_KEY})
+    import app as app_module
+
+    if llm_server is None:
+        fake_gemini.install(app_module, latency=llm_latency)
+    # Libraries load up front so their import time doesn't land in the first case
+    app_module.WARMUP.run()
+    return app_module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend benchmark suite.")
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic ledger size (default 100000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default 5)")
+    parser.add_argument("--only", help="comma-separated substrings of the case names to run")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated Gemini latency per call")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--llm-server", action="store_true",
+                        help="serve Gemini from a local fake HTTP server through the real client and gateway")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0,
+                        help="with --llm-server, share of Gemini requests failing with 429/503")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline for --rows")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline for --rows")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    ledger, injected = generate_ledger(args.rows, seed=args.seed)
+    print(f"Synthetic ledger: {len(ledger)} rows, {len(injected)} injected anomalies")
+
+    llm_server = None
+    if args.llm_server:
+        llm_server = FakeGeminiServer(latency=args.llm_latency_ms / 1000, error_rate=args.llm_error_rate, seed=args.seed)
+        llm_server.start()
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as data_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            app_module = prepare_app(ledger, data_dir, args.llm_latency_ms / 1000, args.llm_cache, llm_server)
+        cases = library_cases(ledger) + endpoint_cases(app_module, args.rows)
+        if args.only:
+            wanted = [part.strip() for part in args.only.split(",")]
+            cases = [case for case in cases if any(part in case[0] for part in wanted)]
+
+        results, units = {}, {}
+        for name, unit, kwargs in cases:
+            # The app logs loads and LLM fallbacks; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = measure(repeat=args.repeat, **kwargs)
+            units[name] = f"{unit}/s"
+            print(f"  {name}: p50 {results[name]['p50_ms']:.2f} ms", file=sys.stderr)
+    if llm_server is not None:
+        llm_server.stop()
+
+    meta = {
+        "rows": args.rows, "seed": args.seed, "repeat": args.repeat, "llm_latency_ms": args.llm_latency_ms,
+        "llm_server": args.llm_server, "llm_error_rate": args.llm_error_rate,
+        "python": platform.python_version(), "pandas": pd.__version__, "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    baseline = load_baselines(args.baselines).get(str(args.rows)) if args.compare else None
+    changes, regressions = compare(results, baseline["results"], args.tolerance) if baseline else ({}, [])
+
+    print(format_report(results, units, changes))
+    if args.compare and baseline is None:
+        print(f"No baseline for {args.rows} rows in {args.baselines}")
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}: {metric} {before} -> {after}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**meta, "results": results}, f, indent=2)
+    if args.save_baseline:
+        save_baseline(args.baselines, str(args.rows), results, meta)
+        print(f"Saved baseline for {args.rows} rows to {args.baselines}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
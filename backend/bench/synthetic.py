@@ -0,0 +1,236 @@
+"""
+Synthetic transaction ledgers for benchmarks, from a thousand rows to tens of millions.
+
+A ledger is built from "households", one per ROWS_PER_HOUSEHOLD rows. Each has rent
+and monthly bills, a few subscriptions (some of which creep up in price), a salary
+paid biweekly or semimonthly, and possibly gig income. The remaining rows are
+everyday purchases across the usual categories. A small share of purchases are
+turned into anomalies: existing vendors charged many times their usual amount, or
+large one-off charges from unknown vendors.
+
+Usage:
+    python -m bench.synthetic ROWS [output.csv] [--seed N] [--binary output.ledger]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ledger_store import LEDGER_COLUMNS, save_ledger_binary
+
+ROWS_PER_HOUSEHOLD = 2000
+DEFAULT_DAYS = 730
+DEFAULT_END = "2025-11-15"
+DEFAULT_ANOMALY_RATE = 0.002
+
+# category: (vendors, log-mean, log-sd of the amount, share of everyday purchases)
+PURCHASE_CATEGORIES = {
+    "Groceries": (("Whole Foods", "Trader Joe's", "Safeway", "Farmers Market", "Corner Store"), 4.0, 0.5, 0.20),
+    "Food": (("Chipotle", "Sweetgreen", "Uber Eats", "DoorDash", "Sushi House", "Local Thai Restaurant",
+              "In-N-Out Burger", "Pizza My Heart", "Local Pub", "Corner Bistro"), 3.1, 0.5, 0.22),
+    "Coffee": (("Starbucks #5542", "Philz Coffee", "Peet's Coffee", "Blue Bottle Coffee", "Dunkin' Donuts"), 1.8, 0.3, 0.16),
+    "Transport": (("Shell Gas", "Chevron Gas", "Lyft Ride", "Uber Trip", "Parking Meter", "Car Wash"), 3.2, 0.6, 0.14),
+    "Shopping": (("Amazon Purchase", "Target", "Best Buy", "Bookstore"), 3.6, 0.8, 0.14),
+    "Health": (("CVS Pharmacy", "Walgreens", "Vitamins", "Yoga Class Drop-in"), 3.0, 0.6, 0.07),
+    "Entertainment": (("AMC Theatres", "Steam Games", "Cinema 16"), 3.0, 0.5, 0.07),
+}
+# (description, monthly price, category)
+SUBSCRIPTIONS = (
+    ("Netflix", 15.49, "Subscription"), ("Spotify Premium", 10.99, "Subscription"),
+    ("HBO Max", 15.99, "Subscription"), ("Cloud Storage", 2.99, "Subscription"),
+    ("Hulu", 7.99, "Subscription"), ("Adobe Creative Cloud", 54.99, "Subscription"),
+    ("Planet Fitness", 24.99, "Health"), ("NYT Digital", 4.0, "Subscription"),
+)
+# (description, category, typical amount, sd; sd 0 means a fixed amount)
+BILLS = (
+    ("State Farm Insurance", "Insurance", 128.0, 0.0),
+    ("Xfinity Internet", "Utilities", 79.99, 0.0),
+    ("Verizon Wireless", "Utilities", 65.0, 0.0),
+    ("City Electric Utilities", "Utilities", 95.0, 22.0),
+)
+EMPLOYERS = ("Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Industries", "Wayne Enterprises")
+GIG_SOURCES = ("Uber Driver Payout", "DoorDash Dasher Pay", "Upwork Transfer", "Etsy Payout")
+UNKNOWN_VENDORS = ("ZypherX Intl Payment", "GoldenGate Crypto Exchange", "Wire Transfer Intl", "LuxeWatch Boutique")
+
+GIG_SHARE = 0.35
+SUBSCRIPTION_CREEP_SHARE = 0.1
+
+
+def _letters(n):
+    """'', 'A', ..., 'Z', 'AA', ...; tells apart employers sharing a name (digits are stripped as noise)."""
+    letters = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        letters = chr(ord("A") + r) + letters
+    return letters
+
+
+def _month_starts(start, end):
+    return pd.date_range(start.replace(day=1), end, freq="MS").to_numpy()
+
+
+def _frame(dates, descriptions, tx_type, amounts, categories):
+    """One part of the ledger; descriptions, amounts and categories are broadcast to the shape of `dates`."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+
+    def column(values, dtype):
+        return np.broadcast_to(np.asarray(values, dtype=dtype), dates.shape).ravel()
+
+    return pd.DataFrame({
+        "date": dates.ravel(),
+        "description": column(descriptions, object),
+        "type": tx_type,
+        "amount": np.round(column(amounts, float), 2),
+        "category": column(categories, object),
+    })
+
+
+def _monthly(rng, months, households, day_range=(1, 28)):
+    """(month, household) charge dates on a fixed day of the month per household."""
+    days = rng.integers(day_range[0], day_range[1] + 1, households)
+    return months[:, None] + (days - 1)[None, :].astype("timedelta64[D]")
+
+
+def _recurring_parts(rng, households, start, end):
+    months = _month_starts(start, end)
+    parts = []
+
+    # Rent on the 1st, sized per household
+    rent = np.round(rng.lognormal(np.log(1900), 0.25, households), -1)
+    parts.append(_frame(_monthly(rng, months, households, (1, 1)), "Rent Payment", "withdrawal", rent, "Housing"))
+
+    for description, category, amount, sd in BILLS:
+        dates = _monthly(rng, months, households)
+        amounts = amount if sd == 0 else np.maximum(rng.normal(amount, sd, dates.shape), 5)
+        parts.append(_frame(dates, description, "withdrawal", amounts, category))
+
+    # Each subscription is taken by about 45% of households; a few get a price increase part-way through
+    for description, price, category in SUBSCRIPTIONS:
+        subscribers = np.flatnonzero(rng.random(households) < 0.45)
+        if not len(subscribers):
+            continue
+        dates = _monthly(rng, months, len(subscribers))
+        amounts = np.full(dates.shape, price)
+        creeping = rng.random(len(subscribers)) < SUBSCRIPTION_CREEP_SHARE
+        from_month = rng.integers(0, len(months), len(subscribers))
+        amounts[(np.arange(len(months))[:, None] >= from_month[None, :]) & creeping[None, :]] += 2.0
+        parts.append(_frame(dates, description, "withdrawal", amounts, category))
+
+    # Salary: biweekly for most households, on the 15th and last day for the rest
+    employer = np.array([f"Payroll - {EMPLOYERS[h % len(EMPLOYERS)]} {_letters(h // len(EMPLOYERS))}".rstrip()
+                         for h in range(households)], dtype=object)
+    pay = np.round(rng.lognormal(np.log(2600), 0.3, households), 2)
+    semimonthly = rng.random(households) < 0.3
+    biweekly = np.flatnonzero(~semimonthly)
+    if len(biweekly):
+        periods = int((end - start).days // 14) + 1
+        first = np.datetime64(start, "D") + rng.integers(0, 14, len(biweekly)).astype("timedelta64[D]")
+        dates = first[None, :] + (14 * np.arange(periods))[:, None].astype("timedelta64[D]")
+        parts.append(_frame(dates, employer[biweekly], "deposit", pay[biweekly], "Income"))
+    semi = np.flatnonzero(semimonthly)
+    if len(semi):
+        month_ends = (pd.DatetimeIndex(months) + pd.offsets.MonthEnd(0)).to_numpy()
+        dates = np.concatenate([months + np.timedelta64(14, "D"), month_ends])[:, None].repeat(len(semi), axis=1)
+        parts.append(_frame(dates, employer[semi], "deposit", pay[semi] / 2, "Income"))
+
+    # Gig income: irregular payouts, two or three a week. The first household always
+    # has some, so even the smallest ledger mixes salary and gig deposits.
+    has_gig = rng.random(households) < GIG_SHARE
+    has_gig[0] = True
+    gig = np.flatnonzero(has_gig)
+    span = (end - start).days + 1
+    if len(gig):
+        counts = rng.poisson(span / 3, len(gig))
+        owner = np.repeat(gig, counts)
+        dates = np.datetime64(start, "D") + rng.integers(0, span, len(owner)).astype("timedelta64[D]")
+        sources = np.array(GIG_SOURCES, dtype=object)[(owner + rng.integers(0, 2, len(owner))) % len(GIG_SOURCES)]
+        parts.append(_frame(dates, sources, "deposit", rng.lognormal(4.3, 0.6, len(owner)), "Income"))
+
+    return [part[(part["date"] >= start) & (part["date"] <= end)] for part in parts]
+
+
+def _purchases(rng, rows, start, end):
+    names = list(PURCHASE_CATEGORIES)
+    shares = np.array([PURCHASE_CATEGORIES[name][3] for name in names])
+    category = rng.choice(len(names), rows, p=shares / shares.sum())
+
+    descriptions = np.empty(rows, dtype=object)
+    amounts = np.empty(rows)
+    for code, name in enumerate(names):
+        vendors, log_mean, log_sd, _ = PURCHASE_CATEGORIES[name]
+        rows_in = np.flatnonzero(category == code)
+        descriptions[rows_in] = np.array(vendors, dtype=object)[rng.integers(0, len(vendors), len(rows_in))]
+        amounts[rows_in] = rng.lognormal(log_mean, log_sd, len(rows_in))
+
+    span = (end - start).days + 1
+    dates = np.datetime64(start, "D") + rng.integers(0, span, rows).astype("timedelta64[D]")
+    return _frame(dates, descriptions, "withdrawal", np.maximum(amounts, 0.5), np.array(names, dtype=object)[category])
+
+
+def _inject_anomalies(rng, purchases, count):
+    """Turns `count` purchases into anomalies in place; returns their positions."""
+    positions = rng.choice(len(purchases), min(count, len(purchases)), replace=False)
+    spikes, unknown = positions[: (len(positions) + 1) // 2], positions[(len(positions) + 1) // 2:]
+
+    amounts = purchases["amount"].to_numpy(copy=True)
+    amounts[spikes] = np.round(amounts[spikes] * rng.uniform(12, 40, len(spikes)), 2)
+    amounts[unknown] = np.round(rng.uniform(1500, 5000, len(unknown)), 2)
+    purchases["amount"] = amounts
+
+    descriptions = purchases["description"].to_numpy(copy=True)
+    descriptions[unknown] = np.array(UNKNOWN_VENDORS, dtype=object)[rng.integers(0, len(UNKNOWN_VENDORS), len(unknown))]
+    purchases["description"] = descriptions
+    categories = purchases["category"].to_numpy(copy=True)
+    categories[unknown] = "Shopping"
+    purchases["category"] = categories
+    return positions
+
+
+def generate_ledger(rows, seed=0, days=DEFAULT_DAYS, end=DEFAULT_END, anomaly_rate=DEFAULT_ANOMALY_RATE):
+    """
+    Builds a ledger of exactly `rows` transactions covering the `days` up to `end`, in
+    the store's column types (see ledger_store.to_ledger_frame), sorted by date with ids
+    1..rows. Returns (ledger, ids of the injected anomalies). Same seed, same ledger.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end).normalize()
+    start = end - pd.Timedelta(days=days - 1)
+    households = max(1, round(rows / ROWS_PER_HOUSEHOLD))
+
+    recurring = pd.concat(_recurring_parts(rng, households, start, end), ignore_index=True)
+    if len(recurring) > rows:
+        recurring = recurring.iloc[np.sort(rng.choice(len(recurring), rows, replace=False))]
+    purchases = _purchases(rng, rows - len(recurring), start, end)
+    injected = _inject_anomalies(rng, purchases, round(len(purchases) * anomaly_rate))
+    is_injected = np.zeros(rows, dtype=bool)
+    is_injected[len(recurring) + injected] = True
+
+    ledger = pd.concat([recurring, purchases], ignore_index=True)
+    order = np.argsort(ledger["date"].to_numpy(), kind="stable")
+    ledger = ledger.iloc[order].reset_index(drop=True)
+    ledger.insert(0, "id", np.arange(1, rows + 1, dtype=np.int64))
+    for column in ("description", "type", "category"):
+        ledger[column] = pd.Categorical(ledger[column])
+
+    return ledger[LEDGER_COLUMNS], ledger["id"].to_numpy()[is_injected[order]]
+
+
+def write_ledger_csv(ledger, path):
+    ledger.to_csv(path, index=False, date_format="%Y-%m-%d", float_format="%.2f")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes a synthetic transactions ledger.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output", nargs="?", default="transactions.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--anomaly-rate", type=float, default=DEFAULT_ANOMALY_RATE)
+    parser.add_argument("--binary", metavar="LEDGER_DIR", help="also write a memory-mapped binary ledger")
+    args = parser.parse_args()
+
+    ledger, injected = generate_ledger(args.rows, seed=args.seed, days=args.days, anomaly_rate=args.anomaly_rate)
+    write_ledger_csv(ledger, args.output)
+    if args.binary:
+        save_ledger_binary(ledger, args.binary)
+    print(f"Wrote {len(ledger)} transactions ({len(injected)} injected anomalies) to {args.output}")
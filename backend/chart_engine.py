@@ -0,0 +1,290 @@
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CHART_TYPES = ("pie", "bar", "line")
+GROUPINGS = ("category", "description", "day", "week", "month")
+METRICS = ("sum", "count", "average")
+TRANSACTION_TYPES = ("withdrawal", "deposit", "all")
+
+# Query spec the LLM fills in; everything else is computed locally
+DEFAULT_SPEC = {
+    "chartType": "pie",
+    "title": None,
+    "groupBy": "category",
+    "metric": "sum",
+    "type": "withdrawal",
+    "categories": None,
+    "descriptionContains": None,
+    "startDate": None,
+    "endDate": None,
+    "topN": None,
+}
+MAX_POINTS = 60
+
+
+def normalize_spec(spec, known_categories=()):
+    """
+    Validates a chart query spec and fills in defaults.
+    Category names are matched case-insensitively against `known_categories`.
+    Raises ValueError for specs that cannot be charted.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Chart spec must be a JSON object.")
+    if spec.get("error"):
+        raise ValueError(spec["error"])
+
+    clean = {**DEFAULT_SPEC, **{key: value for key, value in spec.items() if key in DEFAULT_SPEC and value is not None}}
+
+    clean["chartType"] = str(clean["chartType"]).lower()
+    clean["groupBy"] = str(clean["groupBy"]).lower()
+    clean["metric"] = str(clean["metric"]).lower()
+    clean["type"] = str(clean["type"]).lower()
+    if clean["chartType"] not in CHART_TYPES:
+        raise ValueError(f"Unsupported chart type '{clean['chartType']}'.")
+    if clean["groupBy"] not in GROUPINGS:
+        raise ValueError(f"Unsupported grouping '{clean['groupBy']}'.")
+    if clean["metric"] not in METRICS:
+        raise ValueError(f"Unsupported metric '{clean['metric']}'.")
+    if clean["type"] not in TRANSACTION_TYPES:
+        raise ValueError(f"Unsupported transaction type '{clean['type']}'.")
+
+    if clean["categories"]:
+        categories = clean["categories"]
+        if isinstance(categories, str):
+            categories = [categories]
+        lookup = {str(name).lower(): name for name in known_categories}
+        matched = [lookup[str(name).lower()] for name in categories if str(name).lower() in lookup]
+        if not matched:
+            raise ValueError(f"No transactions in {', '.join(map(str, categories))}.")
+        clean["categories"] = matched
+
+    for key in ("startDate", "endDate"):
+        if clean[key]:
+            clean[key] = pd.Timestamp(clean[key]).normalize()
+
+    if clean["topN"]:
+        try:
+            clean["topN"] = max(1, int(clean["topN"]))
+        except (ValueError, TypeError, OverflowError):
+            # e.g. "ten" or JSON's 1e999 (infinity)
+            raise ValueError(f"Invalid topN '{clean['topN']}'.")
+
+    return clean
+
+
+def _default_title(spec):
+    subject = ", ".join(spec["categories"]) if spec["categories"] else {
+        "withdrawal": "Spending", "deposit": "Income", "all": "Transactions"
+    }[spec["type"]]
+    measure = {"sum": "", "count": "Number of ", "average": "Average "}[spec["metric"]]
+    return f"{measure}{subject} by {spec['groupBy'].capitalize()}"
+
+
+def _filter(df, spec):
+    mask = np.ones(len(df), dtype=bool)
+    if spec["type"] != "all":
+        mask &= (df['type'] == spec["type"]).to_numpy()
+    if spec["categories"]:
+        mask &= df['category'].isin(spec["categories"]).to_numpy()
+    if spec["startDate"] is not None:
+        mask &= (df['date'] >= spec["startDate"]).to_numpy()
+    if spec["endDate"] is not None:
+        mask &= (df['date'] < spec["endDate"] + pd.Timedelta(days=1)).to_numpy()
+
+    if spec["descriptionContains"]:
+        needle = str(spec["descriptionContains"]).lower()
+        descriptions = df['description']
+        if isinstance(descriptions.dtype, pd.CategoricalDtype):
+            # Match each distinct description once, then map through the codes
+            hits = descriptions.cat.categories.str.lower().str.contains(needle, regex=False)
+            codes = descriptions.cat.codes.to_numpy()
+            mask &= (codes >= 0) & np.asarray(hits)[codes]
+        else:
+            mask &= descriptions.str.lower().str.contains(needle, regex=False).to_numpy()
+
+    return df[mask]
+
+
+def _group_keys(df, group_by):
+    if group_by in ("category", "description"):
+        return np.asarray(df[group_by], dtype=object)
+    dates = df['date'].dt.normalize()
+    if group_by == "day":
+        return dates
+    if group_by == "week":
+        # Weeks start on Monday
+        return dates - pd.to_timedelta(dates.dt.dayofweek, unit='D')
+    return dates.dt.to_period('M').dt.start_time
+
+
+def _aggregate_rows(df, spec):
+    filtered = _filter(df, spec)
+    if filtered.empty:
+        return pd.Series(dtype='float64')
+    agg = {"sum": "sum", "count": "size", "average": "mean"}[spec["metric"]]
+    return filtered['amount'].groupby(_group_keys(filtered, spec["groupBy"])).agg(agg)
+
+
+def _aggregate_index(aggregates, spec):
+    """Reads category/month totals straight from a MonthlyAggregateIndex."""
+    rollup = aggregates.rollup(
+        spec["groupBy"],
+        type=None if spec["type"] == "all" else spec["type"],
+        categories=spec["categories"],
+    )
+    if rollup.empty:
+        return pd.Series(dtype='float64')
+    if spec["metric"] == "sum":
+        values = rollup['amount']
+    elif spec["metric"] == "count":
+        values = rollup['count']
+    else:
+        values = rollup['amount'] / rollup['count']
+    if spec["groupBy"] == "month":
+        values.index = [datetime(key // 12, key % 12 + 1, 1) for key in values.index]
+    return values
+
+
+def _can_use_index(spec, aggregates):
+    return (
+        aggregates is not None
+        and spec["groupBy"] in ("category", "month")
+        and not spec["descriptionContains"]
+        and spec["startDate"] is None
+        and spec["endDate"] is None
+    )
+
+
+def _label(key, group_by):
+    if group_by in ("category", "description"):
+        return str(key)
+    if group_by == "month":
+        return key.strftime('%b %Y')
+    return key.strftime('%Y-%m-%d')
+
+
+def build_chart(df, spec, aggregates=None):
+    """
+    Builds a Recharts config ({chartType, title, data, dataKey, xAxisKey, summary})
+    from a normalized query spec. Category and whole-ledger month charts are read
+    from the aggregate index when one is given; other queries filter the ledger's
+    columns with vectorized masks.
+    """
+    if _can_use_index(spec, aggregates):
+        values = _aggregate_index(aggregates, spec)
+    else:
+        values = _aggregate_rows(df, spec)
+
+    title = spec["title"] or _default_title(spec)
+    if values.empty:
+        return {"error": "No transactions match this request."}
+
+    if spec["groupBy"] in ("category", "description"):
+        values = values.sort_values(ascending=False, kind='stable')
+        limit = spec["topN"] or (10 if spec["groupBy"] == "description" else None)
+        if limit:
+            values = values.iloc[:limit]
+    else:
+        values = values.sort_index()
+        if spec["topN"]:
+            values = values.iloc[-spec["topN"]:]
+        values = values.iloc[-MAX_POINTS:]
+
+    data = [
+        {"name": _label(key, spec["groupBy"]), "value": round(float(value), 2)}
+        for key, value in values.items()
+    ]
+
+    return {
+        "chartType": spec["chartType"],
+        "title": title,
+        "data": data,
+        "dataKey": "value",
+        "xAxisKey": "name",
+        "summary": _summary(data, spec),
+    }
+
+
+def _summary(data, spec):
+    top = max(data, key=lambda point: point["value"])
+    if spec["metric"] == "count":
+        return f"{top['name']} has the most transactions ({top['value']:,.0f})."
+    if spec["metric"] == "average":
+        return f"{top['name']} has the highest average (${top['value']:,.2f})."
+    total = sum(point["value"] for point in data)
+    return f"Total of ${total:,.2f}, with {top['name']} highest at ${top['value']:,.2f}."
+
+
+# --- Keyword fallback when no LLM is available ---
+_MONTHS = {name.lower(): index for index, name in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"], start=1)}
+_MONTH_PATTERN = re.compile(r"\b(" + "|".join(_MONTHS) + r")\b(?:\s+(\d{4}))?")
+
+
+def parse_chart_request(prompt, known_categories=(), today=None):
+    """Best-effort keyword translation of a chart request into a query spec."""
+    text = prompt.lower()
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    spec = {}
+
+    if "line" in text or "trend" in text or "over time" in text:
+        spec["chartType"] = "line"
+    elif "bar" in text:
+        spec["chartType"] = "bar"
+    elif "pie" in text:
+        spec["chartType"] = "pie"
+
+    if re.search(r"\b(daily|by day|per day|each day)\b", text):
+        spec["groupBy"] = "day"
+    elif re.search(r"\b(weekly|by week|per week|each week)\b", text):
+        spec["groupBy"] = "week"
+    elif re.search(r"\b(monthly|by month|per month|each month|over time|trend)\b", text):
+        spec["groupBy"] = "month"
+    elif re.search(r"\b(merchant|vendor|store|description)s?\b", text):
+        spec["groupBy"] = "description"
+
+    if spec.get("groupBy") in ("day", "week", "month") and "chartType" not in spec:
+        spec["chartType"] = "line"
+    elif spec.get("chartType") == "line" and "groupBy" not in spec:
+        spec["groupBy"] = "month"
+
+    if re.search(r"\b(income|deposits?|earnings|paychecks?)\b", text):
+        spec["type"] = "deposit"
+
+    if re.search(r"\b(how many|number of|count)\b", text):
+        spec["metric"] = "count"
+    elif re.search(r"\b(average|avg|mean)\b", text):
+        spec["metric"] = "average"
+
+    # Match on a stem so "grocery" finds "Groceries"
+    categories = [
+        name for name in known_categories
+        if re.search(r"\b" + re.escape(str(name).lower()[:max(4, len(str(name)) - 3)]), text)
+    ]
+    if categories:
+        spec["categories"] = categories
+
+    top = re.search(r"\btop\s+(\d+)", text)
+    if top:
+        spec["topN"] = int(top.group(1))
+
+    if "last month" in text:
+        end = today.replace(day=1) - pd.Timedelta(days=1)
+        spec["startDate"], spec["endDate"] = end.replace(day=1), end
+    elif "this month" in text:
+        spec["startDate"], spec["endDate"] = today.replace(day=1), today
+    else:
+        month = _MONTH_PATTERN.search(text)
+        # "may" alone is usually the verb, so only treat it as a month with a year
+        if month and (month.group(1) != "may" or month.group(2)):
+            year = int(month.group(2)) if month.group(2) else today.year
+            start = pd.Timestamp(year=year, month=_MONTHS[month.group(1)], day=1)
+            if not month.group(2) and start > today:
+                start = start - pd.DateOffset(years=1)
+            spec["startDate"], spec["endDate"] = start, start + pd.offsets.MonthEnd(0)
+
+    return spec
@@ -0,0 +1,30 @@
+"""
+Converts a transactions CSV (id,date,description,type,amount,category) into the
+memory-mapped binary ledger format that app.py loads on startup.
+
+Usage:
+    python convert_ledger.py [input.csv] [output.ledger]
+
+Defaults to data/transactions.csv -> data/transactions.ledger.
+"""
+import os
+import sys
+
+from ledger_store import read_ledger_csv, save_ledger_binary
+from result_cache import file_digest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+
+def convert(csv_path, ledger_path):
+    ledger = read_ledger_csv(csv_path)
+    # The source digest lets app.py key its result cache without re-hashing the ledger
+    save_ledger_binary(ledger, ledger_path, source_digest=file_digest(csv_path))
+    print(f"Wrote {len(ledger)} transactions from {csv_path} to {ledger_path}")
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, 'transactions.csv')
+    ledger_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(DATA_DIR, 'transactions.ledger')
+    convert(csv_path, ledger_path)
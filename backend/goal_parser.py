@@ -0,0 +1,219 @@
+import calendar
+import re
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+from dateutil.relativedelta import relativedelta
+
+# Phrases the parser is expected to handle; also the microbenchmark corpus (see benchmark())
+GOAL_PHRASES = (
+    "save $500 by March",
+    "reach 2k next month",
+    "hit my $1500 goal before July 2025",
+    "save up 3 grand in 3 months",
+    "I want $1,200.50 saved by 2026-05-01",
+    "put away 800 bucks in 6 weeks",
+    "save $300 by next year",
+    "save 5000 by sept 2027",
+    "I need $250 by this month",
+    "get to $10,000 in a year",
+    "save $400 by christmas",
+    "how am I doing this week?",
+)
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_COUNT_WORDS = "|".join(WORD_NUMBERS)
+
+# Common timeframes, resolved without dateparser. Month names only count after
+# by/before/until so "may" in "I may save" is not read as a date.
+DATE_PATTERN = re.compile(
+    rf"""
+    (?:\b(?:by|before|until)\s+)?
+    (?:
+        (?P<iso>\b\d{{4}}-\d{{2}}-\d{{2}}\b)
+      | \bin\s+(?P<count>\d+|{_COUNT_WORDS})\s+(?P<unit>day|week|month|year)s?\b
+      | \b(?P<relative>next|this)\s+(?P<relative_unit>week|month|year)\b
+    )
+    | \b(?:by|before|until)\s+(?P<month>{_MONTH_NAMES})\b\.?(?:,?\s+(?P<year>\d{{4}})\b)?
+    """,
+    re.VERBOSE,
+)
+# Anything else after "by"/"before"/"until" is handed to dateparser
+FALLBACK_DATE_PATTERN = re.compile(r"\b(?:by|before|until)\s+[a-z]+(?:\s+\d{1,4})?")
+
+AMOUNT_PATTERN = re.compile(
+    r"(?P<dollar>\$)?\s?(?P<number>\d{1,3}(?:,\d{3})+|\d+)(?P<cents>\.\d{1,2})?(?!\d)\s?(?P<suffix>grand\b|k\b|bucks\b)?"
+)
+
+DEFAULT_GOAL_MONTHS = 3
+
+
+def _month_date(year, month, day):
+    """`day` of the given month, clipped to its last day (e.g. the 31st in February)."""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def resolve_date_match(match, today):
+    """Target date for a DATE_PATTERN match, relative to `today`, or None if it is not a real date."""
+    if match.group("iso"):
+        try:
+            return datetime.strptime(match.group("iso"), "%Y-%m-%d").date()
+        except ValueError:
+            return None
+
+    if match.group("unit"):
+        count = match.group("count")
+        count = int(count) if count.isdigit() else WORD_NUMBERS[count]
+        try:
+            return today + relativedelta(**{match.group("unit") + "s": count})
+        except (ValueError, OverflowError):
+            return None  # past year 9999, e.g. "in 9999 years"
+
+    if match.group("relative_unit"):
+        unit = match.group("relative_unit")
+        if match.group("relative") == "next":
+            return today + relativedelta(**{unit + "s": 1})
+        # "this month" means by the end of it
+        if unit == "week":
+            return today + relativedelta(days=6 - today.weekday())
+        if unit == "month":
+            return _month_date(today.year, today.month, 31)
+        return date(today.year, 12, 31)
+
+    # Month name: same day of that month, in the given year or else its next occurrence
+    month = MONTHS[match.group("month")]
+    if match.group("year"):
+        try:
+            return _month_date(int(match.group("year")), month, today.day)
+        except ValueError:
+            return None  # year 0000
+    target = _month_date(today.year, month, today.day)
+    return target if target > today else _month_date(today.year + 1, month, today.day)
+
+
+@lru_cache(maxsize=1024)
+def _dateparser_date(phrase, today):
+    # `today` is part of the key so relative phrases are re-resolved each day.
+    # dateparser is slow to import, so it loads with the first phrase that needs it.
+    import dateparser
+    parsed = dateparser.parse(phrase, settings={
+        # Resolve against `today` rather than the clock, and read "by friday" as the coming one
+        "PREFER_DATES_FROM": "future",
+        "RELATIVE_BASE": datetime.combine(today, datetime.min.time()),
+    })
+    return parsed.date() if parsed else None
+
+
+def parse_target_date(message, today):
+    """
+    Finds a goal's timeframe in a lowercased message.
+    Returns (target date or None, (start, end) span of the phrase or None). A timeframe
+    that has already passed ("before July 2020") gives no date, but its span is still returned.
+    """
+    target, span = None, None
+    for match in DATE_PATTERN.finditer(message):
+        target = resolve_date_match(match, today)
+        if target is not None:
+            span = match.span()
+            break
+    else:
+        match = FALLBACK_DATE_PATTERN.search(message)
+        if match:
+            target = _dateparser_date(match.group(0), today)
+            if target is not None:
+                span = match.span()
+
+    if target is not None and target < today:
+        return None, span
+    return target, span
+
+
+def parse_amount(message):
+    """First dollar amount in a message ("$1,200.50", "2k", "3 grand", "800 bucks"), or None."""
+    match = AMOUNT_PATTERN.search(message)
+    if not match:
+        return None
+    amount = float(match.group("number").replace(",", "") + (match.group("cents") or ""))
+    if match.group("suffix") in ("grand", "k"):
+        amount *= 1000
+    return amount
+
+
+def extract_goal_from_message(message: str, today=None):
+    """
+    Extracts a goal (amount + target date) from a user's natural language message.
+    Handles phrases like:
+      - "save $500 by March"
+      - "reach 2k next month"
+      - "hit my $1500 goal before July 2025"
+      - "save up 3 grand in 3 months"
+    (GOAL_PHRASES has the full corpus.) Common timeframes are resolved by
+    DATE_PATTERN; only other "by ..." phrases reach dateparser, memoized per day.
+    Returns a dict with name, target_amount, and target_date if found.
+    """
+    message = message.lower().strip()
+    today = today or date.today()
+
+    target_date, span = parse_target_date(message, today)
+    if span is not None:
+        # Numbers inside the timeframe ("in 3 months", "July 2025") are not the amount
+        message = message[:span[0]] + " " + message[span[1]:]
+
+    target_amount = parse_amount(message)
+    if not target_amount:
+        return None
+
+    # Default to 3 months ahead if no date
+    if target_date is None:
+        target_date = today + relativedelta(months=DEFAULT_GOAL_MONTHS)
+
+    return {
+        "name": "User-specified savings goal",
+        "target_amount": target_amount,
+        "target_date": target_date.strftime("%Y-%m-%d"),
+    }
+
+
+def benchmark(phrases=GOAL_PHRASES, repeat=200, baseline_repeat=5):
+    """
+    Microbenchmark over `phrases`: mean time per call of extract_goal_from_message
+    (warm parse cache) against one dateparser.parse of the phrase's timeframe, which
+    goal extraction used to run on every message. Returns {phrase: (fast µs, dateparser µs)}.
+
+    Run with `python goal_parser.py`.
+    """
+    import dateparser
+
+    results = {}
+    for phrase in phrases:
+        extract_goal_from_message(phrase)  # warm the fallback cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            extract_goal_from_message(phrase)
+        fast = (time.perf_counter() - start) / repeat
+
+        match = DATE_PATTERN.search(phrase.lower()) or FALLBACK_DATE_PATTERN.search(phrase.lower())
+        start = time.perf_counter()
+        for _ in range(baseline_repeat):
+            if match:
+                dateparser.parse(match.group(0))
+        slow = (time.perf_counter() - start) / baseline_repeat
+        results[phrase] = (fast * 1e6, slow * 1e6)
+    return results
+
+
+if __name__ == "__main__":
+    for phrase, (fast, slow) in benchmark().items():
+        print(f"{phrase!r:45} {extract_goal_from_message(phrase)}")
+        print(f"{'':45} {fast:8.1f} µs  (dateparser: {slow:10.1f} µs)")
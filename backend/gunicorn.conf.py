@@ -0,0 +1,30 @@
+# Gunicorn settings for the backend container: `gunicorn --config gunicorn.conf.py app:app`
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+# GUNICORN_PRELOAD=1: the master imports the app and runs the whole warm-up (default
+# ledger, its analytics, heavy libraries) once, then forks the workers from it. They
+# share those pages copy-on-write instead of each building its own copy, so memory
+# grows with workers far slower than a full copy each. The port opens after the warm-up.
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+if preload_app:
+    os.environ.setdefault("STARTUP_MODE", "eager")
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep the workers' garbage collector off the objects inherited from the master,
+        # otherwise its bookkeeping writes would copy those pages into every worker
+        gc.collect()
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # The worker is accepting connections from here on; the default ledger, its
+    # analytics and the heavy libraries load in the background (see /api/ready).
+    # With GUNICORN_PRELOAD=1 they were loaded before the fork and this is a no-op.
+    from app import start_warmup
+    start_warmup()
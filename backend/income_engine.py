@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from metrics import timed
+from recurring import DAYS_IN_MONTH, normalize_vendors
+
+INCOME_ENGINE_VERSION = "1"
+
+# Pay cadences: (label, nominal gap in days, allowed drift in days)
+INCOME_CADENCES = [
+    ("weekly", 7.0, 2.0),
+    ("biweekly", 14.0, 2.0),
+    ("semimonthly", DAYS_IN_MONTH / 2, 3.0),
+    ("monthly", DAYS_IN_MONTH, 5.0),
+]
+INCOME_TYPE_PATTERN = "deposit|income|payment|payout"
+
+# Deposits from one source split into separate streams where sorted amounts jump by this factor
+BAND_RATIO = 1.5
+MIN_REGULAR_SHARE = 0.75
+# Semimonthly pay lands on two fixed days of the month (±2 days for weekends)
+ANCHOR_WINDOW_DAYS = 2
+MIN_ANCHORED_SHARE = 0.8
+MAX_REPORTED_STREAMS = 20
+
+
+def _deposit_rows(df):
+    """Income-like rows of a ledger frame as (source, date, amount, name) columns."""
+    types = df['type']
+    if isinstance(types.dtype, pd.CategoricalDtype):
+        matches = types.cat.categories.str.lower().str.contains(INCOME_TYPE_PATTERN, na=False)
+        is_income = np.append(np.asarray(matches, dtype=bool), False)[types.cat.codes.to_numpy()]
+    else:
+        is_income = types.astype(str).str.lower().str.contains(INCOME_TYPE_PATTERN, na=False).to_numpy()
+
+    rows = df[is_income]
+    dates = pd.to_datetime(rows['date'], errors='coerce').to_numpy().astype('datetime64[ns]')
+    valid = ~np.isnat(dates)
+    names = pd.Categorical(np.asarray(rows['description'], dtype=object)[valid])
+    # Normalize each distinct description once
+    sources = pd.Categorical(normalize_vendors(names.categories.to_numpy()).to_numpy()[names.codes])
+    return pd.DataFrame({
+        'source': sources,
+        'date': dates[valid],
+        'amount': rows['amount'].to_numpy(dtype='float64')[valid],
+        'name': names,
+    })
+
+
+def _concat_deposits(frames):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return _deposit_rows(pd.DataFrame({'type': [], 'date': [], 'amount': [], 'description': []}))
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    return pd.DataFrame({
+        column: (union_categoricals([frame[column] for frame in frames], ignore_order=True)
+                 if column in ('source', 'name') else np.concatenate([frame[column].to_numpy() for frame in frames]))
+        for column in ('source', 'date', 'amount', 'name')
+    })
+
+
+def _anchored_share(stream_ids, days_of_month, counts):
+    """Share of each stream's deposits within ±ANCHOR_WINDOW_DAYS of its two busiest days of the month."""
+    hist = np.bincount(stream_ids * 31 + days_of_month, minlength=len(counts) * 31).reshape(len(counts), 31)
+    # Circular, so pay moved from the 1st back to the 30th/31st still counts
+    smoothed = sum(np.roll(hist, shift, axis=1) for shift in range(-ANCHOR_WINDOW_DAYS, ANCHOR_WINDOW_DAYS + 1))
+    rows = np.arange(len(counts))
+    first = smoothed.argmax(axis=1)
+    distance = np.abs(np.arange(31)[None, :] - first[:, None])
+    distance = np.minimum(distance, 31 - distance)
+    # The second anchor's window must not overlap the first
+    second = np.where(distance > 2 * ANCHOR_WINDOW_DAYS, smoothed, 0).max(axis=1)
+    return (smoothed[rows, first] + second) / np.maximum(counts, 1)
+
+
+def stream_stats(deposits):
+    """
+    Splits deposits into income streams and classifies each one, in a single vectorized pass.
+
+    A stream is one normalized source within one amount band. Each stream's cadence is
+    the INCOME_CADENCES entry that covers at least MIN_REGULAR_SHARE of its gaps.
+    Semimonthly and biweekly gaps overlap, so semimonthly also requires deposits
+    anchored to two days of the month; otherwise the stream is "irregular".
+    Returns one row per stream.
+    """
+    if deposits.empty:
+        return pd.DataFrame(columns=['source', 'name', 'count', 'total', 'mean', 'cv', 'first', 'last',
+                                     'frequency', 'period', 'regularity'])
+
+    source_codes = deposits['source'].cat.codes.to_numpy()
+    amounts = deposits['amount'].to_numpy()
+
+    # Amount bands: sort by (source, amount) and cut where the amount jumps
+    by_amount = np.lexsort((amounts, source_codes))
+    sorted_sources = source_codes[by_amount]
+    sorted_amounts = amounts[by_amount]
+    new_stream = np.ones(len(by_amount), dtype=bool)
+    new_stream[1:] = (sorted_sources[1:] != sorted_sources[:-1]) | (sorted_amounts[1:] > sorted_amounts[:-1] * BAND_RATIO)
+    stream_of = np.empty(len(by_amount), dtype=np.int64)
+    stream_of[by_amount] = np.cumsum(new_stream) - 1
+
+    # Then walk each stream in date order
+    dates = deposits['date'].to_numpy().astype('datetime64[ns]')
+    order = np.lexsort((dates.astype('int64'), stream_of))
+    streams = stream_of[order]
+    dates = dates[order]
+    amounts = amounts[order]
+    starts = np.flatnonzero(np.r_[True, streams[1:] != streams[:-1]])
+    ends = np.r_[starts[1:], len(streams)]
+    n = len(starts)
+
+    counts = ends - starts
+    totals = np.bincount(streams, weights=amounts, minlength=n)
+    means = totals / counts
+    variances = np.maximum(np.bincount(streams, weights=amounts ** 2, minlength=n) / counts - means ** 2, 0)
+    cvs = np.where(means > 0, np.sqrt(variances) / np.where(means > 0, means, 1), 0)
+
+    gaps = np.full(len(streams), np.nan)
+    gaps[1:] = (dates[1:] - dates[:-1]).astype('timedelta64[s]').astype('int64') / 86400
+    gaps[starts] = np.nan
+    has_gap = ~np.isnan(gaps)
+    gap_counts = np.maximum(np.bincount(streams[has_gap], minlength=n), 1)
+
+    shares = {}
+    best_label = np.full(n, "irregular", dtype=object)
+    best_period = np.full(n, np.nan)
+    best_share = np.zeros(n)
+    for label, period, drift in INCOME_CADENCES:
+        in_window = has_gap & (np.abs(gaps - period) <= drift)
+        shares[label] = np.bincount(streams[in_window], minlength=n) / gap_counts
+        better = (shares[label] >= MIN_REGULAR_SHARE) & (shares[label] > best_share)
+        best_label[better] = label
+        best_period[better] = period
+        best_share[better] = shares[label][better]
+
+    # Calendar check between biweekly and semimonthly (their gap windows overlap)
+    days_of_month = pd.DatetimeIndex(dates).day.to_numpy() - 1
+    anchored = (counts >= 4) & (_anchored_share(streams, days_of_month, counts) >= MIN_ANCHORED_SHARE)
+    exact_biweekly = np.bincount(streams[has_gap & (np.abs(gaps - 14) <= 1)], minlength=n) / gap_counts
+    biweekly_ok = shares["biweekly"] >= MIN_REGULAR_SHARE
+    semimonthly_ok = shares["semimonthly"] >= MIN_REGULAR_SHARE
+
+    to_semimonthly = (best_label == "biweekly") & anchored & (exact_biweekly < 0.9) & semimonthly_ok
+    to_biweekly = (best_label == "semimonthly") & ~anchored & biweekly_ok
+    to_irregular = (best_label == "semimonthly") & ~anchored & ~biweekly_ok
+    best_label[to_semimonthly], best_period[to_semimonthly] = "semimonthly", DAYS_IN_MONTH / 2
+    best_label[to_biweekly], best_period[to_biweekly] = "biweekly", 14.0
+    best_share[to_biweekly] = shares["biweekly"][to_biweekly]
+    best_label[to_irregular], best_period[to_irregular], best_share[to_irregular] = "irregular", np.nan, 0
+    # Two deposits are one gap; not enough to call a cadence
+    few = counts < 3
+    best_label[few], best_period[few], best_share[few] = "irregular", np.nan, 0
+
+    names = deposits['name'].to_numpy()[order]
+    sources = deposits['source'].to_numpy()[order]
+    return pd.DataFrame({
+        'source': sources[starts],
+        'name': names[ends - 1],
+        'count': counts,
+        'total': totals,
+        'mean': means,
+        'cv': cvs,
+        'first': dates[starts],
+        'last': dates[ends - 1],
+        'frequency': best_label,
+        'period': best_period,
+        'regularity': best_share,
+    })
+
+
+def summarize_streams(streams, latest, first):
+    """
+    Income profile from per-stream stats (see stream_stats).
+
+    Regular streams with steady amounts are "recurring" and count at their pay rate
+    while active (last deposit within 1.5 periods of `latest`). Everything else is
+    "gig" income, averaged over the whole deposit history (at least 30 days).
+    """
+    if streams.empty:
+        return {
+            "income_type": "unknown",
+            "estimated_monthly_income": 0.0,
+            "income_frequency": "unknown",
+            "last_income_date": None,
+            "streams": [],
+            "stream_count": 0,
+        }
+
+    periods = streams['period'].to_numpy()
+    recurring = (streams['frequency'].to_numpy() != "irregular") & (streams['cv'].to_numpy() < 0.25)
+    days_since = (latest - streams['last']).dt.days.to_numpy()
+    active = ~recurring | (days_since <= np.where(recurring, periods, 0) * 1.5)
+
+    history_days = max(30, (latest - first).days)
+    monthly = np.where(
+        recurring,
+        streams['mean'].to_numpy() * DAYS_IN_MONTH / np.where(recurring, periods, 1),
+        streams['total'].to_numpy() / history_days * DAYS_IN_MONTH,
+    )
+    monthly = np.where(active, monthly, 0)
+
+    total = float(monthly.sum())
+    recurring_total = float(monthly[recurring].sum())
+    share = recurring_total / total if total > 0 else 0
+    if share >= 0.8:
+        income_type = "recurring"
+    elif share <= 0.2:
+        income_type = "gig"
+    else:
+        income_type = "mixed"
+
+    # Frequency of the largest recurring stream, like a single paycheck would report
+    main = np.flatnonzero(recurring & active)
+    frequency = streams['frequency'].iloc[main[monthly[main].argmax()]] if len(main) else "irregular"
+
+    ranked = np.argsort(-monthly, kind='stable')[:MAX_REPORTED_STREAMS]
+    return {
+        "income_type": income_type,
+        "estimated_monthly_income": round(total, 2),
+        "income_frequency": frequency,
+        "last_income_date": latest.strftime("%Y-%m-%d"),
+        "streams": [
+            {
+                "name": streams['name'].iloc[i],
+                "source": streams['source'].iloc[i],
+                "type": "recurring" if recurring[i] else "gig",
+                "frequency": streams['frequency'].iloc[i],
+                "average_amount": round(float(streams['mean'].iloc[i]), 2),
+                "monthly_amount": round(float(monthly[i]), 2),
+                "deposits": int(streams['count'].iloc[i]),
+                "last_date": streams['last'].iloc[i].strftime("%Y-%m-%d"),
+                "active": bool(active[i]),
+            }
+            for i in ranked
+        ],
+        "stream_count": len(streams),
+    }
+
+
+class IncomeEngine:
+    """
+    Multi-stream income model that can be updated as deposits arrive.
+
+    fit() splits the ledger's deposits into streams (see stream_stats) and keeps
+    them with their per-stream stats. update() only recomputes the streams of
+    sources that received new deposits, so appends cost the size of those sources
+    rather than the whole history.
+    """
+
+    def __init__(self):
+        self._deposits = _concat_deposits([])
+        self._streams = stream_stats(self._deposits)
+
+    @timed("income_engine_fit")
+    def fit(self, df):
+        self._deposits = _deposit_rows(df)
+        self._streams = stream_stats(self._deposits)
+        return self.profile()
+
+    @timed("income_engine_update")
+    def update(self, batch):
+        """Folds newly appended transactions into the model and returns the refreshed profile."""
+        new = _deposit_rows(batch)
+        if new.empty:
+            return self.profile()
+
+        self._deposits = _concat_deposits([self._deposits, new])
+        touched = set(new['source'].astype(object))
+        in_touched = self._deposits['source'].isin(touched).to_numpy()
+        kept = self._streams[~self._streams['source'].isin(touched).to_numpy()]
+        refreshed = stream_stats(self._deposits[in_touched].reset_index(drop=True))
+        self._streams = pd.concat([kept, refreshed], ignore_index=True)
+        return self.profile()
+
+    def profile(self):
+        if self._deposits.empty:
+            return summarize_streams(self._streams, None, None)
+        dates = self._deposits['date']
+        return summarize_streams(self._streams, dates.max(), dates.min())
+
+
+def detect_income_type(df: pd.DataFrame):
+    """
+    Detects income streams and estimates monthly income from each stream's pay
+    frequency (weekly, biweekly, semimonthly, monthly) instead of averaging deposits.
+    """
+    return IncomeEngine().fit(df)
@@ -0,0 +1,155 @@
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ledger_store import LEDGER_COLUMNS, concat_ledger_frames, read_ledger_csv, to_ledger_frame, write_ledger_rows
+
+TRANSACTION_TYPES = ("withdrawal", "deposit")
+INGEST_CHUNK_ROWS = 100_000
+# The accepted rows end up in one in-memory batch, so an upload's size is capped
+INGEST_MAX_ROWS = 1_000_000
+MAX_REPORTED_ERRORS = 20
+
+
+class UploadTooLargeError(ValueError):
+    """The upload has more rows than the ingest limit allows."""
+
+
+def iter_csv_chunks(stream, chunk_rows=INGEST_CHUNK_ROWS):
+    """Parses a CSV upload (header row required) into raw frames of at most `chunk_rows` rows."""
+    return pd.read_csv(
+        stream,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_rows,
+    )
+
+
+def iter_ndjson_chunks(stream, chunk_rows=INGEST_CHUNK_ROWS):
+    """Parses newline-delimited JSON objects into raw frames of at most `chunk_rows` rows."""
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    # Dates stay strings so validate_chunk applies the same YYYY-MM-DD check as for CSV.
+    # precise_float keeps amounts like 3.97 from coming back as 3.9699999999999998.
+    return pd.read_json(text, lines=True, dtype=False, convert_dates=False, precise_float=True, chunksize=chunk_rows)
+
+
+UPLOAD_PARSERS = {"csv": iter_csv_chunks, "ndjson": iter_ndjson_chunks}
+
+
+def validate_chunk(raw, first_row=0):
+    """
+    Checks a raw chunk against the ledger schema and coerces the valid rows.
+
+    Returns (typed frame of valid rows, [(row number, reason), ...]). Row numbers
+    count data rows from 1 across the whole upload, offset by `first_row`.
+    Raises ValueError if required columns are missing.
+    """
+    missing = [column for column in LEDGER_COLUMNS if column not in raw.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    ids = pd.to_numeric(raw['id'], errors='coerce').to_numpy(dtype='float64')
+    dates = pd.to_datetime(raw['date'].astype(str), format='%Y-%m-%d', errors='coerce')
+    amounts = pd.to_numeric(raw['amount'], errors='coerce').to_numpy(dtype='float64')
+    types = raw['type'].astype(str).str.strip().str.lower()
+    descriptions = raw['description'].astype(str).str.strip()
+    categories = raw['category'].astype(str).str.strip()
+
+    checks = [
+        (~np.isfinite(ids) | (ids != np.round(ids)), "invalid id"),
+        (dates.isna().to_numpy(), "invalid date (expected YYYY-MM-DD)"),
+        (~np.isfinite(amounts) | (amounts < 0), "invalid amount"),
+        (~types.isin(TRANSACTION_TYPES).to_numpy(), f"type must be one of {', '.join(TRANSACTION_TYPES)}"),
+        ((descriptions == "").to_numpy(), "missing description"),
+        ((categories == "").to_numpy(), "missing category"),
+    ]
+    invalid = np.zeros(len(raw), dtype=bool)
+    errors = []
+    for failed, reason in checks:
+        new = failed & ~invalid
+        errors.extend((first_row + int(row) + 1, reason) for row in np.flatnonzero(new)[:MAX_REPORTED_ERRORS])
+        invalid |= failed
+
+    valid = ~invalid
+    typed = pd.DataFrame({
+        'id': ids[valid].astype('int64'),
+        'date': dates.to_numpy()[valid],
+        'description': pd.Categorical(descriptions.to_numpy()[valid]),
+        'type': pd.Categorical(types.to_numpy()[valid]),
+        'amount': amounts[valid],
+        'category': pd.Categorical(categories.to_numpy()[valid]),
+    })
+    return typed, sorted(errors)[:MAX_REPORTED_ERRORS]
+
+
+def drop_duplicate_ids(batch, known_ids=None):
+    """
+    Keeps the first row for each id, skipping ids found in `known_ids` (a sorted int64 array).
+    Returns (deduplicated batch, number of rows dropped).
+    """
+    ids = batch['id'].to_numpy()
+    _, first = np.unique(ids, return_index=True)
+    keep = np.zeros(len(batch), dtype=bool)
+    keep[first] = True
+
+    if known_ids is not None and len(known_ids):
+        positions = np.minimum(np.searchsorted(known_ids, ids), len(known_ids) - 1)
+        keep &= known_ids[positions] != ids
+
+    if keep.all():
+        return batch, 0
+    return batch[keep].reset_index(drop=True), int(len(batch) - keep.sum())
+
+
+def read_upload(stream, fmt, chunk_rows=INGEST_CHUNK_ROWS, max_rows=INGEST_MAX_ROWS):
+    """
+    Streams an upload through the parser in `chunk_rows` chunks. Each chunk is
+    validated, stripped of ids seen earlier in the upload and spooled to a temporary
+    file, so parsing holds one raw chunk and the sorted ids seen so far. The accepted
+    rows are then read back as a single typed batch, which is appended in one step,
+    so memory still grows with the upload; uploads of more than `max_rows` rows are
+    refused with UploadTooLargeError as soon as a chunk passes the limit.
+    Returns (typed batch of valid rows with repeated ids removed, report dict).
+    Raises ValueError for an unknown format or a malformed upload.
+    """
+    if fmt not in UPLOAD_PARSERS:
+        raise ValueError(f"Unknown upload format '{fmt}', expected one of {sorted(UPLOAD_PARSERS)}")
+
+    errors = []
+    received = invalid = duplicates = accepted = 0
+    seen_ids = np.empty(0, dtype=np.int64)
+    with tempfile.TemporaryFile() as spool:
+        try:
+            for raw in UPLOAD_PARSERS[fmt](stream, chunk_rows):
+                received += len(raw)
+                if received > max_rows:
+                    raise UploadTooLargeError(f"Upload has more than {max_rows} rows; split it into smaller uploads")
+                typed, chunk_errors = validate_chunk(raw, first_row=received - len(raw))
+                invalid += len(raw) - len(typed)
+                errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+                typed, dropped = drop_duplicate_ids(typed, seen_ids)
+                duplicates += dropped
+                if typed.empty:
+                    continue
+                write_ledger_rows(spool, typed, header=accepted == 0)
+                accepted += len(typed)
+                seen_ids = np.union1d(seen_ids, typed['id'].to_numpy())
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ValueError(f"Could not parse {fmt} upload: {e}")
+
+        if accepted:
+            spool.seek(0)
+            batch = to_ledger_frame(read_ledger_csv(spool, float_precision='round_trip'))
+        else:
+            batch = concat_ledger_frames([])
+
+    return batch, {
+        "received": received,
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "invalid": invalid,
+        "errors": [{"row": row, "error": reason} for row, reason in errors],
+    }
@@ -0,0 +1,356 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from aggregates import MonthlyAggregateIndex
+from metrics import span, timed
+
+LEDGER_COLUMNS = ['id', 'date', 'description', 'type', 'amount', 'category']
+CATEGORICAL_COLUMNS = ['description', 'type', 'category']
+
+# On-disk binary ledger: a directory of .npy columns that workers memory-map
+LEDGER_FORMAT_VERSION = 1
+
+
+@timed("ledger_csv_parse")
+def read_ledger_csv(filepath, float_precision=None):
+    """
+    Parses a transactions CSV (id,date,description,type,amount,category) into a raw frame.
+    float_precision='round_trip' reads back amounts exactly as to_csv wrote them, at some cost in speed.
+    """
+    ledger = pd.read_csv(
+        filepath,
+        dtype={'date': str, 'description': str, 'type': str, 'category': str},
+        keep_default_na=False,
+        float_precision=float_precision,
+    )
+    ledger['id'] = ledger['id'].astype(int)
+    ledger['amount'] = ledger['amount'].astype(float)
+    return ledger
+
+
+def write_ledger_rows(file, frame, header):
+    """Writes ledger rows to an open binary file as CSV (dates as YYYY-MM-DD), with the header row if `header`."""
+    frame.to_csv(
+        file, columns=LEDGER_COLUMNS, header=header, index=False,
+        date_format='%Y-%m-%d', lineterminator="\n",
+    )
+
+
+@timed("ledger_frame_build")
+def to_ledger_frame(df):
+    """
+    Coerces a raw transactions frame (e.g. straight from read_csv) into the
+    store's column types: int64 ids, datetime64 dates, float64 amounts and
+    categorical text columns.
+    """
+    return pd.DataFrame({
+        'id': df['id'].astype('int64').to_numpy(),
+        'date': pd.to_datetime(df['date']).to_numpy(),
+        'description': pd.Categorical(df['description']),
+        'type': pd.Categorical(df['type']),
+        'amount': pd.to_numeric(df['amount']).astype('float64').to_numpy(),
+        'category': pd.Categorical(df['category']),
+    })
+
+
+class TransactionStore:
+    """
+    Typed, columnar in-memory ledger that backs every endpoint.
+
+    Rows are kept in ingestion order (which the ML engine relies on) and a
+    newest-first permutation is maintained for serving, so pages of the
+    ledger are read by position without sorting or scanning the whole history.
+    """
+
+    def __init__(self, df=None):
+        if df is None:
+            df = pd.DataFrame({column: [] for column in LEDGER_COLUMNS})
+        self._set_frame(to_ledger_frame(df))
+
+    @classmethod
+    def from_typed_frame(cls, frame, order=None):
+        """Wraps a frame that already has the store's column types, without copying it."""
+        store = cls.__new__(cls)
+        store._set_frame(frame, order)
+        return store
+
+    def _set_frame(self, frame, order=None):
+        self._frame = frame
+        if order is None:
+            order = _newest_first_order(frame)
+        self._order = order
+        self._monthly = None
+        self._derived = {}
+        # Bumped on every change so callers can tell whether derived results are stale
+        self.version = getattr(self, 'version', -1) + 1
+
+    def cached(self, name, compute):
+        """Memoizes `compute()` under `name` until the ledger changes."""
+        if name not in self._derived:
+            self._derived[name] = compute()
+        return self._derived[name]
+
+    @property
+    def monthly(self):
+        """(month, type, category) aggregate index, built on first use and kept current on append."""
+        if self._monthly is None:
+            with span("monthly_index_build"):
+                self._monthly = MonthlyAggregateIndex(self._frame)
+        return self._monthly
+
+    def append(self, df):
+        """
+        Appends a batch of transactions (raw or typed) to the ledger and updates
+        the derived state. The newest-first order is merged rather than re-sorted.
+        """
+        batch = to_ledger_frame(df)
+        if batch.empty:
+            return
+
+        old_size = len(self._frame)
+        frame = pd.DataFrame({
+            column: _concat_column([self._frame[column], batch[column]])
+            for column in LEDGER_COLUMNS
+        })
+
+        # Both sides are sorted by descending date; new rows go after existing rows of the same day
+        # Compare in one unit; the stored and appended dates may have different resolutions
+        old_keys = -self._frame['date'].to_numpy().astype('datetime64[ns]').astype('int64')[self._order]
+        batch_order = _newest_first_order(batch)
+        batch_keys = -batch['date'].to_numpy().astype('datetime64[ns]').astype('int64')[batch_order]
+        positions = np.searchsorted(old_keys, batch_keys, side='right')
+        order = np.insert(np.asarray(self._order), positions, batch_order + old_size)
+
+        monthly = self._monthly
+        self._set_frame(frame, order)
+        if monthly is not None:
+            monthly.add(batch)
+            self._monthly = monthly
+
+    def __len__(self):
+        return len(self._frame)
+
+    @property
+    def frame(self):
+        """The ledger in ingestion order. Treat as read-only."""
+        return self._frame
+
+    def newest_first(self):
+        """The ledger sorted by date, newest first (the old TRANSACTIONS_DB order)."""
+        return self._frame.take(self._order)
+
+    def newest_first_keys(self):
+        """Negated dates (ns) in newest-first order; ascending, so date bounds are binary searches."""
+        return self.cached('newest_first_keys', lambda: -_date_ns(self._frame['date'].to_numpy())[self._order])
+
+    def row_filter(self, type=None, categories=None, min_amount=None, max_amount=None, description=None, query=None):
+        """
+        Builds a predicate for page() from optional filters: a transaction type, a
+        list of categories, an amount range, a case-insensitive description
+        substring and a `query` substring matched against the description or the
+        category. Text filters are evaluated once per distinct value and looked up
+        by category code. Returns None when no filter is set.
+        """
+        frame = self._frame
+        checks = []
+        if type is not None:
+            checks.append(_code_check(frame['type'], frame['type'].cat.categories == type))
+        if categories:
+            checks.append(_code_check(frame['category'], frame['category'].cat.categories.isin(categories)))
+        if description:
+            checks.append(self._substring_check('description', description))
+        if query:
+            in_description = self._substring_check('description', query)
+            in_category = self._substring_check('category', query)
+            checks.append(lambda rows: in_description(rows) | in_category(rows))
+
+        amounts = frame['amount'].to_numpy()
+        if min_amount is not None:
+            checks.append(lambda rows: amounts[rows] >= min_amount)
+        if max_amount is not None:
+            checks.append(lambda rows: amounts[rows] <= max_amount)
+
+        if not checks:
+            return None
+
+        def matches(rows):
+            mask = checks[0](rows)
+            for check in checks[1:]:
+                mask &= check(rows)
+            return mask
+        return matches
+
+    def _substring_check(self, column, text):
+        lowered = self.cached(f'{column}_lower', lambda: self._frame[column].cat.categories.str.lower())
+        return _code_check(self._frame[column], lowered.str.contains(text.lower(), regex=False))
+
+    def page(self, after=None, limit=100, start=None, end=None, row_filter=None):
+        """
+        One page of the newest-first ledger, optionally restricted to dates in
+        [start, end] and to rows accepted by `row_filter` (see row_filter()).
+
+        `after` is the (date ns, row) key of the last row of the previous page.
+        Keys stay valid across appends, so paging never skips or repeats rows.
+        Only about a page's worth of rows is scanned when filters are not selective.
+        Returns (frame of up to `limit` rows, key of its last row, or None on the last page).
+        """
+        keys = self.newest_first_keys()
+        order = self._order
+        lo, hi = 0, len(keys)
+        if end is not None:
+            lo = int(np.searchsorted(keys, -_date_ns(end + pd.Timedelta(days=1)), side='right'))
+        if start is not None:
+            hi = int(np.searchsorted(keys, -_date_ns(start), side='right'))
+        if after is not None:
+            date_ns, row = after
+            # Same-day rows are in ingestion order, so the row number orders them
+            first = int(np.searchsorted(keys, -date_ns, side='left'))
+            last = int(np.searchsorted(keys, -date_ns, side='right'))
+            lo = max(lo, first + int(np.searchsorted(order[first:last], row, side='right')))
+
+        chunks = []
+        found = 0
+        block = max(4 * (limit + 1), 1024)
+        while lo < hi and found <= limit:
+            rows = np.asarray(order[lo:min(hi, lo + block)])
+            if row_filter is not None:
+                rows = rows[row_filter(rows)]
+            chunks.append(rows)
+            found += len(rows)
+            lo += block
+            block *= 2  # widen the scan when filters are selective
+
+        rows = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+        page = self._frame.take(rows[:limit])
+        if len(rows) <= limit:
+            return page, None
+        last = rows[limit - 1]
+        return page, (int(_date_ns(self._frame['date'].to_numpy()[last])), int(last))
+
+    def records(self):
+        """Newest-first list of transaction dicts, for callers that need Python objects."""
+        ordered = self.newest_first()
+        return ordered.assign(date=ordered['date'].dt.strftime('%Y-%m-%d')).to_dict('records')
+
+
+@timed("json_serialize")
+def records_json(frame):
+    """Serializes ledger rows as a JSON array of transaction objects (dates as YYYY-MM-DD)."""
+    return frame.assign(date=frame['date'].dt.strftime('%Y-%m-%d')).to_json(orient='records')
+
+
+def _concat_column(parts):
+    if isinstance(parts[0].dtype, pd.CategoricalDtype):
+        if len({part.cat.categories.dtype for part in parts}) > 1:
+            # e.g. an empty ledger's object categories next to parsed string categories
+            parts = [part.astype(pd.CategoricalDtype(part.cat.categories.astype(object))) for part in parts]
+        return union_categoricals(parts)
+    return np.concatenate([part.to_numpy() for part in parts])
+
+
+def concat_ledger_frames(frames):
+    """Concatenates typed ledger frames, merging the categorical dictionaries."""
+    if not frames:
+        return to_ledger_frame(pd.DataFrame({column: [] for column in LEDGER_COLUMNS}))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.DataFrame({
+        column: _concat_column([frame[column] for frame in frames])
+        for column in LEDGER_COLUMNS
+    })
+
+
+def _date_ns(dates):
+    return np.asarray(dates, dtype='datetime64[ns]').astype('int64')
+
+
+def _code_check(column, allowed):
+    # `allowed` is per category; a trailing False catches the -1 code of missing values
+    allowed = np.append(np.asarray(allowed, dtype=bool), False)
+    codes = column.cat.codes.to_numpy()
+    return lambda rows: allowed[codes[rows]]
+
+
+def _newest_first_order(frame):
+    # Newest first; stable so same-day rows keep their ingestion order
+    return np.argsort(-frame['date'].to_numpy().astype('int64'), kind='stable')
+
+
+def save_ledger_binary(df, path, source_digest=None):
+    """
+    Writes a ledger as a directory of .npy columns: fixed-width id/date/amount
+    arrays, dictionary-encoded text columns (codes .npy + JSON dictionary) and
+    the precomputed newest-first order. The directory is swapped in atomically,
+    so running workers keep their existing mappings.
+    """
+    frame = to_ledger_frame(df)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, 'id.npy'), frame['id'].to_numpy())
+    np.save(os.path.join(tmp_path, 'date.npy'), frame['date'].to_numpy().astype('datetime64[ns]'))
+    np.save(os.path.join(tmp_path, 'amount.npy'), frame['amount'].to_numpy())
+    np.save(os.path.join(tmp_path, 'order.npy'), _newest_first_order(frame))
+
+    for column in CATEGORICAL_COLUMNS:
+        values = frame[column].cat
+        np.save(os.path.join(tmp_path, f'{column}.codes.npy'), values.codes.to_numpy())
+        with open(os.path.join(tmp_path, f'{column}.dict.json'), 'w', encoding='utf-8') as file:
+            json.dump(values.categories.tolist(), file)
+
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump({
+            "format_version": LEDGER_FORMAT_VERSION,
+            "rows": len(frame),
+            "source_digest": source_digest,
+        }, file)
+
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def read_ledger_meta(path):
+    """Returns the meta.json of a binary ledger directory."""
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+
+@timed("ledger_binary_map")
+def load_ledger_binary(path):
+    """
+    Memory-maps a binary ledger written by save_ledger_binary and returns a
+    TransactionStore over it. Numeric columns and category codes stay backed by
+    the page cache, so every worker mapping the same files shares those pages.
+    """
+    meta = read_ledger_meta(path)
+    if meta.get("format_version") != LEDGER_FORMAT_VERSION:
+        raise ValueError(f"Unsupported ledger format version {meta.get('format_version')} in {path}")
+
+    def column(name):
+        return np.load(os.path.join(path, name), mmap_mode='r')
+
+    columns = {
+        'id': column('id.npy'),
+        'date': column('date.npy'),
+        'description': None,
+        'type': None,
+        'amount': column('amount.npy'),
+        'category': None,
+    }
+    for name in CATEGORICAL_COLUMNS:
+        with open(os.path.join(path, f'{name}.dict.json'), encoding='utf-8') as file:
+            categories = json.load(file)
+        columns[name] = pd.Categorical.from_codes(column(f'{name}.codes.npy'), categories=categories, validate=False)
+
+    frame = pd.DataFrame(columns, copy=False)
+    return TransactionStore.from_typed_frame(frame, order=column('order.npy'))
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from result_cache import ResultCache
+
+
+def normalize_prompt(prompt):
+    """Collapses whitespace so prompts that differ only in indentation share a cache entry."""
+    return " ".join(prompt.split())
+
+
+class LLMResponseCache:
+    """
+    Shared cache for LLM responses, keyed on (model name, system prompt, normalized prompt).
+
+    Entries live in an in-memory LRU bounded to `max_entries` and expire after
+    `ttl_seconds`. When `disk_dir` is set, entries are also written to a
+    ResultCache there so other workers and restarts can reuse them.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, disk_dir=None, disk_max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = ResultCache(disk_dir, max_bytes=disk_max_bytes) if disk_dir else None
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name, system_prompt, prompt):
+        parts = (model_name or "", normalize_prompt(system_prompt or ""), normalize_prompt(prompt))
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def _fresh(self, stored_at):
+        return self.ttl_seconds is None or time.time() - stored_at < self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None and self._fresh(entry[0]):
+                with self._lock:
+                    self._store(key, entry)
+                    self.hits += 1
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,315 @@
+import random
+import threading
+import time
+
+from metrics import METRICS
+
+# HTTP statuses worth retrying: quota (429) and transient server-side failures.
+# google.api_core exceptions carry these as `.code` for both the gRPC and REST transports.
+TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class LLMUnavailableError(Exception):
+    """The gateway gave up on a call without a usable response from the model."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """The model's circuit breaker is open, so the call was not attempted."""
+
+
+class DeadlineExceededError(LLMUnavailableError):
+    """The call's deadline passed while waiting for a slot, a token, a retry or a coalesced call."""
+
+
+def is_transient(error):
+    """True for failures a retry can fix: quota and 5xx responses, timeouts and connection errors."""
+    if isinstance(error, LLMUnavailableError):
+        return False
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS
+    # requests/socket timeouts and connection resets are OSErrors
+    return isinstance(error, (OSError, TimeoutError))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """
+        Takes one token, sleeping until one refills. Returns False without taking one
+        if that would be after `deadline` (a time.monotonic() value). A rate of 0 is unlimited.
+        """
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a model that keeps failing. After `failure_threshold` consecutive
+    transient failures the circuit opens and calls fail fast for `reset_seconds`; then
+    it is half-open: calls go through, the first success closes it and a failure
+    reopens it for another `reset_seconds`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        with self._lock:
+            return self._state() != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """Counts a transient failure. Returns True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self._state() == self.HALF_OPEN or (self._opened_at is None and self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ModelLane:
+    """Per-model limits: a concurrency semaphore, a rate limiter and a circuit breaker."""
+
+    def __init__(self, name, max_concurrency, rate, burst, breaker_failures, breaker_reset_seconds):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self.in_flight = 0
+
+
+class _Flight:
+    """A call in progress that identical concurrent calls wait on instead of repeating it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, deadline):
+        if not self.done.wait(max(deadline - time.monotonic(), 0)):
+            raise DeadlineExceededError("deadline passed waiting for an identical in-flight call")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class LLMGateway:
+    """
+    Admission control for model calls, shared by every request in the process.
+
+    Each model name gets its own lane: at most `max_concurrency` calls in flight, a
+    token bucket of `rate` calls per second (bursts of `burst`) and a circuit breaker.
+    A call has a deadline, `deadline_seconds` from its start unless the caller passes
+    a shorter timeout. Waiting for a token or a slot, each attempt (capped at
+    `attempt_timeout`) and the backoff between retries all come out of that budget.
+    Transient failures (see is_transient) are retried up to `max_retries` times with
+    exponential backoff and full jitter, but never past the deadline. Calls with the
+    same key that overlap share one underlying call and its result or error.
+
+    Limits are per process, so each gunicorn worker spends its own share of the quota.
+    """
+
+    def __init__(self, max_concurrency=4, rate=1.0, burst=5, max_retries=3, attempt_timeout=20.0,
+                 deadline_seconds=45.0, backoff=0.5, max_backoff=8.0, breaker_failures=5,
+                 breaker_reset_seconds=30.0):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.attempt_timeout = attempt_timeout
+        self.deadline_seconds = deadline_seconds
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._lanes = {}
+        self._inflight = {}  # coalescing key -> _Flight
+        self._lock = threading.Lock()
+
+    def lane(self, model_name):
+        with self._lock:
+            lane = self._lanes.get(model_name)
+            if lane is None:
+                lane = self._lanes[model_name] = ModelLane(
+                    model_name, self.max_concurrency, self.rate, self.burst,
+                    self.breaker_failures, self.breaker_reset_seconds,
+                )
+            return lane
+
+    def _deadline(self, timeout):
+        seconds = self.deadline_seconds if timeout is None else min(timeout, self.deadline_seconds)
+        return time.monotonic() + seconds
+
+    def call(self, model_name, fn, key=None, timeout=None):
+        """
+        Returns fn(attempt_seconds), where fn makes one model request that must give up
+        after attempt_seconds. Concurrent calls with the same non-None `key` run fn once.
+        Raises CircuitOpenError or DeadlineExceededError when the gateway gives up, or
+        fn's own exception when it is not transient or the retries ran out.
+        """
+        lane = self.lane(model_name)
+        deadline = self._deadline(timeout)
+        if key is None:
+            return self._with_retries(lane, deadline, lambda: self._attempt(lane, deadline, fn))
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            METRICS.inc("llm_coalesced_total", model=model_name)
+            return flight.wait(deadline)
+
+        try:
+            flight.result = self._with_retries(lane, deadline, lambda: self._attempt(lane, deadline, fn))
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def stream(self, model_name, start, timeout=None):
+        """
+        Yields the chunks of a streamed model call. start(attempt_seconds) returns the
+        chunk iterator. Opening the stream and reading its first chunk are retried like
+        call(); once a chunk has been yielded, errors propagate to the consumer. The
+        lane's slot is held until the stream ends or is closed. Streams are not coalesced.
+        """
+        lane = self.lane(model_name)
+        deadline = self._deadline(timeout)
+
+        def open_stream():
+            seconds = self._admit(lane, deadline)
+            try:
+                chunks = iter(start(seconds))
+                return chunks, next(chunks, None)
+            except Exception as e:
+                self._release(lane, e, deadline)
+                raise
+
+        chunks, first = self._with_retries(lane, deadline, open_stream)
+        error = None
+        try:
+            if first is not None:
+                yield first
+                yield from chunks
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(lane, error, deadline)
+
+    def _attempt(self, lane, deadline, fn):
+        seconds = self._admit(lane, deadline)
+        try:
+            result = fn(seconds)
+        except Exception as e:
+            self._release(lane, e, deadline)
+            raise
+        self._release(lane)
+        return result
+
+    def _admit(self, lane, deadline):
+        """Claims a token and a slot in `lane`. Returns the attempt's timeout in seconds."""
+        if not lane.breaker.allow():
+            METRICS.inc("llm_rejected_total", model=lane.name, reason="circuit_open")
+            raise CircuitOpenError(f"{lane.name}: circuit open after {lane.breaker.failures} failures")
+        if not lane.bucket.acquire(deadline):
+            METRICS.inc("llm_rejected_total", model=lane.name, reason="rate_limited")
+            raise DeadlineExceededError(f"{lane.name}: rate limit wait would pass the deadline")
+        if not lane.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            METRICS.inc("llm_rejected_total", model=lane.name, reason="concurrency")
+            raise DeadlineExceededError(f"{lane.name}: no free slot before the deadline")
+        with self._lock:
+            lane.in_flight += 1
+        return max(min(self.attempt_timeout, deadline - time.monotonic()), 0.001)
+
+    def _release(self, lane, error=None, deadline=None):
+        with self._lock:
+            lane.in_flight -= 1
+        lane.slots.release()
+        if error is None:
+            lane.breaker.record_success()
+        elif deadline is not None and time.monotonic() >= deadline:
+            pass  # ran into the caller's deadline, which says little about the model's health
+        elif is_transient(error) and lane.breaker.record_failure():
+            METRICS.inc("llm_circuit_opened_total", model=lane.name)
+            print(f"LLM circuit for {lane.name} opened after {lane.breaker.failures} failures: {error}")
+
+    def _with_retries(self, lane, deadline, attempt):
+        for retry in range(self.max_retries + 1):
+            try:
+                return attempt()
+            except Exception as e:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+                if retry == self.max_retries or not is_transient(e) or time.monotonic() + delay >= deadline:
+                    raise
+                METRICS.inc("llm_retries_total", model=lane.name)
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            lanes = list(self._lanes.values())
+            coalescing = len(self._inflight)
+        return {
+            "coalescing": coalescing,
+            "models": {
+                lane.name: {
+                    "in_flight": lane.in_flight,
+                    "max_concurrency": lane.max_concurrency,
+                    "circuit": lane.breaker.state,
+                    "consecutive_failures": lane.breaker.failures,
+                }
+                for lane in lanes
+            },
+        }
@@ -0,0 +1,158 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    In-process counters and latency histograms, rendered in the Prometheus text format.
+
+    Recording is a perf_counter pair, a dict update and a bisect under one lock,
+    about two microseconds, so spans can sit on hot paths. When disabled, spans and
+    counters do nothing. Values such as cache sizes that other objects already
+    track are read at render time through collectors rather than copied here.
+    Each process (e.g. each gunicorn worker) keeps its own values.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, label pairs) -> value
+        self._histograms = {}  # (name, label pairs) -> [per-bucket counts..., +Inf count, sum]
+        self._help = {}        # name -> (type, help text)
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        """Sets a metric's TYPE ('counter', 'gauge' or 'histogram') and HELP line."""
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block into the span_duration_seconds histogram (exceptions included)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("span_duration_seconds", time.perf_counter() - start, span=name)
+
+    def timed(self, name=None):
+        """Decorator form of span(); the span is named after the function unless `name` is given."""
+        def decorate(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe("span_duration_seconds", time.perf_counter() - start, span=span_name)
+            return wrapper
+        return decorate
+
+    def collector(self, fn):
+        """
+        Registers `fn()` to be called on every render; it returns (name, labels dict, value)
+        samples, e.g. sizes owned by a cache. Usable as a decorator.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+
+        samples = {}  # name -> [(label pairs, value)]
+        kinds = {}     # name -> type unless describe() set one: inc() makes counters, collectors gauges
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append((labels, value))
+            kinds[name] = "counter"
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    samples.setdefault(name, []).append((_label_key(labels), value))
+                    kinds.setdefault(name, "gauge")
+            except Exception as e:
+                print(f"Metrics collector {getattr(collect, '__name__', collect)} failed: {e}")
+
+        lines = []
+        for name in sorted(samples):
+            lines.extend(self._header(name, kinds[name]))
+            for labels, value in sorted(samples[name]):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.extend(self._header(name, "histogram"))
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, default_kind):
+        kind, help_text = self._help.get(name, (default_kind, None))
+        return ([f"# HELP {name} {help_text}"] if help_text else []) + [f"# TYPE {name} {kind}"]
+
+
+# Shared by the app and the analysis modules. METRICS_ENABLED=0 turns recording off.
+METRICS = Metrics(enabled=os.getenv("METRICS_ENABLED", "1") != "0")
+METRICS.describe("span_duration_seconds", "histogram", "Time spent in instrumented functions and stages.")
+span = METRICS.span
+timed = METRICS.timed
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running server, switched on and off at runtime.
+
+    While running, a background thread samples every other thread's Python stack
+    (sys._current_frames) every `interval` seconds and counts identical stacks.
+    Results are folded stacks ("outer;inner count" per line), the input format of
+    flamegraph.pl and speedscope. Costs one stack walk per thread per sample while
+    running and nothing while stopped.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks = Counter()
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Starts sampling into a fresh profile. Returns False if already running."""
+        with self._lock:
+            if self.running:
+                return False
+            if interval:
+                self.interval = interval
+            self._stacks = Counter()
+            self._samples = 0
+            self._stop.clear()
+            self.started_at, self.stopped_at = time.time(), None
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stops sampling and keeps the profile for folded(). Returns False if not running."""
+        with self._lock:
+            if not self.running:
+                return False
+            self._stop.set()
+            thread = self._thread
+        thread.join()
+        self.stopped_at = time.time()
+        return True
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    names.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    def folded(self, limit=None):
+        """The profile as folded stacks, most frequent first (the top `limit` stacks if given)."""
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def report(self):
+        with self._lock:
+            samples, distinct = self._samples, len(self._stacks)
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": samples,
+            "distinct_stacks": distinct,
+            "seconds": round(end - self.started_at, 3) if self.started_at else None,
+        }
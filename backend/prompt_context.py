@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+from recurring import normalize_vendors
+
+# Rough chars-per-token ratio for English/number-heavy prompts
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token); good enough for budgeting prompts."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_anomalies(anomalies, top_k=5):
+    """The `top_k` most severe anomalies (by |Z-score|, newest first on ties), trimmed to the fields the LLM needs."""
+    if hasattr(anomalies, "top"):
+        # An AnomalyTable keeps its ranking precomputed
+        return anomalies.top(top_k)
+    ranked = sorted(anomalies, key=lambda a: a.get('date', ''), reverse=True)
+    ranked.sort(key=lambda a: abs(a.get('z_score', 0)), reverse=True)
+    return [
+        {
+            "id": a.get('id'),
+            "date": a.get('date'),
+            "description": a.get('description'),
+            "category": a.get('category'),
+            "amount": a.get('amount'),
+            "reasons": a.get('flag_reasons', []),
+            "severity": a.get('severity'),
+        }
+        for a in ranked[:top_k]
+    ]
+
+
+def _anomaly_line(a):
+    return (f"#{a['id']} {a['date']} {a['description']} ({a['category']}) ${a['amount']:,.2f}"
+            f" - {', '.join(a['reasons'])}, {a['severity']}")
+
+
+def income_stream_lines(streams):
+    """One line per active income stream (largest first), as listed in the income profile."""
+    return [
+        f"{stream['name']}: {stream['type']}, {stream['frequency']}, ~${stream['monthly_amount']:,.2f}/month"
+        f" ({stream['deposits']} deposits, last {stream['last_date']})"
+        for stream in streams
+        if stream['active']
+    ]
+
+
+def monthly_category_lines(aggregates, months=6, top_categories=8):
+    """One line per recent month: the month's top spending categories, with the rest folded into 'other'."""
+    rollup = aggregates.monthly_category_totals(type='withdrawal', last_months=months)
+    lines = []
+    for month, totals in rollup.items():
+        totals = totals.sort_values(ascending=False)
+        parts = [f"{category} {amount:,.0f}" for category, amount in totals.iloc[:top_categories].items()]
+        other = totals.iloc[top_categories:].sum()
+        if other > 0:
+            parts.append(f"other {other:,.0f}")
+        lines.append(f"{month}: total {totals.sum():,.0f} | " + ", ".join(parts))
+    return lines
+
+
+def vendor_summary(df, max_vendors=150):
+    """
+    Per-vendor charge statistics for subscription detection: withdrawals grouped by
+    normalized vendor and amount, keeping repeated charges and small odd amounts.
+    Bounded by `max_vendors` regardless of ledger size.
+    """
+    withdrawals = df[df['type'] == 'withdrawal']
+    if withdrawals.empty:
+        return []
+
+    descriptions = withdrawals['description']
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        vendors = normalize_vendors(descriptions.cat.categories.to_numpy()).to_numpy()[descriptions.cat.codes.to_numpy()]
+    else:
+        vendors = normalize_vendors(descriptions.to_numpy()).to_numpy()
+
+    charges = pd.DataFrame({
+        'vendor': vendors,
+        'cents': np.round(withdrawals['amount'].to_numpy() * 100).astype('int64'),
+        'date': withdrawals['date'].to_numpy(),
+        'name': np.asarray(descriptions, dtype=object),
+        'category': np.asarray(withdrawals['category'], dtype=object),
+    }).sort_values('date', kind='stable')
+
+    grouped = charges.groupby(['vendor', 'cents'], sort=False)
+    charges['gap'] = grouped['date'].diff().dt.days.to_numpy()
+    stats = grouped.agg(
+        name=('name', 'last'),
+        category=('category', 'last'),
+        count=('date', 'size'),
+        first=('date', 'min'),
+        last=('date', 'max'),
+        median_gap=('gap', 'median'),
+    ).reset_index()
+
+    stats = stats[(stats['count'] >= 2) | (stats['cents'] < 500)]
+    stats = stats.sort_values(['count', 'last'], ascending=False).iloc[:max_vendors]
+
+    return [
+        {
+            "name": row.name,
+            "category": row.category,
+            "amount": row.cents / 100,
+            "count": int(row.count),
+            "first": row.first.strftime('%Y-%m-%d'),
+            "last": row.last.strftime('%Y-%m-%d'),
+            "median_gap_days": None if pd.isna(row.median_gap) else float(row.median_gap),
+        }
+        for row in stats.itertuples(index=False)
+    ]
+
+
+def vendor_lines(vendors):
+    return [
+        f"{v['name']} ({v['category']}) ${v['amount']:,.2f} x{v['count']}, {v['first']}..{v['last']}"
+        + (f", every ~{v['median_gap_days']:.0f}d" if v['median_gap_days'] is not None else "")
+        for v in vendors
+    ]
+
+
+def fit_sections(sections, token_budget):
+    """
+    Renders (title, lines, max_lines) sections in priority order within `token_budget`.
+    Each section keeps at most `max_lines` lines (None for no cap), and lower-priority
+    sections lose their trailing lines first; dropped lines are noted so the model
+    knows the list is partial.
+    Returns (text, per-section token counts).
+    """
+    rendered = []
+    used = 0
+    section_tokens = {}
+    for title, lines, max_lines in sections:
+        header = f"{title}:"
+        header_tokens = estimate_tokens(header) + 1
+        if used + header_tokens > token_budget:
+            section_tokens[title] = 0
+            continue
+
+        kept = []
+        section_used = header_tokens
+        for line in lines[:max_lines]:
+            line_tokens = estimate_tokens(line) + 1
+            if used + section_used + line_tokens > token_budget:
+                break
+            kept.append(line)
+            section_used += line_tokens
+
+        if len(kept) < len(lines):
+            kept.append(f"(+{len(lines) - len(kept)} more omitted)")
+        if not lines:
+            kept.append("None")
+        body = "\n".join(f"- {line}" for line in kept)
+        rendered.append(f"{header}\n{body}")
+        used += section_used
+        section_tokens[title] = section_used
+
+    return "\n\n".join(rendered), section_tokens
+
+
+def build_coach_context(store, ml_results, income_profile, recurring_charges, token_budget=1200,
+                        top_k_anomalies=5, months=6, max_list_lines=12):
+    """
+    Bounded-size financial context for the coach prompt: income profile and streams, insights,
+    top-K anomalies, recurring charges and recent per-category monthly totals.
+    Returns {"text", "tokens", "sections"}; size stays flat as the ledger grows.
+    """
+    income = income_profile or {}
+    sections = [
+        ("Income Profile", [
+            f"{income.get('income_type', 'unknown')} income, {income.get('income_frequency', 'unknown')},"
+            f" ~${income.get('estimated_monthly_income', 0):,.2f}/month, last deposit {income.get('last_income_date')}"
+        ] + income_stream_lines(income.get('streams', [])), max_list_lines // 2),
+        ("Spending Insights", list(ml_results.get("insights", [])), max_list_lines),
+        (f"Top {top_k_anomalies} Anomalies (high spending events)",
+         [_anomaly_line(a) for a in compact_anomalies(ml_results.get("anomalies", []), top_k_anomalies)], None),
+        (f"Monthly Spending by Category (last {months} months)", monthly_category_lines(store.monthly, months), None),
+        ("Recurring Charges", [
+            f"{c['name']} ${c['amount']:,.2f} {c['frequency'].lower()} (~${c['monthly_amount']:,.2f}/month)"
+            for c in recurring_charges
+        ], max_list_lines),
+    ]
+    text, section_tokens = fit_sections(sections, token_budget)
+    return {"text": text, "tokens": estimate_tokens(text), "sections": section_tokens}
+
+
+def build_subscription_context(store, token_budget=3000, max_vendors=150):
+    """Bounded per-vendor charge summary used in place of the raw ledger for subscription detection."""
+    vendors = store.cached(("vendor_summary", max_vendors), lambda: vendor_summary(store.frame, max_vendors))
+    text, section_tokens = fit_sections([("Charges by vendor and amount", vendor_lines(vendors), None)], token_budget)
+    return {"text": text, "tokens": estimate_tokens(text), "sections": section_tokens}
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+# Billing cadences: (label, nominal gap in days, allowed drift in days)
+CADENCES = [
+    ("Weekly", 7.0, 2.0),
+    ("Biweekly", 14.0, 3.0),
+    ("Monthly", 30.4375, 5.0),
+    ("Quarterly", 91.3125, 5.0),
+    ("Annual", 365.25, 5.0),
+]
+DAYS_IN_MONTH = 30.4375 # Standardized (365.25 / 12)
+
+# Mandatory cost-of-living spend is counted separately from discretionary subscriptions
+DEFAULT_EXCLUDED_CATEGORIES = ("Housing", "Utilities", "Insurance", "Income")
+
+# Noise stripped from raw descriptions before grouping, e.g. "TST* NETFLIX.COM #1234" -> "netflix"
+_VENDOR_PREFIX = r"^(?:tst\*|sq \*|sq\*|paypal \*|pp\*|pos |ach )\s*"
+_VENDOR_NOISE = r"(?:#\s*\d+|\b\d{3,}\b|\.com\b|\*|[^\w\s])"
+
+
+def normalize_vendors(descriptions):
+    """Vectorized vendor normalization: lowercase, strip processor prefixes, store numbers and punctuation."""
+    return (
+        pd.Series(descriptions, dtype=object).astype(str).str.lower()
+        .str.replace(_VENDOR_PREFIX, "", regex=True)
+        .str.replace(_VENDOR_NOISE, " ", regex=True)
+        .str.split().str.join(" ")
+    )
+
+
+@timed()
+def detect_recurring_charges(df, min_occurrences=3, excluded_categories=DEFAULT_EXCLUDED_CATEGORIES,
+                             min_regular_share=0.75):
+    """
+    Finds recurring charges deterministically.
+
+    Withdrawals are grouped by (normalized vendor, amount in cents). A group is
+    recurring when at least `min_occurrences` charges exist and at least
+    `min_regular_share` of the gaps between them fall within a cadence's drift
+    window (weekly/biweekly/monthly/quarterly/annual, ±5 days for monthly and longer).
+    A charge is active if its last occurrence is within 1.5 periods of the
+    ledger's latest transaction.
+
+    Returns a list of dicts compatible with the subscription list used by the frontend.
+    """
+    if df.empty:
+        return []
+
+    withdrawals = df[df['type'] == 'withdrawal']
+    if excluded_categories:
+        withdrawals = withdrawals[~withdrawals['category'].isin(list(excluded_categories))]
+    if withdrawals.empty:
+        return []
+
+    # Normalize each distinct description once (cheap for categorical columns)
+    descriptions = withdrawals['description']
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        vendor_names = normalize_vendors(descriptions.cat.categories.to_numpy())
+        vendors = vendor_names.to_numpy()[descriptions.cat.codes.to_numpy()]
+    else:
+        vendors = normalize_vendors(descriptions.to_numpy()).to_numpy()
+
+    charges = pd.DataFrame({
+        'vendor': vendors,
+        'cents': np.round(withdrawals['amount'].to_numpy() * 100).astype('int64'),
+        'date': withdrawals['date'].to_numpy(),
+        'description': np.asarray(withdrawals['description'], dtype=object),
+        'category': np.asarray(withdrawals['category'], dtype=object),
+    })
+
+    # Only groups with enough charges can be recurring; drop the rest before sorting
+    group_size = charges.groupby(['vendor', 'cents'])['date'].transform('size')
+    charges = charges[group_size.to_numpy() >= min_occurrences]
+    if charges.empty:
+        return []
+
+    charges = charges.sort_values(['vendor', 'cents', 'date'], kind='stable')
+    grouped = charges.groupby(['vendor', 'cents'], sort=False)
+    charges['gap'] = grouped['date'].diff().dt.days.to_numpy()
+
+    summary = grouped.agg(
+        occurrences=('date', 'size'),
+        last_date=('date', 'max'),
+        name=('description', 'last'),
+        category=('category', 'last'),
+    )
+
+    # Share of gaps within each cadence's drift window, one vectorized pass per cadence
+    group_ids = grouped.ngroup().to_numpy()
+    gaps = charges['gap'].to_numpy()
+    has_gap = ~np.isnan(gaps)
+    gap_counts = np.maximum(np.bincount(group_ids[has_gap], minlength=len(summary)), 1)
+
+    best_label = np.full(len(summary), None, dtype=object)
+    best_period = np.full(len(summary), np.nan)
+    best_share = np.zeros(len(summary))
+    for label, period, drift in CADENCES:
+        in_window = has_gap & (np.abs(gaps - period) <= drift)
+        share = np.bincount(group_ids[in_window], minlength=len(summary)) / gap_counts
+        better = (share >= min_regular_share) & (share > best_share)
+        best_label[better] = label
+        best_period[better] = period
+        best_share[better] = share[better]
+
+    summary['frequency'] = best_label
+    summary['period'] = best_period
+    summary['regularity'] = best_share
+    summary = summary[summary['frequency'].notna()]
+    if summary.empty:
+        return []
+
+    latest = df['date'].max()
+    days_since = (latest - summary['last_date']).dt.days
+    summary = summary[days_since <= summary['period'] * 1.5]
+
+    results = []
+    for (vendor, cents), row in summary.sort_values('last_date', ascending=False).iterrows():
+        amount = cents / 100
+        monthly_amount = amount * DAYS_IN_MONTH / row['period']
+        is_gray = amount < 5 and row['category'] != 'Subscription'
+        results.append({
+            "name": row['name'],
+            "amount": amount,
+            "frequency": row['frequency'],
+            "monthly_amount": round(monthly_amount, 2),
+            "confidence": "High" if row['regularity'] >= 0.9 and row['occurrences'] >= 4 else "Medium",
+            "type": "Potential Gray Charge" if is_gray else "Subscription",
+            "occurrences": int(row['occurrences']),
+            "last_date": row['last_date'].strftime('%Y-%m-%d'),
+            "ai_note": f"{row['frequency']} charge of ${amount:,.2f}, seen {int(row['occurrences'])} times",
+        })
+    return results
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache for expensive startup results.
+
+    Entries are pickled into `cache_dir` under a hash of their key parts. Writes
+    are atomic so several gunicorn workers can share the directory, and the
+    least recently used entries are evicted once the directory grows past
+    `max_bytes`. An empty `cache_dir` disables the cache.
+    """
+
+    SUFFIX = '.pkl'
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Builds a cache key from any number of string-able parts."""
+        return hashlib.sha256("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an unreadable entry."""
+        if not self.cache_dir:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # Corrupt or incompatible entry (e.g. written by another library version)
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Stores a value under `key`, then evicts old entries if over budget."""
+        if not self.cache_dir:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Could not write cache entry {key}: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first; the entry just written is the newest so it is evicted last
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
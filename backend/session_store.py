@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class MemorySessionStore:
+    """
+    Per-process chat history.
+
+    Each session keeps only its last `max_messages` messages in a ring buffer.
+    Sessions idle for longer than `idle_ttl_seconds` expire, and the least
+    recently used sessions are evicted beyond `max_sessions`.
+    """
+
+    def __init__(self, max_messages=10, max_sessions=1000, idle_ttl_seconds=3600):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        self._sessions = OrderedDict()  # session_id -> [last_seen, deque of messages, total messages]
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessions are kept in last-access order, so expired ones are at the front
+        if self.idle_ttl_seconds is not None:
+            while self._sessions:
+                last_seen = next(iter(self._sessions.values()))[0]
+                if now - last_seen < self.idle_ttl_seconds:
+                    break
+                self._sessions.popitem(last=False)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _touch(self, session_id, now):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = [now, deque(maxlen=self.max_messages), 0]
+            self._sessions[session_id] = session
+        session[0] = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def recent(self, session_id, limit):
+        """The last `limit` messages of a session, oldest first."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            self._touch(session_id, now)
+            return list(session[1])[-limit:] if limit else []
+
+    def append(self, session_id, *messages):
+        """Adds messages ({"role", "content"}) to a session and returns its total message count."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._touch(session_id, now)
+            session[1].extend(messages)
+            session[2] += len(messages)
+            self._evict(now)
+            return session[2]
+
+    def length(self, session_id):
+        """Total messages ever added to a live session (including ones rotated out of the buffer)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session[2] if session is not None else 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+class SQLiteSessionStore:
+    """
+    Chat history in a local SQLite file, shared by every worker process on the host.
+
+    Same semantics as MemorySessionStore: a ring buffer of `max_messages` per
+    session, idle-TTL expiry and LRU eviction beyond `max_sessions`. Expiry runs
+    at most every `evict_interval_seconds` to keep writes cheap.
+    """
+
+    def __init__(self, path, max_messages=10, max_sessions=1000, idle_ttl_seconds=3600,
+                 evict_interval_seconds=30):
+        self.path = path
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evict_interval_seconds = evict_interval_seconds
+
+        self._local = threading.local()
+        self._last_evict = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_seen REAL NOT NULL,
+                    total INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+                CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                );
+            """)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads; keep one per thread (and per process)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _evict(self, conn, now):
+        if now - self._last_evict < self.evict_interval_seconds:
+            return
+        self._last_evict = now
+
+        stale = []
+        if self.idle_ttl_seconds is not None:
+            stale += [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE last_seen < ?", (now - self.idle_ttl_seconds,))]
+        stale += [row[0] for row in conn.execute(
+            "SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?", (self.max_sessions,))]
+        if stale:
+            conn.executemany("DELETE FROM messages WHERE session_id = ?", [(sid,) for sid in stale])
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(sid,) for sid in stale])
+
+    def _live_total(self, conn, session_id, now):
+        row = conn.execute("SELECT last_seen, total FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if self.idle_ttl_seconds is not None and now - row[0] >= self.idle_ttl_seconds:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return None
+        return row[1]
+
+    def recent(self, session_id, limit):
+        """The last `limit` messages of a session, oldest first."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            if not limit or self._live_total(conn, session_id, now) is None:
+                return []
+            conn.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id))
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def append(self, session_id, *messages):
+        """Adds messages ({"role", "content"}) to a session and returns its total message count."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            # Take the write lock up front so concurrent workers get consecutive sequence numbers
+            conn.execute("BEGIN IMMEDIATE")
+            total = self._live_total(conn, session_id, now) or 0
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(session_id, total + i, m["role"], m["content"]) for i, m in enumerate(messages)],
+            )
+            total += len(messages)
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_seen, total) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_seen = excluded.last_seen, total = excluded.total",
+                (session_id, now, total),
+            )
+            conn.execute("DELETE FROM messages WHERE session_id = ? AND seq < ?",
+                         (session_id, total - self.max_messages))
+            self._evict(conn, now)
+        return total
+
+    def length(self, session_id):
+        """Total messages ever added to a live session (including ones rotated out of the buffer)."""
+        conn = self._connection()
+        with conn:
+            return self._live_total(conn, session_id, time.time()) or 0
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM sessions")
+
+
+SESSION_STORES = {"memory": MemorySessionStore, "sqlite": SQLiteSessionStore}
+
+
+def create_session_store(backend="memory", **options):
+    """Instantiates the session store registered as `backend` in SESSION_STORES."""
+    if backend not in SESSION_STORES:
+        raise ValueError(f"Unknown session store '{backend}', expected one of {sorted(SESSION_STORES)}")
+    return SESSION_STORES[backend](**options)
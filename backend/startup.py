@@ -0,0 +1,79 @@
+import threading
+import time
+
+
+class Warmup:
+    """
+    Named start-up steps, run once in order, inline or on a background thread.
+
+    Progress is reported for the readiness endpoint. A failed step is recorded
+    and the remaining steps still run; everything the steps prepare also loads
+    on demand, so a request that arrives before the warm-up finishes is served
+    (it just waits for what it needs).
+    """
+
+    def __init__(self, steps):
+        self._steps = list(steps)  # [(name, zero-argument callable)]
+        self._state = {name: {"status": "pending"} for name, _ in self._steps}
+        self._lock = threading.Lock()
+        self._started = False
+        self.started_at = None
+        self.finished_at = None
+
+    def _claim(self):
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    def start(self):
+        """Runs the steps on a daemon thread. Returns False if they were already started."""
+        if not self._claim():
+            return False
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+        return True
+
+    def run(self):
+        """Runs the steps on the calling thread. Returns False if they were already started."""
+        if not self._claim():
+            return False
+        self._run()
+        return True
+
+    def _run(self):
+        self.started_at = time.time()
+        for name, step in self._steps:
+            self._state[name] = {"status": "running"}
+            step_start = time.perf_counter()
+            try:
+                step()
+                self._state[name] = {"status": "done"}
+            except Exception as e:
+                print(f"Warm-up step '{name}' failed: {e}")
+                self._state[name] = {"status": "failed", "error": str(e)}
+            self._state[name]["seconds"] = round(time.perf_counter() - step_start, 3)
+        self.finished_at = time.time()
+
+    @property
+    def status(self):
+        """'pending', 'warming', 'ready' or 'failed'."""
+        if self.started_at is None:
+            return "pending"
+        if self.finished_at is None:
+            return "warming"
+        if any(state["status"] == "failed" for state in self._state.values()):
+            return "failed"
+        return "ready"
+
+    @property
+    def ready(self):
+        return self.status == "ready"
+
+    def report(self):
+        end = self.finished_at or time.time()
+        return {
+            "status": self.status,
+            "steps": {name: dict(state) for name, state in self._state.items()},
+            "seconds": round(end - self.started_at, 3) if self.started_at else None,
+        }
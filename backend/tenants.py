@@ -0,0 +1,257 @@
+import hashlib
+import hmac
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# User ids double as directory names, so keep them to a safe character set
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def ledger_bytes(store):
+    """In-memory size of a TransactionStore's columns (memory-mapped columns are counted too)."""
+    if not len(store):
+        return 0
+    return int(store.frame.memory_usage(index=True, deep=True).sum())
+
+
+def sign_user_token(user_id, secret, ttl_seconds=None):
+    """
+    A bearer token for `user_id`: "<user_id>.<expiry>.<HMAC-SHA256 signature>". The expiry is a
+    Unix timestamp, or 0 for a token that does not expire.
+    """
+    expires = int(time.time() + ttl_seconds) if ttl_seconds else 0
+    payload = f"{user_id}.{expires}"
+    signature = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature}"
+
+
+def verify_user_token(token, secret):
+    """Returns the user id of a token made by sign_user_token with `secret`, or None if it is invalid or expired."""
+    try:
+        user_id, expires, signature = token.split(".")
+        expires = int(expires)
+    except ValueError:
+        return None
+    expected = hmac.new(secret.encode(), f"{user_id}.{expires}".encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    if expires and expires < time.time():
+        return None
+    return user_id
+
+
+# Size of one node of a fitted sklearn tree (sklearn.tree._tree.NODE_DTYPE)
+TREE_NODE_BYTES = 64
+
+
+def estimate_bytes(obj, seen=None):
+    """
+    Approximate memory held by `obj`: the buffers of the NumPy arrays, pandas objects and
+    fitted sklearn trees reachable through its attributes and containers, plus strings.
+    Shared objects are counted once. Reads sizes only, so it copies nothing.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or obj is None or isinstance(obj, (bool, int, float, type)):
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # A view's memory belongs to its base, which is counted when reached directly
+        return obj.nbytes if obj.base is None else 0
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(index=True, deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, (str, bytes)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_bytes(key, seen) + estimate_bytes(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sum(estimate_bytes(item, seen) for item in obj)
+    if hasattr(obj, "node_count") and hasattr(obj, "value"):
+        return obj.node_count * TREE_NODE_BYTES + obj.value.nbytes
+    state = getattr(obj, "__dict__", None)
+    return estimate_bytes(state, seen) if state is not None else 0
+
+
+class Tenant:
+    """
+    One user's ledger plus its analytics, computed on first use.
+
+    `analytics_loader(store, digest)` returns (anomaly detector, ML results, income profile,
+    income engine).
+    `on_resize(tenant)` is called after the analytics are built so the registry can
+    re-check its memory budget.
+    """
+
+    def __init__(self, user_id, store, digest, analytics_loader, on_resize=None):
+        self.user_id = user_id
+        self.store = store
+        self.digest = digest
+        self.lock = threading.RLock()
+        # AI subscription scan for this ledger, filled in by a background thread
+        self.subscription_enrichment = {"version": None, "subscriptions": None, "running": False}
+
+        self._analytics_loader = analytics_loader
+        self._on_resize = on_resize
+        self._analytics = None
+        self._ledger_bytes = ledger_bytes(store)
+        self._analytics_bytes = 0
+
+    @property
+    def analytics(self):
+        if self._analytics is None:
+            with self.lock:
+                if self._analytics is None:
+                    analytics = self._analytics_loader(self.store, self.digest)
+                    self._analytics_bytes = estimate_bytes(analytics)
+                    self._analytics = analytics
+                    if self._on_resize is not None:
+                        self._on_resize(self)
+        return self._analytics
+
+    @property
+    def detector(self):
+        return self.analytics[0]
+
+    @property
+    def ml_results(self):
+        return self.analytics[1]
+
+    @property
+    def income_profile(self):
+        return self.analytics[2]
+
+    @property
+    def income_engine(self):
+        return self.analytics[3]
+
+    @property
+    def analytics_loaded(self):
+        return self._analytics is not None
+
+    def set_analytics(self, analytics):
+        """Replaces the analytics after an incremental update (the size estimate is kept)."""
+        with self.lock:
+            self._analytics = analytics
+
+    def ledger_changed(self, digest=None):
+        """Re-measures the ledger after an append and lets the registry re-check its budget."""
+        self.digest = digest
+        self._ledger_bytes = ledger_bytes(self.store)
+        if self._on_resize is not None:
+            self._on_resize(self)
+
+    def memory_bytes(self):
+        return self._ledger_bytes + self._analytics_bytes
+
+
+class TenantRegistry:
+    """
+    Lazily loaded tenants kept in an LRU bounded by `memory_budget_bytes` and `max_tenants`.
+
+    `ledger_loader(user_id)` returns (TransactionStore, ledger digest). Nothing is
+    loaded until a user's first request; the least recently used tenants are dropped
+    once the hot set exceeds the budget (the tenant being served is never dropped).
+    """
+
+    def __init__(self, ledger_loader, analytics_loader, memory_budget_bytes=512 * 1024 * 1024, max_tenants=64):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_tenants = max_tenants
+        self.loads = 0
+        self.evictions = 0
+
+        self._ledger_loader = ledger_loader
+        self._analytics_loader = analytics_loader
+        self._tenants = OrderedDict()  # user_id -> Tenant, least recently used first
+        self._loading = {}  # user_id -> lock held while its ledger loads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def valid_user_id(user_id):
+        return isinstance(user_id, str) and bool(USER_ID_PATTERN.match(user_id))
+
+    def _lookup(self, user_id):
+        tenant = self._tenants.get(user_id)
+        if tenant is not None:
+            self._tenants.move_to_end(user_id)
+        return tenant
+
+    def get(self, user_id):
+        """Returns the user's Tenant, loading its ledger on first use. Raises ValueError for malformed ids."""
+        if not self.valid_user_id(user_id):
+            raise ValueError(f"Invalid user id '{user_id}'")
+
+        with self._lock:
+            tenant = self._lookup(user_id)
+            if tenant is not None:
+                return tenant
+            load_lock = self._loading.setdefault(user_id, threading.Lock())
+
+        # Concurrent first requests for one user share a single load
+        with load_lock:
+            with self._lock:
+                tenant = self._lookup(user_id)
+            if tenant is not None:
+                return tenant
+
+            store, digest = self._ledger_loader(user_id)
+            tenant = Tenant(user_id, store, digest, self._analytics_loader, on_resize=self._resized)
+            with self._lock:
+                self._tenants[user_id] = tenant
+                self._loading.pop(user_id, None)
+                self.loads += 1
+                self._enforce_budget(keep=tenant)
+        return tenant
+
+    def _resized(self, tenant):
+        with self._lock:
+            self._enforce_budget(keep=tenant)
+
+    def _enforce_budget(self, keep):
+        total = sum(tenant.memory_bytes() for tenant in self._tenants.values())
+        for user_id in list(self._tenants):
+            if total <= self.memory_budget_bytes and len(self._tenants) <= self.max_tenants:
+                break
+            tenant = self._tenants[user_id]
+            if tenant is keep:
+                continue
+            del self._tenants[user_id]
+            total -= tenant.memory_bytes()
+            self.evictions += 1
+
+    def evict(self, user_id):
+        """Drops a tenant so its next request reloads it (e.g. after its ledger files change)."""
+        with self._lock:
+            return self._tenants.pop(user_id, None) is not None
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._tenants
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "memory_bytes": sum(tenant.memory_bytes() for tenant in self._tenants.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+if __name__ == "__main__":
+    # python tenants.py USER_ID [TTL_DAYS]: prints a bearer token signed with TENANT_AUTH_SECRET
+    import os
+    if not os.getenv("TENANT_AUTH_SECRET") or len(sys.argv) not in (2, 3):
+        sys.exit("Usage: TENANT_AUTH_SECRET=... python tenants.py USER_ID [TTL_DAYS]")
+    if not TenantRegistry.valid_user_id(sys.argv[1]):
+        sys.exit(f"Invalid user id '{sys.argv[1]}'")
+    ttl = float(sys.argv[2]) * 86400 if len(sys.argv) == 3 else None
+    print(sign_user_token(sys.argv[1], os.environ["TENANT_AUTH_SECRET"], ttl))
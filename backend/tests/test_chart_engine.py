@@ -0,0 +1,19 @@
+import json
+
+import pytest
+
+from chart_engine import normalize_spec
+
+
+def test_normalize_spec_fills_defaults():
+    spec = normalize_spec({"chartType": "Bar", "categories": ["coffee"], "topN": 5.0}, known_categories=["Coffee", "Food"])
+    assert spec["chartType"] == "bar"
+    assert spec["groupBy"] == "category"
+    assert spec["categories"] == ["Coffee"]
+    assert spec["topN"] == 5
+
+
+@pytest.mark.parametrize("top_n", [json.loads('1e999'), float("-inf"), float("nan"), "ten", [3]])
+def test_normalize_spec_rejects_invalid_top_n(top_n):
+    with pytest.raises(ValueError):
+        normalize_spec({"topN": top_n})
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+from goal_parser import GOAL_PHRASES, extract_goal_from_message
+
+TODAY = date(2026, 10, 18)
+
+
+@pytest.mark.parametrize("phrase", GOAL_PHRASES)
+def test_goal_phrases_parse(phrase):
+    goal = extract_goal_from_message(phrase, TODAY)
+    if goal is not None:
+        assert goal["target_date"] >= TODAY.isoformat()
+
+
+@pytest.mark.parametrize("phrase, target_date", [
+    ("save $500 in 3 months", "2027-01-18"),
+    ("put away 800 bucks in 6 weeks", "2026-11-29"),
+    ("save 5000 by sept 2027", "2027-09-18"),
+    ("save $50 by friday", "2026-10-23"),
+])
+def test_target_dates(phrase, target_date):
+    assert extract_goal_from_message(phrase, TODAY)["target_date"] == target_date
+
+
+@pytest.mark.parametrize("phrase", [
+    "save $500 in 9999 years",
+    "save $500 in 99999999999999999999 years",
+    "save $500 in 9999999 days",
+    "save $500 in 99999999999999999999 days",
+    "save $500 by march 0000",
+])
+def test_unrepresentable_deadline_is_ignored(phrase):
+    # Treated as a goal without a deadline: the default timeframe applies
+    goal = extract_goal_from_message(phrase, TODAY)
+    assert goal["target_amount"] == 500
+    assert goal["target_date"] == "2027-01-18"
+
+
+def test_past_deadline_is_ignored():
+    goal = extract_goal_from_message("hit my $1500 goal before July 2025", TODAY)
+    assert goal == {"name": "User-specified savings goal", "target_amount": 1500.0, "target_date": "2027-01-18"}
@@ -276,6 +276,8 @@ const COLORS = [
 
 function App() {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [activeTxTab, setActiveTxTab] = useState("recent");
   // Chat bot states
   const [chatHistory, setChatHistory] = useState([
@@ -287,7 +289,9 @@ function App() {
   ]);
   const [chatInput, setChatInput] = useState("");
   const [isChatLoading, setIsChatLoading] = useState(false);
+  const [isChatStreaming, setIsChatStreaming] = useState(false);
   const chatContainerRef = useRef(null);
+  const transactionsRequest = useRef(null);
 
   // Stats states
   const [stats, setStats] = useState(null);
@@ -331,7 +335,6 @@ function App() {
   // Initial Data Fetching
   useEffect(() => {
     handleCheckSubscriptions();
-    fetchTransactions();
     fetchStats();
     fetchAnomalies();
   }, []);
@@ -371,13 +374,40 @@ function App() {
     }
   };
 
-  const fetchTransactions = () => {
-    fetch("/api/transactions")
-      .then((res) => res.json())
-      .then((data) => setTransactions(data))
-      .catch((err) => console.error("Failed to fetch transactions:", err));
+  // Transactions are paged by the server; a cursor continues the current search
+  const fetchTransactions = async (cursor = null) => {
+    // A newer search (or page) supersedes the one in flight, so its response can't overwrite this one
+    transactionsRequest.current?.abort();
+    const controller = new AbortController();
+    transactionsRequest.current = controller;
+
+    const params = new URLSearchParams();
+    if (searchTerm.trim()) params.set("q", searchTerm.trim());
+    if (cursor) params.set("cursor", cursor);
+    if (cursor) setIsLoadingMore(true);
+    try {
+      const res = await fetch(`/api/transactions?${params}`, {
+        signal: controller.signal,
+      });
+      const data = await res.json();
+      setTransactions((prev) =>
+        cursor ? [...prev, ...data.transactions] : data.transactions
+      );
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      if (err.name === "AbortError") return;
+      console.error("Failed to fetch transactions:", err);
+    } finally {
+      if (transactionsRequest.current === controller) setIsLoadingMore(false);
+    }
   };
 
+  // Re-query on search (debounced so typing doesn't send a request per key)
+  useEffect(() => {
+    const timer = setTimeout(() => fetchTransactions(), searchTerm ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const handleChatSubmit = async (e) => {
     e.preventDefault();
     if (!chatInput.trim()) return;
@@ -387,48 +417,78 @@ function App() {
     setChatHistory((prev) => [...prev, { role: "user", content: userMsg }]);
     setIsChatLoading(true);
 
+    // Reply text streams in as server-sent events; the chart arrives as a trailing event
+    let receivedText = false;
+    const appendToReply = (text) => {
+      if (!receivedText) {
+        // First token: swap the "Thinking..." indicator for the reply bubble
+        receivedText = true;
+        setIsChatLoading(false);
+        setIsChatStreaming(true);
+        setChatHistory((prev) => [...prev, { role: "ai", content: text }]);
+        return;
+      }
+      setChatHistory((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+      });
+    };
+
     try {
-      const res = await fetch("/api/chat", {
+      const res = await fetch("/api/chat/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ message: userMsg }),
       });
-      const data = await res.json();
-      setChatHistory((prev) => [
-        ...prev,
-        {
-          role: "ai",
-          content: data.reply || "I'm having trouble connecting right now.",
-        },
-      ]);
-
-      if (data.visualization && Object.keys(data.visualization).length > 0) {
-        setVizData(data.visualization);
+      if (!res.ok || !res.body) throw new Error(`Chat stream failed: ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+          const payload = JSON.parse(data);
+
+          if (event === "token") {
+            appendToReply(payload.text);
+          } else if (event === "visualization") {
+            setVizData(payload);
+          }
+        }
       }
+
+      if (!receivedText) appendToReply("I'm having trouble connecting right now.");
     } catch (e) {
       console.error("Chat Error Details:", e);
-      setChatHistory((prev) => [
-        ...prev,
-        { role: "ai", content: "Sorry, I couldn't reach the server." },
-      ]);
+      if (!receivedText) {
+        setChatHistory((prev) => [
+          ...prev,
+          { role: "ai", content: "Sorry, I couldn't reach the server." },
+        ]);
+      }
     } finally {
       setIsChatLoading(false);
+      setIsChatStreaming(false);
     }
   };
 
-  // Default Viz (Pie Chart)
+  // Default Viz (Pie Chart), from server-side totals since the transaction list is paged
   useEffect(() => {
-    if (transactions.length > 0 && !vizData) {
-      const categoryTotals = transactions
-        .filter((tx) => tx.type === "withdrawal")
-        .reduce((acc, tx) => {
-          acc[tx.category] = (acc[tx.category] || 0) + tx.amount;
-          return acc;
-        }, {});
-
+    const categoryTotals = stats?.spending_by_category;
+    if (categoryTotals && Object.keys(categoryTotals).length > 0 && !vizData) {
       const pieData = Object.keys(categoryTotals).map((category) => ({
         name: category,
-        amount: Number(categoryTotals[category].toFixed(2)),
+        amount: categoryTotals[category],
       }));
 
       setVizData({
@@ -439,7 +499,7 @@ function App() {
         dataKey: "amount",
       });
     }
-  }, [transactions]);
+  }, [stats]);
 
   const handleForecastGoal = async (e) => {
     e.preventDefault();
@@ -501,12 +561,6 @@ function App() {
     }
   };
 
-  const filteredTransactions = transactions.filter(
-    (tx) =>
-      tx.description.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      tx.category.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   const renderChart = () => {
     if (!vizData || vizData.error) return null;
     const commonProps = {
@@ -698,12 +752,12 @@ function App() {
                     placeholder="Ask about your finances..."
                     value={chatInput}
                     onChange={(e) => setChatInput(e.target.value)}
-                    disabled={isChatLoading}
+                    disabled={isChatLoading || isChatStreaming}
                     className="w-full py-3 pl-4 pr-12 bg-gray-950 border border-gray-700 rounded-xl focus:ring-2 focus:ring-emerald-500 outline-none text-gray-100 placeholder-gray-500"
                   />
                   <button
                     type="submit"
-                    disabled={!chatInput.trim() || isChatLoading}
+                    disabled={!chatInput.trim() || isChatLoading || isChatStreaming}
                     className="absolute right-2 top-2 p-1.5 bg-emerald-600 hover:bg-emerald-500 text-white rounded-lg disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
                   >
                     <Send className="w-5 h-5" />
@@ -920,35 +974,46 @@ function App() {
                 <div className="space-y-3 overflow-y-auto pr-2 flex-1 min-h-0 custom-scrollbar">
                   {activeTxTab === "recent" ? (
                     // STANDARD TRANSACTION LIST
-                    filteredTransactions.length > 0 ? (
-                      filteredTransactions.map((tx) => (
-                        <div
-                          key={tx.id}
-                          className="flex items-center justify-between p-4 bg-gray-950 rounded-xl border border-gray-800/50 hover:border-gray-700 transition-colors"
-                        >
-                          <div className="flex items-center space-x-4">
-                            <div className="p-3 bg-gray-900 rounded-lg border border-gray-800">
-                              <CategoryIcon category={tx.category} />
-                            </div>
-                            <div>
-                              <p className="font-medium text-gray-200">
-                                {tx.description}
-                              </p>
-                              <p className="text-sm text-gray-500">{tx.date}</p>
+                    transactions.length > 0 ? (
+                      <>
+                        {transactions.map((tx) => (
+                          <div
+                            key={tx.id}
+                            className="flex items-center justify-between p-4 bg-gray-950 rounded-xl border border-gray-800/50 hover:border-gray-700 transition-colors"
+                          >
+                            <div className="flex items-center space-x-4">
+                              <div className="p-3 bg-gray-900 rounded-lg border border-gray-800">
+                                <CategoryIcon category={tx.category} />
+                              </div>
+                              <div>
+                                <p className="font-medium text-gray-200">
+                                  {tx.description}
+                                </p>
+                                <p className="text-sm text-gray-500">{tx.date}</p>
+                              </div>
                             </div>
+                            <p
+                              className={`font-semibold ${
+                                tx.type === "deposit"
+                                  ? "text-emerald-400"
+                                  : "text-gray-100"
+                              }`}
+                            >
+                              {tx.type === "deposit" ? "+" : "-"}$
+                              {tx.amount.toFixed(2)}
+                            </p>
                           </div>
-                          <p
-                            className={`font-semibold ${
-                              tx.type === "deposit"
-                                ? "text-emerald-400"
-                                : "text-gray-100"
-                            }`}
+                        ))}
+                        {nextCursor && (
+                          <button
+                            onClick={() => fetchTransactions(nextCursor)}
+                            disabled={isLoadingMore}
+                            className="w-full py-2 text-sm font-medium text-gray-400 hover:text-gray-200 disabled:opacity-50 transition-colors"
                           >
-                            {tx.type === "deposit" ? "+" : "-"}$
-                            {tx.amount.toFixed(2)}
-                          </p>
-                        </div>
-                      ))
+                            {isLoadingMore ? "Loading..." : "Load more"}
+                          </button>
+                        )}
+                      </>
                     ) : (
                       <div className="text-center text-gray-500 py-8">
                         No transactions found.